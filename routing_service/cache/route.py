@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+from utils.load import ROUTE_CACHE_ENTRIES, ROUTE_CACHE_MB
+
+
+T = TypeVar("T")
+
+
+class RouteResultCache:
+    """
+    LRU cache of computed routes, keyed by (traffic slice key, snapped source node,
+    snapped target node, mode). Identical requests arriving while a route is being
+    computed share that computation. Entries of a slice are dropped as soon as the
+    slice's network is rebuilt (see TrafficGraphCache.on_refresh).
+    """
+    def __init__(self, max_entries: int = ROUTE_CACHE_ENTRIES, max_bytes: int = int(ROUTE_CACHE_MB * 2**20)) -> None:
+        """
+        :param max_entries: Maximum number of cached routes.
+        :param max_bytes: Approximate memory budget of the cached routes.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[object, int]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self._nbytes = 0
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0}
+
+    @classmethod
+    def _sizeof(cls, result) -> int:
+        if isinstance(result, list):
+            # a route and its alternatives
+            return sum(cls._sizeof(item) for item in result)
+        # (path, distance, times, exec_time): dominated by the [lon, lat] path
+        path = result[0] if isinstance(result, tuple) and result and isinstance(result[0], list) else []
+        return 200 + 120 * len(path)
+
+    async def get_or_compute(self, slice_key: str, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the cached route for (slice_key, key), joining an identical in-flight
+        computation or starting one. Failures are not cached and reach every waiter.
+
+        :param slice_key: Traffic cache key of the network the route is computed on.
+        :param key: (source node, target node, mode) or any other hashable route identity.
+        :param compute: Coroutine factory producing the route.
+        """
+        full_key = (slice_key, key)
+        item = self._entries.get(full_key)
+        if item is not None:
+            self._entries.move_to_end(full_key)
+            self._counters["hits"] += 1
+            return item[0]
+
+        task = self._inflight.get(full_key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        self._counters["misses"] += 1
+        # the computation runs in its own task: a caller that gives up (e.g. a client
+        # disconnect) cancels only its own wait, never the route the others wait for
+        task = asyncio.get_running_loop().create_task(self._compute(full_key, compute))
+        task.add_done_callback(_retrieve)
+        self._inflight[full_key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, full_key: Tuple[str, Hashable], compute: Callable[[], Awaitable[T]]) -> T:
+        task = asyncio.current_task()
+        try:
+            result = await compute()
+            if self._inflight.get(full_key) is task:
+                self._store(full_key, result)
+            return result
+        finally:
+            if self._inflight.get(full_key) is task:
+                del self._inflight[full_key]
+
+    def _store(self, full_key: Tuple[str, Hashable], result) -> None:
+        size = self._sizeof(result)
+        if size > self.max_bytes:
+            return
+        self._entries[full_key] = (result, size)
+        self._nbytes += size
+        while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._nbytes -= evicted
+            self._counters["evictions"] += 1
+
+    def invalidate_slice(self, slice_key: str) -> None:
+        """
+        Drop every route of a traffic slice; computations still in flight for it
+        complete for their waiters but are not stored.
+        """
+        stale = [k for k in self._entries if k[0] == slice_key]
+        for k in stale:
+            self._nbytes -= self._entries.pop(k)[1]
+        for k in [k for k in self._inflight if k[0] == slice_key]:
+            del self._inflight[k]
+        if stale:
+            self._counters["invalidations"] += len(stale)
+            logging.info(f"route cache: dropped {len(stale)} routes of {slice_key}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._nbytes,
+            "max_bytes": self.max_bytes,
+            "inflight": len(self._inflight),
+            **self._counters,
+        }
+
+
+def _retrieve(task: asyncio.Task) -> None:
+    # a failure nobody waits for any more is not reported by asyncio as unobserved
+    if not task.cancelled():
+        task.exception()
+
+
+route_cache = RouteResultCache()
@@ -1,22 +1,57 @@
+import json
+import uuid
+import asyncio
 import datetime
-import time
+import functools
+import logging
+import random
+import threading
+from typing import Callable, Dict, Optional
 
 import httpx
-from utils.load import TRAFFIC_SERVICE_URL
+from utils.load import TRAFFIC_SERVICE_URL, NETWORK_CACHE_ENTRIES, NETWORK_CACHE_MB
+from utils.load import SLICE_CACHE_TTL
 from utils.cache import RedisClient, LocalCache
 from utils.times import getInfoFromTimestamp
+from routing_service.services import ch, cch, alt
+from routing_service.services.graph import RoadGraph
+from routing_service.services.road import RoadNetwork
+from routing_service.cache.route import route_cache
+
+
+# attempts to fetch a slice from traffic_service, and the backoff between them (seconds)
+LOAD_ATTEMPTS = 5
+LOAD_BACKOFF = 1.0
+LOAD_BACKOFF_MAX = 16.0
 
 
 class TrafficGraphCache:
     def __init__(self):
         self.local_cache = LocalCache()
+        # decoded slices (L1 in front of Redis), kept coherent through CHANNEL_INVALIDATE;
+        # networks grow derived views after insertion, their size is taken when stored
+        self.network_cache = LocalCache(
+            NETWORK_CACHE_ENTRIES, int(NETWORK_CACHE_MB * 2**20), sizeof=lambda network: network.nbytes)
         self.redis_cache = RedisClient()
         self.KEY_TRAFFIC_GRAPH = "traffic_graph"
         self.KEY_LOCK_PREFIX = "lock:traffic_graph"
+        self.KEY_TOPOLOGY_PREFIX = "traffic_graph:topology"
+        self.CHANNEL_INVALIDATE = "traffic_graph:invalidate"
 
         self.local_ttl = 5*60
         self.redis_ttl = 60*60
+        self.latest_ttl = 10*60
+        self.slice_ttl = 70*60
+        self.topology_ttl = 7*24*60*60
+        self.max_topologies = 4
+        self._topologies: Dict[str, RoadNetwork] = {}
+        self._topology_lock = threading.Lock()
         self.lock_timeout = 60
+        self.lock_attempts = 2
+        self._refresh_listeners = []
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
 
     def _get_latest_key(self):
         return f"{self.KEY_TRAFFIC_GRAPH}:latest"
@@ -25,48 +60,325 @@ class TrafficGraphCache:
         _, month, _, weekday, hour, _ = getInfoFromTimestamp(ts)
         return f'{self.KEY_TRAFFIC_GRAPH}:{month}_{weekday}_{hour}'
 
-    def _acquire_lock(self, key):
-        lock_key = f"{self.KEY_LOCK_PREFIX}{key}"
-        result = self.redis_cache.set(lock_key, "1", nx=True, ex=self.lock_timeout)
-        return result
+    def network_key(self, ts: int = None) -> str:
+        """
+        Cache key of the traffic slice serving a timestamp (None = latest).
+        """
+        return self._get_latest_key() if ts is None else self._build_ts_key(ts)
+
+    def on_refresh(self, listener: Callable[[str], None]) -> None:
+        """
+        Register a callback invoked with the slice key whenever a slice's network
+        is rebuilt, so results derived from the previous one can be dropped.
+        """
+        self._refresh_listeners.append(listener)
+
+    def _acquire_lock(self, key, ex=None):
+        """
+        Take the load lock of a slice.
+
+        :param ex: Seconds before the lock expires; defaults to lock_timeout.
+        :return: Token identifying this holder; None when another worker holds the lock.
+        """
+        token = uuid.uuid4().hex
+        if self.redis_cache.set(f"{self.KEY_LOCK_PREFIX}{key}", token, nx=True, ex=ex or self.lock_timeout):
+            return token
+        return None
+
+    def _release_lock(self, key, token):
+        # a load outliving lock_timeout must not release the lock another worker took since
+        self.redis_cache.delete_if_equal(f"{self.KEY_LOCK_PREFIX}{key}", token)
+
+    def _ready_channel(self, key):
+        return f"{self.KEY_LOCK_PREFIX}{key}:ready"
+
+    def acquire_job_lock(self, name, ex):
+        """
+        Run a scheduled job on one worker only: the token of the job's lock,
+        None while another worker holds it. The lock expires after `ex` seconds.
+        """
+        return self._acquire_lock(f":job:{name}", ex)
+
+    def release_job_lock(self, name, token):
+        self._release_lock(f":job:{name}", token)
 
-    def _release_lock(self, key):
-        self.redis_cache.delete(f"{self.KEY_LOCK_PREFIX}{key}")
+    def _digest_key(self, key):
+        return f"{key}:digest"
+
+    def _store_slice(self, key, data):
+        # the digest lives next to the slice, so a refresh compares it without fetching the arrays
+        self.redis_cache.set(key, data, ex=self.slice_ttl)
+        self.redis_cache.set(self._digest_key(key), data["digest"], ex=self.slice_ttl)
 
     async def get_traffic_data(self, ts: int = None):
+        """
+        Return the traffic data of a slice, loading it at most once at a time:
+        concurrent callers in this process await the same load task, and other
+        workers wait for the Redis lock holder's completion message. The load runs
+        in its own task, so a caller that is cancelled never fails the others.
+        """
         if ts is None:
             key = self._get_latest_key()
             cache = self.local_cache
-            ex = 10 * 60  # 10 minutes
+            ex = self.latest_ttl
         else:
             key = self._build_ts_key(ts)
             cache = self.redis_cache
-            ex = 70 * 60  # 70 minutes
+            ex = self.slice_ttl
 
         data = cache.get(key)
         if data:
             return data
 
-        if self._acquire_lock(key):
-            data = await self.load_traffic_data(ts)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load_shared(key, ts, cache, ex))
+            task.add_done_callback(functools.partial(self._forget_load, key))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    def _forget_load(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # retrieved here so a failure nobody waits for is not reported by asyncio
+            task.exception()
+
+    async def _load_shared(self, key, ts, cache, ex):
+        if cache is not self.redis_cache:
+            # the latest slice lives in this worker's memory: nothing to share across workers
+            data = await asyncio.to_thread(self._split, await self.load_traffic_data(ts))
             if data:
                 cache.set(key, data, ex=ex)
-            self._release_lock(key)
             return data
-        else:
-            for _ in range(10):
-                time.sleep(3)
-                data = cache.get(key)
-                if data:
-                    return data
+
+        for _ in range(self.lock_attempts):
+            token = self._acquire_lock(key)
+            if token is not None:
+                data = None
+                try:
+                    data = await asyncio.to_thread(self._split, await self.load_traffic_data(ts))
+                    if data:
+                        self._store_slice(key, data)
+                finally:
+                    self._release_lock(key, token)
+                    self.redis_cache.publish(self._ready_channel(key), bool(data))
+                return data
+            data = await self._wait_for_loader(key, cache)
+            if data:
+                return data
         return None
 
+    async def refresh_traffic_data(self, ts: int = None):
+        """
+        Reload a slice from traffic_service and replace the stored copy (scheduled jobs).
+        The latest slice is per worker; a timestamped slice is rewritten in Redis under
+        its load lock (skipped while another worker holds it), and every worker drops
+        the network built from the previous version. A slice whose weights did not
+        change only has its expiry extended: networks built from it stay valid.
+
+        :return: The new slice data; None when skipped or unavailable.
+        """
+        key = self.network_key(ts)
+        if ts is None:
+            data = await asyncio.to_thread(self._split, await self.load_traffic_data())
+            if data:
+                previous = self.local_cache.get(key)
+                self.local_cache.set(key, data, ex=self.latest_ttl)
+                network = self.network_cache.get(key)
+                if previous and previous.get("digest") == data["digest"] and network is not None:
+                    self.network_cache.set(key, network, ex=self.local_ttl)
+                else:
+                    self.network_cache.delete(key)
+            return data
+
+        token = self._acquire_lock(key)
+        if token is None:
+            return None
+        data = None
+        try:
+            data = await asyncio.to_thread(self._split, await self.load_traffic_data(ts))
+            unchanged = bool(data) and self.redis_cache.get(self._digest_key(key)) == data["digest"]
+            if unchanged and self.redis_cache.expire(key, self.slice_ttl):
+                self.redis_cache.expire(self._digest_key(key), self.slice_ttl)
+            elif data:
+                self._store_slice(key, data)
+                self.network_cache.delete(key)
+                self._publish_invalidation(key)
+        finally:
+            self._release_lock(key, token)
+            self.redis_cache.publish(self._ready_channel(key), bool(data))
+        return data
+
+    def _publish_invalidation(self, key):
+        self.redis_cache.publish(self.CHANNEL_INVALIDATE, {"key": key, "origin": self._origin})
+
+    def start_listening(self):
+        """
+        Start the invalidation listener on the running event loop (once per worker).
+        """
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self.listen_for_invalidations())
+
+    async def listen_for_invalidations(self):
+        """
+        Drop networks of slices rewritten by other workers, for the lifetime of the
+        service. Reconnects with backoff; the network cache is cleared after a
+        disconnection since invalidations may have been missed meanwhile.
+        """
+        delay = LOAD_BACKOFF
+        while True:
+            pubsub = self.redis_cache.pubsub()
+            try:
+                await pubsub.subscribe(self.CHANNEL_INVALIDATE)
+                delay = LOAD_BACKOFF
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    event = json.loads(message["data"])
+                    if event.get("origin") != self._origin:
+                        self.network_cache.delete(event["key"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"slice invalidation listener failed: {e}; reconnecting in {delay:.0f}s")
+                self.network_cache.clear()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LOAD_BACKOFF_MAX)
+            finally:
+                await pubsub.aclose()
+
+    def _topology_key(self, version):
+        return f"{self.KEY_TOPOLOGY_PREFIX}:{version}"
+
+    def _split(self, data):
+        """
+        Turn a node-link slice from traffic_service into its compact form: the
+        topology is stored once under its version key (its TTL refreshed on every
+        slice load, so it outlives the slices using it) and the slice keeps only
+        the per-edge traffic arrays. CPU-bound: run it off the event loop.
+        """
+        if not data:
+            return data
+        graph = RoadGraph.from_node_link(data)
+        version = graph.topology_key
+        if version not in self._topologies:
+            self._remember_topology(version, RoadNetwork(graph))
+        key = self._topology_key(version)
+        if not self.redis_cache.expire(key, self.topology_ttl):
+            self.redis_cache.set(key, graph.topology_payload(), ex=self.topology_ttl, nx=True)
+        return graph.weights_payload()
+
+    def _remember_topology(self, version, network):
+        with self._topology_lock:
+            self._topologies[version] = network
+            while len(self._topologies) > self.max_topologies:
+                del self._topologies[next(iter(self._topologies))]
+
+    def _assemble(self, data):
+        """
+        RoadNetwork of a compact slice, on the parsed topology shared by every slice.
+        None when the topology is no longer available. CPU-bound: run it off the event loop.
+        """
+        if "nodes" in data:
+            # node-link entry written before topology and weights were split
+            return RoadNetwork(data)
+        version = data["topology"]
+        template = self._topologies.get(version)
+        if template is None:
+            payload = self.redis_cache.get(self._topology_key(version))
+            if payload is None:
+                return None
+            template = RoadNetwork(RoadGraph.from_topology_payload(payload))
+            self._remember_topology(version, template)
+        return template.with_graph(template.graph.with_weights(data))
+
+    async def _wait_for_loader(self, key, cache):
+        """
+        Await the completion message of the worker holding the lock for a key,
+        at most lock_timeout seconds (after which the lock has expired anyway).
+        """
+        pubsub = self.redis_cache.pubsub()
+        try:
+            await pubsub.subscribe(self._ready_channel(key))
+            # the loader may have finished before the subscription started
+            data = cache.get(key)
+            if data:
+                return data
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.lock_timeout
+            while loop.time() < deadline:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=deadline - loop.time())
+                if message is not None:
+                    return cache.get(key)
+            return None
+        finally:
+            await pubsub.aclose()
+
+    async def get_road_network(self, ts: int = None):
+        """
+        Return the RoadNetwork for a traffic slice, building its graph arrays
+        at most once per cache key instead of on every request: for local_ttl
+        (latest slice) or SLICE_CACHE_TTL unless the slice is rewritten meanwhile.
+        """
+        key = self.network_key(ts)
+        network = self.network_cache.get(key)
+        if network is not None:
+            return network
+
+        data = await self.get_traffic_data(ts)
+        if not data:
+            return None
+        network = await asyncio.to_thread(self._assemble, data)
+        if network is None:
+            logging.warning(f"Topology {data['topology']} of {key} expired; reloading the slice.")
+            if ts is None:
+                self.local_cache.delete(key)
+            else:
+                self.redis_cache.delete(key)
+            data = await self.get_traffic_data(ts)
+            network = await asyncio.to_thread(self._assemble, data) if data else None
+            if network is None:
+                return None
+        # hierarchies whose preprocessing only depends on the topology: load or start building
+        ch.get_hierarchy(network.graph.undirected, "length")
+        cch.get_structure(network.graph)
+        alt.get_tables(network.graph.undirected, "length")
+        self.network_cache.set(key, network, ex=self.local_ttl if ts is None else SLICE_CACHE_TTL)
+        for listener in self._refresh_listeners:
+            listener(key)
+        logging.info(
+            f"network cache: {self.network_cache.stats()['entries']} entries, "
+            f"{self.network_cache_nbytes() / 2**20:.1f} MiB")
+        return network
+
+    def network_cache_nbytes(self) -> int:
+        """
+        Memory held by the cached networks, including derived views
+        (undirected graph, spatial indexes) built after insertion.
+        """
+        return sum(network.nbytes for network in self.network_cache.values())
+
+    def stats(self):
+        """
+        Counters of the in-process caches: assembled networks and the latest slice.
+        """
+        return {
+            "networks": {**self.network_cache.stats(), "live_bytes": self.network_cache_nbytes()},
+            "latest": self.local_cache.stats(),
+        }
+
     @staticmethod
     async def load_traffic_data(ts=None):
         if ts is None:
             ts = int(datetime.datetime.now().timestamp())
 
-        for _ in range(5):
+        for attempt in range(LOAD_ATTEMPTS):
+            if attempt:
+                # exponential backoff with jitter, without blocking the event loop
+                delay = min(LOAD_BACKOFF * 2 ** (attempt - 1), LOAD_BACKOFF_MAX)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
             try:
                 async with httpx.AsyncClient(timeout=30.0) as client:
                     resp = await client.get(f'{TRAFFIC_SERVICE_URL}/road/network', params={'timestamp': ts})
@@ -80,8 +392,8 @@ class TrafficGraphCache:
                 print(f'call traffic service api request error: {str(e)}')
             except Exception as e:
                 print(f'call traffic service api fail: {e}')
-            time.sleep(5)
         raise RuntimeError("load traffic data fail")
 
 
 traffic_graph_cache = TrafficGraphCache()
+traffic_graph_cache.on_refresh(route_cache.invalidate_slice)
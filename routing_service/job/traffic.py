@@ -1,15 +1,33 @@
+import asyncio
 import datetime
-import time
+from utils.load import SLICE_PREFETCH_HOURS
 from routing_service.cache.traffic import traffic_graph_cache
 
+# the week-ahead refresh runs on one worker per hour; its lock expires with the hour
+# so a worker that dies mid-run does not block the next one
+FUTURE_TRAFFIC_LOCK_TTL = 60 * 60
+
 
 async def load_current_traffic():
-    await traffic_graph_cache.load_traffic_data()
+    await traffic_graph_cache.refresh_traffic_data()
+    await traffic_graph_cache.get_road_network()
+    # keep the networks of the next hours in memory, the ones most routes use
+    now = int(datetime.datetime.now().timestamp())
+    for offset in range(1, SLICE_PREFETCH_HOURS + 1):
+        await traffic_graph_cache.get_road_network(now + 60 * 60 * offset)
 
 
 async def load_future_traffic():
-    now = int(datetime.datetime.now().timestamp())
-    for offset in range(1, 7*24+1):
-        time.sleep(5)
-        ts = now + 60 * 60 * offset
-        await traffic_graph_cache.load_traffic_data(ts)
+    # slices live in Redis, shared by every worker: one of them refreshes them for all
+    token = traffic_graph_cache.acquire_job_lock("load_future_traffic", FUTURE_TRAFFIC_LOCK_TTL)
+    if token is None:
+        return
+    try:
+        now = int(datetime.datetime.now().timestamp())
+        for offset in range(1, 7*24+1):
+            # paced so traffic_service is not flooded; sleeping must not block the event loop
+            await asyncio.sleep(5)
+            ts = now + 60 * 60 * offset
+            await traffic_graph_cache.refresh_traffic_data(ts)
+    finally:
+        traffic_graph_cache.release_job_lock("load_future_traffic", token)
@@ -1,8 +1,12 @@
 import asyncio
 from apscheduler.schedulers.background import BackgroundScheduler
 from routing_service.job.base import register_jobs
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from routing_service.routers import route
+from routing_service.cache.traffic import traffic_graph_cache
+from routing_service.services.pool import PoolSaturated
+from utils.load import ROUTE_RETRY_AFTER
 
 app = FastAPI(title="routing service")
 scheduler = BackgroundScheduler()
@@ -10,8 +14,16 @@ scheduler = BackgroundScheduler()
 app.include_router(route.router, prefix="/route", tags=["Route"])
 
 
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    # overload is temporary: tell clients to come back instead of failing with 500
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(ROUTE_RETRY_AFTER)})
+
+
 @app.on_event("startup")
 async def startup_event():
     loop = asyncio.get_running_loop()
+    traffic_graph_cache.start_listening()
     register_jobs(scheduler, loop)
     scheduler.start()
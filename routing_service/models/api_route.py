@@ -1,5 +1,11 @@
-from pydantic import BaseModel
-from typing import Tuple, Optional
+from pydantic import BaseModel, validator
+from typing import List, Literal, Tuple, Optional
+
+
+# path algorithms of RoutePlanner
+Algorithm = Literal['A*', 'Dijkstra', 'BiA*', 'BiDijkstra', 'ALT', 'BiALT', 'CH', 'TD']
+# transport modes, as named in responses
+Mode = Literal['walking', 'driving', 'cycling']
 
 
 class SearchRouteRequest(BaseModel):
@@ -7,6 +13,48 @@ class SearchRouteRequest(BaseModel):
     end_at: Optional[int] = 0  # timestamp
     src_loc: Tuple[float, float]
     dst_loc: Tuple[float, float]
+    snap: Optional[str] = 'node'  # 'node' or 'edge'
+    algorithm: Algorithm = 'A*'
+    modes: List[Mode] = ['walking', 'driving', 'cycling']  # modes to compute
+    summary: Optional[bool] = False  # distances/times only, without the coordinate paths
+    alternatives: Optional[int] = 0  # extra driving routes to return next to the optimal one
+    corridor: Optional[str] = None  # None, 'ellipse' or 'bbox': prune the search around the endpoints
+
+
+class RouteBatchRequest(BaseModel):
+    searches: List[SearchRouteRequest]  # answered in the same order
+
+
+class RouteMatrixRequest(BaseModel):
+    start_at: Optional[int] = 0  # timestamp
+    src_locs: List[Tuple[float, float]]
+    dst_locs: List[Tuple[float, float]]
+    mode: Optional[str] = 'driving'  # 'walking', 'driving' or 'cycling'
+
+
+class IsochroneRequest(BaseModel):
+    start_at: Optional[int] = 0  # timestamp
+    src_loc: Tuple[float, float]
+    minutes: float  # travel-time budget
+    mode: Optional[str] = 'driving'  # 'walking', 'driving' or 'cycling'
+    snap: Optional[str] = 'node'  # 'node' or 'edge'
+    output: Optional[str] = 'polygon'  # 'nodes', 'edges' or 'polygon'
+
+
+class ProfileRouteRequest(BaseModel):
+    start_at: int  # window start timestamp
+    end_at: int  # window end timestamp
+    src_loc: Tuple[float, float]
+    dst_loc: Tuple[float, float]
+    step: Optional[int] = 15  # minutes between sampled departures
+    snap: Optional[str] = 'node'  # 'node' or 'edge'
+    summary: Optional[bool] = False  # best departure without the coordinate path
+
+    @validator('end_at')
+    def end_after_start(cls, end_at, values):
+        if 'start_at' in values and end_at < values['start_at']:
+            raise ValueError('end_at must not be earlier than start_at')
+        return end_at
 
 
 class SaveRoutePlanRequest(BaseModel):
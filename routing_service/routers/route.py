@@ -1,7 +1,15 @@
-from typing import List
+from typing import List, Literal, Optional
 from fastapi import APIRouter, Depends, Query
-from routing_service.models.api_route import SearchRouteRequest
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from routing_service.models.api_route import (
+    Algorithm, Mode, SearchRouteRequest, RouteBatchRequest, RouteMatrixRequest, IsochroneRequest,
+    ProfileRouteRequest
+)
 from routing_service.services import routing
+from routing_service.services.pool import route_pool
+from routing_service.cache.route import route_cache
+from routing_service.cache.traffic import traffic_graph_cache
 
 
 router = APIRouter()
@@ -11,13 +19,25 @@ async def get_search_request(
     start_at: int = 0,
     end_at: int = 0,
     src_loc: List[float] = Query(...),
-    dst_loc: List[float] = Query(...)
+    dst_loc: List[float] = Query(...),
+    snap: str = 'node',
+    algorithm: Algorithm = 'A*',
+    modes: List[Mode] = Query(['walking', 'driving', 'cycling']),
+    summary: bool = False,
+    alternatives: int = 0,
+    corridor: Optional[Literal['ellipse', 'bbox']] = None
 ) -> SearchRouteRequest:
     return SearchRouteRequest(
         start_at=start_at,
         end_at=end_at,
         src_loc=tuple(src_loc),
-        dst_loc=tuple(dst_loc)
+        dst_loc=tuple(dst_loc),
+        snap=snap,
+        algorithm=algorithm,
+        modes=modes,
+        summary=summary,
+        alternatives=alternatives,
+        corridor=corridor
     )
 
 
@@ -25,3 +45,89 @@ async def get_search_request(
 async def search(req: SearchRouteRequest = Depends(get_search_request)):
     routes = await routing.history(req)
     return routes
+
+
+@router.post("/search/batch")
+async def search_batch(req: RouteBatchRequest):
+    return await routing.batch(req)
+
+
+async def get_profile_request(
+    start_at: int,
+    end_at: int,
+    src_loc: List[float] = Query(...),
+    dst_loc: List[float] = Query(...),
+    step: int = 15,
+    snap: str = 'node',
+    summary: bool = False
+) -> ProfileRouteRequest:
+    try:
+        return ProfileRouteRequest(
+            start_at=start_at,
+            end_at=end_at,
+            src_loc=tuple(src_loc),
+            dst_loc=tuple(dst_loc),
+            step=step,
+            snap=snap,
+            summary=summary
+        )
+    except ValidationError as e:
+        # model-level checks (e.g. the window order) are client errors too
+        raise RequestValidationError(e.errors())
+
+
+@router.get("/profile")
+async def profile(req: ProfileRouteRequest = Depends(get_profile_request)):
+    return await routing.departure_profile(req)
+
+
+@router.get("/pool")
+async def pool_stats():
+    return route_pool.stats()
+
+
+@router.get("/cache")
+async def cache_stats():
+    return {"routes": route_cache.stats(), **traffic_graph_cache.stats()}
+
+
+async def get_matrix_request(
+    start_at: int = 0,
+    src_locs: List[float] = Query(...),  # flat lon, lat pairs
+    dst_locs: List[float] = Query(...),
+    mode: Mode = 'driving'
+) -> RouteMatrixRequest:
+    return RouteMatrixRequest(
+        start_at=start_at,
+        src_locs=list(zip(src_locs[0::2], src_locs[1::2])),
+        dst_locs=list(zip(dst_locs[0::2], dst_locs[1::2])),
+        mode=mode
+    )
+
+
+@router.get("/matrix")
+async def matrix(req: RouteMatrixRequest = Depends(get_matrix_request)):
+    return await routing.matrix(req)
+
+
+async def get_isochrone_request(
+    minutes: float,
+    start_at: int = 0,
+    src_loc: List[float] = Query(...),
+    mode: Mode = 'driving',
+    snap: str = 'node',
+    output: Literal['nodes', 'edges', 'polygon'] = 'polygon'
+) -> IsochroneRequest:
+    return IsochroneRequest(
+        start_at=start_at,
+        src_loc=tuple(src_loc),
+        minutes=minutes,
+        mode=mode,
+        snap=snap,
+        output=output
+    )
+
+
+@router.get("/isochrone")
+async def isochrone(req: IsochroneRequest = Depends(get_isochrone_request)):
+    return await routing.isochrone(req)
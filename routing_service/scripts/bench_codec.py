@@ -0,0 +1,68 @@
+"""
+Compare the cache codecs on a real traffic slice: encoded size, encode and decode
+time of the node-link graph from traffic_service and of its compact topology and
+weights payloads (see TrafficGraphCache).
+
+    python -m routing_service.scripts.bench_codec [graph.json] [--repeat N]
+
+Without a file the current slice is fetched from traffic_service.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from itertools import product
+from utils.codec import Codec, FORMATS, COMPRESSIONS, available_format, available_compression
+from routing_service.services.graph import RoadGraph
+from routing_service.cache.traffic import TrafficGraphCache
+
+
+def _best_of(repeat: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _codecs():
+    for fmt, compression in product(FORMATS, COMPRESSIONS):
+        try:
+            available_format(fmt)
+            available_compression(compression)
+        except RuntimeError:
+            continue
+        yield f"{fmt}+{compression}", Codec(fmt, compression, min_size=0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("graph", nargs="?", help="node-link JSON of a traffic slice")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.graph:
+        with open(args.graph) as f:
+            data = json.load(f)
+    else:
+        data = asyncio.run(TrafficGraphCache.load_traffic_data())
+    graph = RoadGraph.from_node_link(data)
+    values = {
+        "node-link": data,
+        "topology": graph.topology_payload(),
+        "slice": graph.weights_payload(),
+    }
+    print(f"{graph.number_of_nodes} nodes, {graph.number_of_edges} edges")
+    print(f"{'value':<10} {'codec':<16} {'bytes':>12} {'encode ms':>10} {'decode ms':>10}")
+    for name, value in values.items():
+        for label, codec in _codecs():
+            encoded = codec.encode(value)
+            encode = _best_of(args.repeat, codec.encode, value)
+            decode = _best_of(args.repeat, codec.decode, encoded)
+            print(f"{name:<10} {label:<16} {len(encoded):>12} {encode * 1e3:>10.1f} {decode * 1e3:>10.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import os
+import math
+import logging
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from utils.load import ALT_LANDMARKS, ALT_ACTIVE_LANDMARKS
+from routing_service.services import search
+from routing_service.services.graph import RoadGraph
+from routing_service.services.store import ArtefactStore
+
+
+INF = float("inf")
+
+
+class LandmarkTables:
+    """
+    ALT (A*, Landmarks, Triangle inequality) preprocessing for one cost attribute:
+      - landmarks: node indices spread around the border of the network.
+      - forward[v, l]: cost from landmark l to node v.
+      - backward[v, l]: cost from node v to landmark l.
+    Tables are float32 (inf where unreachable) and node-major, both directions side
+    by side in one row, so the bounds of a node read a single row; they are lowered
+    by `slack` so float32 rounding never makes them inadmissible.
+    """
+    def __init__(self, landmarks: np.ndarray, forward: np.ndarray, backward: np.ndarray) -> None:
+        """
+        :param landmarks: Landmark node indices.
+        :param forward: Landmark-major costs from every landmark, shape (landmarks, nodes).
+        :param backward: Landmark-major costs to every landmark; may be `forward` itself.
+        """
+        self.landmarks = landmarks
+        if backward is forward:
+            self._rows = np.ascontiguousarray(forward.T)
+            self.forward = self.backward = self._rows
+        else:
+            self._rows = np.ascontiguousarray(np.concatenate([forward, backward]).T)
+            self.forward, self.backward = self._rows[:, :len(landmarks)], self._rows[:, len(landmarks):]
+        finite = np.concatenate([forward[np.isfinite(forward)], backward[np.isfinite(backward)]])
+        top = float(finite.max()) if len(finite) else 0.0
+        self.slack = 4 * float(np.spacing(np.float32(top)))
+        # stands in for "cannot reach": larger than any finite bound, keeps potentials finite
+        self.unreachable = 2 * top + 1.0
+
+    @property
+    def nbytes(self) -> int:
+        return self.landmarks.nbytes + self._rows.nbytes
+
+    @staticmethod
+    def _select_landmarks(graph: RoadGraph, count: int) -> np.ndarray:
+        """
+        Planar selection: split the plane into `count` angular sectors around the
+        centre of the network and take the farthest junction of each sector.
+        """
+        xy = graph.xy
+        candidates = np.flatnonzero(~np.isnan(xy).any(axis=1) & (graph.degree >= 3))
+        if len(candidates) < count:
+            candidates = np.flatnonzero(~np.isnan(xy).any(axis=1))
+        offset = xy[candidates] - np.median(xy[candidates], axis=0)
+        sector = ((np.arctan2(offset[:, 1], offset[:, 0]) + math.pi) / (2 * math.pi) * count).astype(np.int64)
+        radius = np.hypot(offset[:, 0], offset[:, 1])
+        landmarks = []
+        for s in range(count):
+            in_sector = np.flatnonzero(sector % count == s)
+            if len(in_sector):
+                landmarks.append(candidates[in_sector[np.argmax(radius[in_sector])]])
+        return np.asarray(landmarks, dtype=np.int64)
+
+    @staticmethod
+    def _is_symmetric(graph: RoadGraph, cost: np.ndarray) -> bool:
+        n = graph.number_of_nodes
+        keys = graph.sources.astype(np.int64) * n + graph.targets
+        reverse = graph.targets.astype(np.int64) * n + graph.sources
+        by_key, by_reverse = np.argsort(keys, kind="stable"), np.argsort(reverse, kind="stable")
+        return bool(np.array_equal(keys[by_key], reverse[by_reverse])
+                    and np.array_equal(cost[by_key], cost[by_reverse]))
+
+    @classmethod
+    def build(cls, graph: RoadGraph, attr: str, count: int = ALT_LANDMARKS) -> "LandmarkTables":
+        """
+        Select landmarks and run one Dijkstra from and one to every landmark.
+        On a symmetric graph (e.g. RoadGraph.undirected) both tables are the same array.
+
+        :param graph: Road graph carrying the cost attribute.
+        :param attr: Edge cost attribute.
+        :param count: Number of landmarks.
+        """
+        start = time.perf_counter()
+        landmarks = cls._select_landmarks(graph, count)
+        adjacency = graph.adjacency(attr)
+        forward = np.empty((len(landmarks), graph.number_of_nodes), dtype=np.float32)
+        for row, landmark in enumerate(landmarks.tolist()):
+            forward[row] = search.shortest_distances(adjacency, {landmark: 0.0})
+        if cls._is_symmetric(graph, graph.cost(attr)):
+            backward = forward
+        else:
+            reverse = graph.reverse_adjacency(attr)
+            backward = np.empty_like(forward)
+            for row, landmark in enumerate(landmarks.tolist()):
+                backward[row] = search.shortest_distances(reverse, {landmark: 0.0})
+        logging.info(
+            f"Landmark tables for '{attr}' built in {time.perf_counter() - start:.1f}s: "
+            f"{len(landmarks)} landmarks, {forward.nbytes * (1 if backward is forward else 2) / 2**20:.1f} MiB.")
+        return cls(landmarks, forward, backward)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        if self.backward is self.forward:
+            np.savez(tmp_path, landmarks=self.landmarks, forward=self.forward.T)
+        else:
+            np.savez(tmp_path, landmarks=self.landmarks, forward=self.forward.T, backward=self.backward.T)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LandmarkTables":
+        with np.load(path) as data:
+            forward = data["forward"]
+            backward = data["backward"] if "backward" in data else forward
+            return cls(data["landmarks"], forward, backward)
+
+    def _bounds(self, rows: List[int], seeds: Dict[int, float], towards: bool) -> Callable[[int], float]:
+        """
+        Lower bound of the cost between a node and the nearest seed, for the given landmark rows:
+          towards=True:  dist(v → t) ≥ max(d(v,l) - d(t,l), d(l,t) - d(l,v))
+          towards=False: dist(s → v) ≥ max(d(l,v) - d(l,s), d(s,l) - d(v,l))
+        inf - inf (no information) counts as 0. Bounds are computed on first use and
+        memoized, so a query only pays for the nodes its search reaches.
+        """
+        count = len(self.landmarks) if self.backward is not self.forward else 0
+        # columns of the first and second table within a node row
+        first, second = (count, 0) if towards else (0, count)
+        seeds = [([(first + l, self._rows[node, first + l].item(), second + l, self._rows[node, second + l].item())
+                   for l in rows], extra) for node, extra in seeds.items()]
+        table, unreachable, slack = self._rows, self.unreachable, self.slack
+        memo: Dict[int, float] = {}
+
+        def bound(v: int) -> float:
+            value = memo.get(v)
+            if value is None:
+                row = table[v].tolist()
+                value = INF
+                for columns, extra in seeds:
+                    best = 0.0
+                    # NaN (inf - inf) never compares greater, so it is skipped
+                    for i, first_s, j, second_s in columns:
+                        gap = row[i] - first_s
+                        if gap > best:
+                            best = gap
+                        gap = second_s - row[j]
+                        if gap > best:
+                            best = gap
+                    if best + extra < value:
+                        value = best + extra
+                value = max((unreachable if value == INF else value) - slack, 0.0)
+                memo[v] = value
+            return value
+        return bound
+
+    def _active_rows(self, sources: Dict[int, float], targets: Dict[int, float], k: int) -> List[int]:
+        """
+        The k landmarks giving the best source → target lower bound for this query.
+        """
+        s, t = next(iter(sources)), next(iter(targets))
+        with np.errstate(invalid="ignore"):
+            bound = np.fmax(self.backward[s] - self.backward[t], self.forward[t] - self.forward[s])
+        bound = np.nan_to_num(bound, nan=0.0, posinf=0.0)
+        return np.argsort(-bound, kind="stable")[:k].tolist()
+
+    def heuristic(
+            self,
+            sources: Dict[int, float],
+            targets: Dict[int, float],
+            active: int = ALT_ACTIVE_LANDMARKS
+    ) -> Callable[[int], float]:
+        """
+        Consistent lower bound of the remaining cost to the targets (including their
+        exit costs), using the `active` most useful landmarks.
+
+        :return: h(node), computed lazily for the nodes the search reaches.
+        """
+        return self._bounds(self._active_rows(sources, targets, active), targets, towards=True)
+
+    def potential(
+            self,
+            sources: Dict[int, float],
+            targets: Dict[int, float],
+            active: int = ALT_ACTIVE_LANDMARKS
+    ) -> Callable[[int], float]:
+        """
+        Average potential (h_target - h_source) / 2 for bidirectional search.
+        """
+        rows = self._active_rows(sources, targets, active)
+        to_target = self._bounds(rows, targets, towards=True)
+        from_source = self._bounds(rows, sources, towards=False)
+        return lambda v: 0.5 * (to_target(v) - from_source(v))
+
+
+_store: ArtefactStore[LandmarkTables] = ArtefactStore("alt", LandmarkTables.build, LandmarkTables.load)
+
+
+def get_tables(graph: RoadGraph, attr: str, wait: bool = False) -> Optional[LandmarkTables]:
+    """
+    Return the landmark tables of a graph for one cost attribute; None while they
+    are being built in the background (inline when wait=True).
+    'length' only depends on the topology and is persisted; traffic costs are built
+    per slice graph, queued by the first ALT query on that slice.
+    """
+    if attr == "length":
+        return _store.get(graph, attr, wait)
+    return graph.derived(f"alt:{attr}", lambda g: LandmarkTables.build(g, attr), background=not wait)
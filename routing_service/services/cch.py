@@ -0,0 +1,333 @@
+import os
+import logging
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from routing_service.services import search
+from routing_service.services.graph import RoadGraph
+from routing_service.services.store import ArtefactStore
+
+
+INF = float("inf")
+
+
+class CCHStructure:
+    """
+    Metric-independent part of a Customizable Contraction Hierarchy:
+      - rank: elimination order computed from the topology only (nested dissection).
+      - arcs: every (lower, higher) node pair of the chordal supergraph, as a CSR
+        keyed by the lower endpoint (offsets / heads).
+      - triangles: (lower arc x-u, lower arc x-v, upper arc u-v) for every node x and
+        pair of its upper neighbours, grouped by the level of x so a customization
+        can relax one level at a time with vectorized minima.
+    """
+    def __init__(
+            self,
+            rank: np.ndarray,
+            offsets: np.ndarray,
+            heads: np.ndarray,
+            triangles: np.ndarray,
+            level_offsets: np.ndarray
+    ) -> None:
+        self.rank = rank
+        self.offsets = offsets
+        self.heads = heads
+        self.triangles = triangles
+        self.level_offsets = level_offsets
+
+        n = len(rank)
+        self.tails = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+        self._keys = np.minimum(self.tails, heads) * n + np.maximum(self.tails, heads)
+        self._key_order = np.argsort(self._keys)
+        self._offsets_list = offsets.tolist()
+        self._heads_list = heads.tolist()
+        # elimination tree: parent = lowest-ranked upper neighbour
+        by_tail_rank = np.lexsort((rank[heads], self.tails))
+        first = by_tail_rank[np.searchsorted(self.tails[by_tail_rank], np.arange(n))[np.diff(offsets) > 0]]
+        parent = np.full(n, -1, dtype=np.int64)
+        parent[self.tails[first]] = heads[first]
+        self._parent = parent.tolist()
+        self._rank_list = rank.tolist()
+
+    @property
+    def number_of_arcs(self) -> int:
+        return len(self.heads)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.rank, self.offsets, self.heads, self.triangles, self.level_offsets,
+                  self.tails, self._keys, self._key_order)
+        return sum(a.nbytes for a in arrays)
+
+    @staticmethod
+    def _dissection_order(graph: RoadGraph, leaf_size: int = 16) -> List[int]:
+        """
+        Geometric nested dissection: recursively cut the node set at the median of its
+        longer axis and move the endpoints of the cut edges (the separator) to the end
+        of the order, so separators end up at the top of the hierarchy.
+        """
+        xy = np.nan_to_num(graph.xy)
+        n = graph.number_of_nodes
+        sources = graph.sources.astype(np.int64)
+        targets = graph.targets.astype(np.int64)
+        side = np.zeros(n, dtype=np.int64)
+        order: List[np.ndarray] = []
+        stack = [(np.arange(n, dtype=np.int64), False)]
+        while stack:
+            nodes, emit = stack.pop()
+            if emit or len(nodes) <= leaf_size:
+                order.append(nodes)
+                continue
+            extent = xy[nodes].max(axis=0) - xy[nodes].min(axis=0)
+            coord = xy[nodes, int(np.argmax(extent))]
+            left = coord <= np.median(coord)
+            if left.all() or not left.any():
+                order.append(nodes)
+                continue
+            # side: 0 outside this cell, 1 left half, 2 right half
+            side[nodes] = np.where(left, 1, 2)
+            cut = (side[sources] == 1) & (side[targets] == 2) | (side[sources] == 2) & (side[targets] == 1)
+            separator = np.zeros(n, dtype=bool)
+            separator[np.where(side[sources[cut]] == 1, sources[cut], targets[cut])] = True
+            side[nodes] = 0
+            # processed in LIFO order: separator is emitted after both halves
+            stack.append((nodes[separator[nodes]], True))
+            stack.append((nodes[left & ~separator[nodes]], False))
+            stack.append((nodes[~left & ~separator[nodes]], False))
+        return np.concatenate(order).tolist() if order else []
+
+    @classmethod
+    def build(cls, graph: RoadGraph) -> "CCHStructure":
+        """
+        Eliminate nodes in nested-dissection order on the undirected topology,
+        turning the neighbourhood of every eliminated node into a clique.
+        No witness searches: the result is valid for any metric.
+        """
+        start = time.perf_counter()
+        n = graph.number_of_nodes
+        adj: List[set] = [set() for _ in range(n)]
+        for u, v in zip(graph.sources.tolist(), graph.targets.tolist()):
+            if u != v:
+                adj[u].add(v)
+                adj[v].add(u)
+
+        rank = np.full(n, -1, dtype=np.int64)
+        upper: List[List[int]] = [[] for _ in range(n)]
+        for order, u in enumerate(cls._dissection_order(graph)):
+            nbrs = list(adj[u])
+            for v in nbrs:
+                adj[v].discard(u)
+            for i, v in enumerate(nbrs):
+                for w in nbrs[i + 1:]:
+                    if w not in adj[v]:
+                        adj[v].add(w)
+                        adj[w].add(v)
+            upper[u] = nbrs
+            adj[u] = set()
+            rank[u] = order
+
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(nbrs) for nbrs in upper], out=offsets[1:])
+        heads = np.fromiter((v for nbrs in upper for v in nbrs), dtype=np.int64, count=int(offsets[-1]))
+        arc_of = {}
+        for u in range(n):
+            for i in range(offsets[u], offsets[u + 1]):
+                arc_of[(u, int(heads[i]))] = i
+
+        by_rank = np.argsort(rank)
+        level = np.zeros(n, dtype=np.int64)
+        triangles = []
+        for x in by_rank.tolist():
+            nbrs = sorted(upper[x], key=lambda v: rank[v])
+            for i, u in enumerate(nbrs):
+                level[u] = max(level[u], level[x] + 1)
+                for v in nbrs[i + 1:]:
+                    triangles.append((level[x], arc_of[(x, u)], arc_of[(x, v)], arc_of[(u, v)]))
+
+        triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 4)
+        triangles = triangles[np.argsort(triangles[:, 0], kind="stable")]
+        level_offsets = np.searchsorted(triangles[:, 0], np.arange(int(level.max(initial=0)) + 2))
+        structure = cls(rank, offsets, heads, np.ascontiguousarray(triangles[:, 1:]), level_offsets)
+        logging.info(
+            f"CCH structure built in {time.perf_counter() - start:.1f}s: {n} nodes, "
+            f"{structure.number_of_arcs} arcs, {len(triangles)} triangles, {len(level_offsets) - 1} levels.")
+        return structure
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, rank=self.rank, offsets=self.offsets, heads=self.heads,
+                 triangles=self.triangles, level_offsets=self.level_offsets)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CCHStructure":
+        with np.load(path) as data:
+            return cls(data["rank"], data["offsets"], data["heads"], data["triangles"], data["level_offsets"])
+
+    def arc_ids(self, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """
+        Vectorized lookup of the arc joining every (u, v) pair.
+        """
+        n = len(self.rank)
+        keys = np.minimum(u, v).astype(np.int64) * n + np.maximum(u, v)
+        pos = np.searchsorted(self._keys, keys, sorter=self._key_order)
+        return self._key_order[pos]
+
+    def customize(self, graph: RoadGraph, attr: str) -> "CCHMetric":
+        """
+        Apply one metric: seed arc weights from the graph edges, then relax the
+        lower triangles level by level so every arc holds its shortest shortcut.
+
+        :param graph: Directed graph with the same topology the structure was built from.
+        :param attr: Edge cost attribute ('time' or 'weight').
+        """
+        start = time.perf_counter()
+        m = self.number_of_arcs
+        up = np.full(m, INF)  # cost lower → higher endpoint
+        down = np.full(m, INF)  # cost higher → lower endpoint
+        mid_up = np.full(m, -1, dtype=np.int64)
+        mid_down = np.full(m, -1, dtype=np.int64)
+
+        sources, targets = graph.sources.astype(np.int64), graph.targets.astype(np.int64)
+        keep = sources != targets
+        sources, targets, cost = sources[keep], targets[keep], graph.columns[attr][keep]
+        arcs = self.arc_ids(sources, targets)
+        upward = self.rank[sources] < self.rank[targets]
+        np.minimum.at(up, arcs[upward], cost[upward])
+        np.minimum.at(down, arcs[~upward], cost[~upward])
+
+        lowest = self.tails
+        for lo, hi in zip(self.level_offsets[:-1].tolist(), self.level_offsets[1:].tolist()):
+            if lo == hi:
+                continue
+            a, b, c = self.triangles[lo:hi].T
+            x = lowest[a]
+            # u → x → v improves arc u-v upwards, v → x → u downwards
+            for weights, middle, candidate in (
+                    (up, mid_up, down[a] + up[b]),
+                    (down, mid_down, down[b] + up[a])
+            ):
+                np.minimum.at(weights, c, candidate)
+                hit = (candidate == weights[c]) & (candidate < INF)
+                middle[c[hit]] = x[hit]
+
+        logging.info(f"CCH customized for '{attr}' in {time.perf_counter() - start:.2f}s.")
+        return CCHMetric(self, up, down, mid_up, mid_down)
+
+
+class CCHMetric:
+    """
+    A CCHStructure customized with one slice's edge weights. Queries sweep the
+    elimination-tree ancestors of the endpoints (exactly the upward search space,
+    no priority queue needed) and unpack arcs through their middle nodes.
+    """
+    def __init__(
+            self,
+            structure: CCHStructure,
+            up: np.ndarray,
+            down: np.ndarray,
+            mid_up: np.ndarray,
+            mid_down: np.ndarray
+    ) -> None:
+        self.structure = structure
+        self.up = up
+        self.down = down
+        self.mid_up = mid_up
+        self.mid_down = mid_down
+        self._forward = (structure._offsets_list, structure._heads_list, up.tolist())
+        self._backward = (structure._offsets_list, structure._heads_list, down.tolist())
+
+    @property
+    def nbytes(self) -> int:
+        # arrays plus the two list mirrors used by the query loop
+        return sum(a.nbytes for a in (self.up, self.down, self.mid_up, self.mid_down)) + 64 * len(self.up)
+
+    def query(self, sources: Dict[int, float], targets: Dict[int, float]) -> Tuple[List[int], float]:
+        """
+        :param sources: {node index: initial cost}.
+        :param targets: {node index: exit cost}.
+        :return: (unpacked node indices, cost); ([], inf) when unreachable.
+        """
+        dist_f, pred_f = self._sweep(self._forward, sources)
+        dist_b, pred_b = self._sweep(self._backward, targets)
+        best, meet = INF, -1
+        for node, d in dist_f.items():
+            total = d + dist_b.get(node, INF)
+            if total < best:
+                best, meet = total, node
+        if meet < 0:
+            return [], INF
+        up = search.predecessor_chain(pred_f, meet)
+        up.reverse()
+        return self._unpack(up + search.predecessor_chain(pred_b, meet)[1:]), best
+
+    def _sweep(
+            self,
+            arcs: Tuple[List[int], List[int], List[float]],
+            seeds: Dict[int, float]
+    ) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """
+        Relax the upward arcs of all elimination-tree ancestors of the seeds in rank order.
+        """
+        parent, rank = self.structure._parent, self.structure._rank_list
+        ancestors = set()
+        for node in seeds:
+            while node >= 0 and node not in ancestors:
+                ancestors.add(node)
+                node = parent[node]
+        offsets, heads, cost = arcs
+        dist = dict(seeds)
+        pred: Dict[int, int] = {}
+        for u in sorted(ancestors, key=rank.__getitem__):
+            d = dist.get(u)
+            if d is None:
+                continue
+            for i in range(offsets[u], offsets[u + 1]):
+                v = heads[i]
+                nd = d + cost[i]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    pred[v] = u
+        return dist, pred
+
+    def _unpack(self, nodes: List[int]) -> List[int]:
+        """
+        Replace every arc on a node sequence by the original nodes it bypasses.
+        """
+        rank = self.structure.rank
+        result = nodes[:1]
+        stack = [(a, b) for a, b in zip(nodes[-2::-1], nodes[:0:-1])]
+        while stack:
+            a, b = stack.pop()
+            arc = int(self.structure.arc_ids(np.array([a]), np.array([b]))[0])
+            m = self.mid_up[arc] if rank[a] < rank[b] else self.mid_down[arc]
+            if m < 0:
+                result.append(b)
+            else:
+                stack.append((int(m), b))
+                stack.append((a, int(m)))
+        return result
+
+
+_store: ArtefactStore[CCHStructure] = ArtefactStore(
+    "cch", lambda graph, attr: CCHStructure.build(graph), CCHStructure.load)
+
+
+def get_structure(graph: RoadGraph, wait: bool = False) -> Optional[CCHStructure]:
+    """
+    Return the metric-independent CCH of a graph's topology;
+    None while it is still being built in the background.
+    """
+    return _store.get(graph, None, wait)
+
+
+def get_metric(graph: RoadGraph, attr: str, wait: bool = False) -> Optional[CCHMetric]:
+    """
+    Return the CCH customized with a slice's weights, customizing at most once per
+    graph and attribute; None while the structure is not available yet.
+    """
+    structure = get_structure(graph, wait)
+    if structure is None:
+        return None
+    return graph.derived(f"cch:{attr}", lambda g: structure.customize(g, attr))
@@ -0,0 +1,199 @@
+import os
+import heapq
+import logging
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from routing_service.services import search
+from routing_service.services.graph import RoadGraph
+from routing_service.services.store import ArtefactStore
+
+
+INF = float("inf")
+
+
+class ContractionHierarchy:
+    """
+    Contraction Hierarchy over a symmetric (undirected) graph:
+      - rank: contraction order of every node.
+      - offsets / targets / cost / middle: CSR of upward edges (towards higher rank);
+        middle is the contracted node a shortcut bypasses, -1 for original edges.
+    Since the graph is symmetric a single upward graph serves both query directions.
+    """
+    def __init__(
+            self,
+            rank: np.ndarray,
+            offsets: np.ndarray,
+            targets: np.ndarray,
+            cost: np.ndarray,
+            middle: np.ndarray
+    ) -> None:
+        self.rank = rank
+        self.offsets = offsets
+        self.targets = targets
+        self.cost = cost
+        self.middle = middle
+
+        self._up = (offsets.tolist(), targets.tolist(), cost.tolist())
+        self._middle = middle.tolist()
+        n = len(rank)
+        tails = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+        keys = np.minimum(tails, targets) * n + np.maximum(tails, targets)
+        self._edge_of = dict(zip(keys.tolist(), range(len(targets))))
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.rank, self.offsets, self.targets, self.cost, self.middle)
+        return sum(a.nbytes for a in arrays) + 100 * len(self.targets)
+
+    @classmethod
+    def build(cls, graph: RoadGraph, attr: str = "length", settle_limit: int = 128) -> "ContractionHierarchy":
+        """
+        Contract nodes in lazy edge-difference order, adding a shortcut whenever a
+        bounded witness search cannot prove a path that avoids the contracted node.
+
+        :param graph: Symmetric graph, e.g. RoadGraph.undirected.
+        :param attr: Edge cost attribute.
+        :param settle_limit: Nodes settled per witness search before giving up
+                             (extra shortcuts are harmless, only slightly slower).
+        """
+        start = time.perf_counter()
+        n = graph.number_of_nodes
+        adj: List[Dict[int, float]] = [dict() for _ in range(n)]
+        for u, v, c in zip(graph.sources.tolist(), graph.targets.tolist(), graph.columns[attr].tolist()):
+            if u != v and c < adj[u].get(v, INF):
+                adj[u][v] = c
+                adj[v][u] = c
+        middle: Dict[Tuple[int, int], int] = {}
+
+        def witness_search(source: int, skip: int, limit: float) -> Dict[int, float]:
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap and settled < settle_limit:
+                d, u = heapq.heappop(heap)
+                if d > limit:
+                    break
+                if d > dist[u]:
+                    continue
+                settled += 1
+                for v, c in adj[u].items():
+                    nd = d + c
+                    if v != skip and nd < dist.get(v, INF):
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+            return dist
+
+        def shortcuts(u: int) -> List[Tuple[int, int, float]]:
+            items = list(adj[u].items())
+            result = []
+            for i, (v, cv) in enumerate(items[:-1]):
+                wanted = [(w, cv + cw) for w, cw in items[i + 1:]]
+                dist = witness_search(v, u, max(c for _, c in wanted))
+                result.extend((v, w, c) for w, c in wanted if dist.get(w, INF) > c)
+            return result
+
+        deleted = [0] * n
+
+        def priority(u: int) -> int:
+            return len(shortcuts(u)) - len(adj[u]) + deleted[u]
+
+        heap = [(priority(u), u) for u in range(n)]
+        heapq.heapify(heap)
+        rank = np.full(n, -1, dtype=np.int64)
+        up_tails, up_heads, up_cost, up_middle = [], [], [], []
+        order = 0
+        while heap:
+            _, u = heapq.heappop(heap)
+            if rank[u] >= 0:
+                continue
+            # lazy update: re-evaluate and postpone if no longer the cheapest
+            needed = shortcuts(u)
+            p = len(needed) - len(adj[u]) + deleted[u]
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, u))
+                continue
+
+            for v, w, c in needed:
+                if c < adj[v].get(w, INF):
+                    adj[v][w] = c
+                    adj[w][v] = c
+                    middle[(min(v, w), max(v, w))] = u
+            for v, c in adj[u].items():
+                up_tails.append(u)
+                up_heads.append(v)
+                up_cost.append(c)
+                up_middle.append(middle.get((min(u, v), max(u, v)), -1))
+                del adj[v][u]
+                deleted[v] += 1
+            adj[u] = {}
+            rank[u] = order
+            order += 1
+
+        tails = np.asarray(up_tails, dtype=np.int64)
+        order_idx = np.argsort(tails, kind="stable")
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=n), out=offsets[1:])
+        hierarchy = cls(
+            rank,
+            offsets,
+            np.asarray(up_heads, dtype=np.int64)[order_idx],
+            np.asarray(up_cost, dtype=np.float64)[order_idx],
+            np.asarray(up_middle, dtype=np.int64)[order_idx],
+        )
+        logging.info(
+            f"Contraction hierarchy built in {time.perf_counter() - start:.1f}s: "
+            f"{n} nodes, {len(tails)} upward edges ({len(tails) - graph.number_of_edges // 2} net shortcuts).")
+        return hierarchy
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, rank=self.rank, offsets=self.offsets, targets=self.targets,
+                 cost=self.cost, middle=self.middle)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ContractionHierarchy":
+        with np.load(path) as data:
+            return cls(data["rank"], data["offsets"], data["targets"], data["cost"], data["middle"])
+
+    def query(self, sources: Dict[int, float], targets: Dict[int, float]) -> Tuple[List[int], float]:
+        """
+        Two upward Dijkstra searches meeting at the highest-ranked node of the path.
+
+        :param sources: {node index: initial cost}.
+        :param targets: {node index: exit cost}.
+        :return: (unpacked node indices, cost); ([], inf) when unreachable.
+        """
+        nodes, cost = search.upward_search(self._up, self._up, sources, targets)
+        return self._unpack(nodes), cost
+
+    def _unpack(self, nodes: List[int]) -> List[int]:
+        """
+        Replace every shortcut on a node sequence by the original nodes it bypasses.
+        """
+        n = len(self.rank)
+        result = nodes[:1]
+        stack = [(a, b) for a, b in zip(nodes[-2::-1], nodes[:0:-1])]
+        while stack:
+            a, b = stack.pop()
+            m = self._middle[self._edge_of[min(a, b) * n + max(a, b)]]
+            if m < 0:
+                result.append(b)
+            else:
+                stack.append((m, b))
+                stack.append((a, m))
+        return result
+
+
+_store: ArtefactStore[ContractionHierarchy] = ArtefactStore(
+    "ch", lambda graph, attr: ContractionHierarchy.build(graph, attr), ContractionHierarchy.load)
+
+
+def get_hierarchy(graph: RoadGraph, attr: str = "length", wait: bool = False) -> Optional[ContractionHierarchy]:
+    """
+    Return the contraction hierarchy of a symmetric graph, keyed by its topology;
+    None while it is still being built in the background.
+    """
+    return _store.get(graph, attr, wait)
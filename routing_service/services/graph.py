@@ -0,0 +1,446 @@
+import math
+import base64
+import hashlib
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.load import UNKNOWN_ROAD_SPEED
+from utils.distance import equirectangular
+
+
+EDGE_ATTRIBUTES = ("length", "time", "weight", "speed")
+# attributes that change with traffic; 'length' belongs to the topology
+SLICE_ATTRIBUTES = ("time", "weight", "speed")
+
+# one worker for every background build of derived structures, so slices queue up
+# instead of each starting its own thread
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="derived")
+
+
+def _decode(value, dtype) -> np.ndarray:
+    """
+    Payload array as stored by the cache codec; base64 text in entries written
+    before arrays were passed through the codec.
+    """
+    if isinstance(value, str):
+        return np.frombuffer(base64.b64decode(value), dtype=dtype)
+    return np.asarray(value, dtype=dtype)
+
+
+def _as_float(value) -> float:
+    """
+    Coerce an edge attribute to a finite float.
+    Missing traffic rows arrive as None/NaN; they become 0 like the roads without a
+    speed reading of traffic_service (see _fill_unknown_speed()).
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if math.isfinite(value) else 0.0
+
+
+def _fill_unknown_speed(columns: Dict[str, np.ndarray]) -> int:
+    """
+    traffic_service reports travel time 0 for roads without a speed reading; when
+    UNKNOWN_ROAD_SPEED is set, give those edges that speed instead of letting
+    searches cross them for free. Unset keeps the reported zeros.
+
+    :return: Number of edges filled.
+    """
+    if not UNKNOWN_ROAD_SPEED:
+        return 0
+    unknown = ~(columns["time"] > 0) & (columns["length"] > 0)
+    columns["speed"][unknown] = UNKNOWN_ROAD_SPEED
+    columns["time"][unknown] = columns["length"][unknown] / (UNKNOWN_ROAD_SPEED / 3.6)
+    return int(unknown.sum())
+
+
+class RoadGraph:
+    """
+    Compact, array-backed directed road graph in CSR layout:
+      - node_ids / coords: original node id and (lon, lat) for every node index.
+      - offsets / targets: outgoing edges of node i are targets[offsets[i]:offsets[i+1]].
+      - columns: one float64 array per edge attribute (length, time, weight, speed),
+        aligned with targets; road_ids likewise.
+    Instances are read-only once built and can be shared across planners and requests.
+    """
+    def __init__(
+            self,
+            node_ids: np.ndarray,
+            coords: np.ndarray,
+            sources: np.ndarray,
+            targets: np.ndarray,
+            columns: Dict[str, np.ndarray],
+            road_ids: np.ndarray
+    ) -> None:
+        """
+        :param node_ids: Original node ids, shape (N,).
+        :param coords: Node positions (lon, lat), shape (N, 2).
+        :param sources: Tail node index of every edge, shape (E,).
+        :param targets: Head node index of every edge, shape (E,).
+        :param columns: Edge attribute arrays, each of shape (E,).
+        :param road_ids: Road id of every edge, shape (E,).
+        """
+        n = len(node_ids)
+        order = np.argsort(sources, kind="stable")
+        self.node_ids = np.ascontiguousarray(node_ids, dtype=np.int64)
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(n, 2)
+        self.sources = np.ascontiguousarray(sources[order], dtype=np.int32)
+        self.targets = np.ascontiguousarray(targets[order], dtype=np.int32)
+        self.columns = {
+            attr: np.ascontiguousarray(columns[attr][order], dtype=np.float64)
+            for attr in columns
+        }
+        self.road_ids = np.ascontiguousarray(road_ids[order], dtype=np.int64)
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=n), out=self.offsets[1:])
+
+        self._index = {node_id: i for i, node_id in enumerate(self.node_ids.tolist())}
+        self._adjacency: Dict[str, Tuple[List[int], List[int], List[float]]] = {}
+        self._reverse_adjacency: Dict[str, Tuple[List[int], List[int], List[float], List[int]]] = {}
+        self._reverse_order: Optional[np.ndarray] = None
+        self._degree: Optional[np.ndarray] = None
+        self._xy: Optional[np.ndarray] = None
+        self._undirected: Optional["RoadGraph"] = None
+        self._topology_key: Optional[str] = None
+        self._derived: Dict[str, object] = {}
+        self._building = set()
+        self._lock = threading.RLock()
+        # graph of the same topology this one was derived from (see with_weights)
+        self._template: Optional["RoadGraph"] = None
+        # undirected views: position of every edge in the doubled columns of the directed graph
+        self._origin: Optional[np.ndarray] = None
+        for array in (self.node_ids, self.coords, self.sources, self.targets, self.road_ids, self.offsets,
+                      *self.columns.values()):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_node_link(cls, data: dict) -> "RoadGraph":
+        """
+        Build the CSR graph from node-link JSON produced by traffic_service
+        (`json_graph.node_link_data(graph, edges="links")`).
+        """
+        nodes = data.get("nodes") or []
+        links = data.get("links") or []
+        node_ids = np.fromiter((node["id"] for node in nodes), dtype=np.int64, count=len(nodes))
+        coords = np.array(
+            [node.get("pos") or (np.nan, np.nan) for node in nodes],
+            dtype=np.float64
+        ).reshape(len(nodes), 2)
+        index = {node_id: i for i, node_id in enumerate(node_ids.tolist())}
+
+        sources = np.fromiter((index[link["source"]] for link in links), dtype=np.int64, count=len(links))
+        targets = np.fromiter((index[link["target"]] for link in links), dtype=np.int64, count=len(links))
+        columns = {
+            attr: np.fromiter((_as_float(link.get(attr)) for link in links), dtype=np.float64, count=len(links))
+            for attr in ("length", "time", "speed")
+        }
+        unknown = _fill_unknown_speed(columns)
+        # 'weight' is only present when traffic_service ran the GNN; fall back to travel time.
+        has_weight = np.fromiter(("weight" in link for link in links), dtype=bool, count=len(links))
+        columns["weight"] = np.where(has_weight, np.fromiter(
+            (_as_float(link.get("weight")) for link in links), dtype=np.float64, count=len(links)
+        ), columns["time"])
+        road_ids = np.fromiter((int(link.get("road_id") or 0) for link in links), dtype=np.int64, count=len(links))
+
+        graph = cls(node_ids, coords, sources, targets, columns, road_ids)
+        logging.info(
+            f"RoadGraph built with {graph.number_of_nodes} nodes and {graph.number_of_edges} edges"
+            + (f" ({unknown} without a speed reading, priced at {UNKNOWN_ROAD_SPEED:g} km/h)." if unknown else "."))
+        return graph
+
+    def topology_payload(self) -> dict:
+        """
+        Topology (nodes, positions, edges in CSR order, road ids, lengths) as NumPy
+        arrays for the cache codec, stored once per topology version; see
+        from_topology_payload().
+        """
+        return {
+            "version": self.topology_key,
+            "node_ids": self.node_ids,
+            "coords": self.coords,
+            "sources": self.sources,
+            "targets": self.targets,
+            "road_ids": self.road_ids,
+            "length": self.columns["length"],
+        }
+
+    @classmethod
+    def from_topology_payload(cls, payload: dict) -> "RoadGraph":
+        """
+        Rebuild a graph from topology_payload(); traffic attributes start at zero
+        until a slice is attached with with_weights().
+        """
+        node_ids = _decode(payload["node_ids"], "<i8")
+        sources = _decode(payload["sources"], "<i4")
+        zeros = np.zeros(len(sources), dtype=np.float64)
+        columns = {"length": _decode(payload["length"], "<f8"), **{attr: zeros for attr in SLICE_ATTRIBUTES}}
+        return cls(node_ids, _decode(payload["coords"], "<f8"), sources, _decode(payload["targets"], "<i4"),
+                   columns, _decode(payload["road_ids"], "<i8"))
+
+    def weights_payload(self) -> dict:
+        """
+        The traffic attributes of this graph as compact float32 arrays in CSR edge
+        order, tagged with the topology version they belong to and a digest of the
+        arrays, so an unchanged slice is recognised without comparing them.
+        'weight' is left out when it equals 'time' (no GNN).
+        """
+        columns = {
+            attr: self.columns[attr].astype(np.float32)
+            for attr in SLICE_ATTRIBUTES
+            if attr != "weight" or not np.array_equal(self.columns["weight"], self.columns["time"])
+        }
+        digest = hashlib.sha1(self.topology_key.encode())
+        for attr in sorted(columns):
+            digest.update(attr.encode())
+            digest.update(columns[attr].tobytes())
+        return {"topology": self.topology_key, "columns": columns, "digest": digest.hexdigest()[:16]}
+
+    def with_weights(self, payload: dict) -> "RoadGraph":
+        """
+        A graph of the same topology carrying the traffic attributes of weights_payload().
+        Topology arrays and topology-only caches (node index, projection, degrees,
+        reverse order) are shared with this graph instead of being rebuilt.
+        """
+        if payload["topology"] != self.topology_key:
+            raise ValueError(f"Weights of topology {payload['topology']} do not fit {self.topology_key}.")
+        columns = {"length": self.columns["length"]}
+        for attr, values in payload["columns"].items():
+            column = _decode(values, "<f4").astype(np.float64)
+            if len(column) != self.number_of_edges:
+                raise ValueError(f"'{attr}' has {len(column)} values for {self.number_of_edges} edges.")
+            columns[attr] = column
+        columns.setdefault("weight", columns["time"])
+        # computed once on the template, then shared by every slice
+        _ = self.xy, self.degree, self.reverse_adjacency_order
+        graph = self._with_columns(columns)
+        graph._template = self
+        return graph
+
+    def _with_columns(self, columns: Dict[str, np.ndarray]) -> "RoadGraph":
+        for column in columns.values():
+            column.flags.writeable = False
+        graph = RoadGraph.__new__(RoadGraph)
+        graph.__dict__.update(self.__dict__)
+        graph.columns = columns
+        graph._adjacency = {}
+        graph._reverse_adjacency = {}
+        graph._undirected = None
+        graph._derived = {}
+        graph._building = set()
+        graph._lock = threading.RLock()
+        return graph
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def number_of_edges(self) -> int:
+        return len(self.targets)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the arrays of this graph,
+        including its cached undirected view once it has been derived.
+        """
+        arrays = [self.node_ids, self.coords, self.sources, self.targets, self.road_ids, self.offsets]
+        arrays.extend(self.columns.values())
+        if self._xy is not None:
+            arrays.append(self._xy)
+        if self._degree is not None:
+            arrays.append(self._degree)
+        total = sum(a.nbytes for a in arrays)
+        # list mirrors: 8-byte slot per item plus boxed ints/floats (ints are largely shared)
+        total += sum(32 * (len(targets) + len(offsets)) for offsets, targets, _ in self._adjacency.values())
+        total += sum(40 * len(tails) for _, tails, _, _ in self._reverse_adjacency.values())
+        if self._undirected is not None:
+            total += self._undirected.nbytes
+        total += sum(getattr(item, "nbytes", 0) for item in list(self._derived.values()))
+        return total
+
+    @property
+    def xy(self) -> np.ndarray:
+        """
+        Node positions projected to local planar meters, shape (N, 2).
+        """
+        if self._xy is None:
+            self._xy = equirectangular(self.coords[:, 0], self.coords[:, 1])
+        return self._xy
+
+    @property
+    def topology_key(self) -> str:
+        """
+        Fingerprint of everything that does not change with traffic: nodes, positions,
+        edges, road ids and lengths. Used to version artefacts derived from the topology.
+        """
+        if self._topology_key is None:
+            digest = hashlib.sha1()
+            for array in (self.node_ids, self.coords, self.sources, self.targets, self.road_ids,
+                          self.columns["length"]):
+                digest.update(array.tobytes())
+            self._topology_key = digest.hexdigest()[:16]
+        return self._topology_key
+
+    def index_of(self, node_id: int) -> int:
+        """
+        Map an original node id to its array index.
+        """
+        return self._index[node_id]
+
+    def find_edge(self, u: int, v: int) -> int:
+        """
+        Return the CSR index of edge u→v, or -1 when it does not exist.
+        """
+        lo, hi = self.offsets[u], self.offsets[u + 1]
+        hits = np.flatnonzero(self.targets[lo:hi] == v)
+        return int(lo + hits[0]) if len(hits) else -1
+
+    def cost(self, attr: str) -> np.ndarray:
+        """
+        Return the edge cost column for an attribute ('length', 'time', 'weight').
+        """
+        return self.columns[attr]
+
+    def adjacency(self, attr: str) -> Tuple[List[int], List[int], List[float]]:
+        """
+        Flat list mirrors of (offsets, targets, cost) for the heap-based search loops;
+        scalar indexing into Python lists is several times faster than into ndarrays.
+        Built once per attribute.
+        """
+        adjacency = self._adjacency.get(attr)
+        if adjacency is None:
+            adjacency = (self.offsets.tolist(), self.targets.tolist(), self.columns[attr].tolist())
+            self._adjacency[attr] = adjacency
+        return adjacency
+
+    def reverse_adjacency(self, attr: str) -> Tuple[List[int], List[int], List[float], List[int]]:
+        """
+        Flat list mirrors of the incoming-edge CSR: (offsets, tails, cost, edge ids),
+        where the incoming edges of node i are tails[offsets[i]:offsets[i+1]] and
+        edge ids point back into the forward arrays. Built once per attribute.
+        """
+        adjacency = self._reverse_adjacency.get(attr)
+        if adjacency is None:
+            order = self.reverse_adjacency_order
+            offsets = np.zeros(self.number_of_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.targets, minlength=self.number_of_nodes), out=offsets[1:])
+            adjacency = (
+                offsets.tolist(),
+                self.sources[order].tolist(),
+                self.columns[attr][order].tolist(),
+                order.tolist()
+            )
+            self._reverse_adjacency[attr] = adjacency
+        return adjacency
+
+    @property
+    def reverse_adjacency_order(self) -> np.ndarray:
+        """
+        Edge ids sorted by head node: the order of the incoming-edge CSR.
+        """
+        if self._reverse_order is None:
+            self._reverse_order = np.argsort(self.targets, kind="stable")
+        return self._reverse_order
+
+    @property
+    def degree(self) -> np.ndarray:
+        """
+        Number of distinct neighbours (predecessors ∪ successors) of every node.
+        """
+        if self._degree is None:
+            n = self.number_of_nodes
+            lo = np.minimum(self.sources, self.targets).astype(np.int64)
+            hi = np.maximum(self.sources, self.targets).astype(np.int64)
+            pairs = np.unique(lo * n + hi)
+            lo, hi = pairs // n, pairs % n
+            self._degree = (np.bincount(lo, minlength=n) + np.bincount(hi[lo != hi], minlength=n)).astype(np.int32)
+        return self._degree
+
+    @property
+    def undirected(self) -> "RoadGraph":
+        """
+        Undirected view used for FOOT/BIKE routing, derived once per graph
+        and shared read-only by every planner and request.
+        """
+        if self._undirected is None:
+            with self._lock:
+                if self._undirected is None:
+                    if self._template is not None:
+                        # same edge selection as the template's view, only the weights differ
+                        view = self._template.undirected
+                        self._undirected = view._with_columns({
+                            attr: np.concatenate([values, values])[view._origin]
+                            for attr, values in self.columns.items()
+                        })
+                    else:
+                        self._undirected = self.to_undirected()
+        return self._undirected
+
+    def derived(
+            self,
+            name: str,
+            build: Callable[["RoadGraph"], object],
+            background: bool = False
+    ) -> Optional[object]:
+        """
+        Memoize a structure derived from this graph's weights (e.g. a customized
+        hierarchy), built once and shared read-only afterwards.
+
+        :param name: Key of the structure.
+        :param build: Builds the structure from this graph.
+        :param background: Queue the build on the shared background worker and return
+                           None until it is ready, instead of building under the graph lock.
+        """
+        item = self._derived.get(name)
+        if item is not None:
+            return item
+        if background:
+            with self._lock:
+                if name in self._derived or name in self._building:
+                    return self._derived.get(name)
+                self._building.add(name)
+            _background.submit(self._build_derived, name, build)
+            return None
+        with self._lock:
+            item = self._derived.get(name)
+            if item is None:
+                item = build(self)
+                self._derived[name] = item
+        return item
+
+    def _build_derived(self, name: str, build: Callable[["RoadGraph"], object]) -> None:
+        try:
+            self._derived[name] = build(self)
+        except Exception as e:
+            logging.error(f"Building {name} failed: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(name)
+
+    def to_undirected(self) -> "RoadGraph":
+        """
+        Build an undirected copy (every edge usable both ways) with the same node indexing.
+        When both directions of a road exist, the shorter one is kept for the pair.
+        Prefer the cached `undirected` property.
+        """
+        n = self.number_of_nodes
+        sources = np.concatenate([self.sources, self.targets]).astype(np.int64)
+        targets = np.concatenate([self.targets, self.sources]).astype(np.int64)
+        length = np.concatenate([self.columns["length"], self.columns["length"]])
+        keys = sources * n + targets
+        order = np.lexsort((length, keys))
+        _, first = np.unique(keys[order], return_index=True)
+        keep = order[first]
+        columns = {
+            attr: np.concatenate([values, values])[keep]
+            for attr, values in self.columns.items()
+        }
+        road_ids = np.concatenate([self.road_ids, self.road_ids])[keep]
+        graph = RoadGraph(self.node_ids, self.coords, sources[keep], targets[keep], columns, road_ids)
+        graph._origin = keep[np.argsort(sources[keep], kind="stable")]
+        return graph
@@ -0,0 +1,62 @@
+import math
+import logging
+import numpy as np
+from typing import Callable, Tuple
+from utils.distance import equirectangular
+from routing_service.services.graph import RoadGraph
+
+
+class GeometricBound:
+    """
+    Straight-line lower bound of the remaining cost for A*, over the projected node
+    coordinates of one graph and cost attribute: meters / max_speed, where max_speed
+    is the largest straight-line meters per unit of cost over all edges. That keeps
+    the bound admissible and consistent for lengths, seconds or learned weights alike.
+    Built once per graph (see bound()); queries only create a closure.
+    """
+    def __init__(self, graph: RoadGraph, attr: str) -> None:
+        xy = graph.xy
+        self._x = xy[:, 0].tolist()
+        self._y = xy[:, 1].tolist()
+        self._has_nan = bool(np.isnan(xy).any())
+
+        straight = np.hypot(*(xy[graph.sources] - xy[graph.targets]).T)
+        cost = graph.cost(attr)
+        # impassable (infinite cost) edges never bound a finite path
+        moving = np.isfinite(straight) & (straight > 0) & np.isfinite(cost)
+        if (cost[moving] <= 0).any():
+            # free edges admit no speed bound; set UNKNOWN_ROAD_SPEED to price roads without a reading
+            logging.warning(f"Edges with zero '{attr}' but positive length: geometric heuristic disabled.")
+            self.max_speed = math.inf
+        else:
+            self.max_speed = float((straight[moving] / cost[moving]).max()) if moving.any() else math.inf
+        # a hair below 1 / max_speed so float rounding never overestimates
+        self.scale = (1 - 1e-9) / self.max_speed
+
+    def towards(self, point: Tuple[float, float]) -> Callable[[int], float]:
+        """
+        Heuristic h(node) for a fixed (lon, lat) target.
+        """
+        tx, ty = equirectangular(point[0], point[1]).tolist()
+        x, y, scale, hypot = self._x, self._y, self.scale, math.hypot
+        if not self._has_nan:
+            return lambda v: hypot(x[v] - tx, y[v] - ty) * scale
+
+        def h(v: int) -> float:
+            d = hypot(x[v] - tx, y[v] - ty)
+            return d * scale if d == d else 0.0
+        return h
+
+    def potential(self, source: Tuple[float, float], target: Tuple[float, float]) -> Callable[[int], float]:
+        """
+        Average potential (h_target - h_source) / 2 for bidirectional A*.
+        """
+        to_target, from_source = self.towards(target), self.towards(source)
+        return lambda v: 0.5 * (to_target(v) - from_source(v))
+
+
+def bound(graph: RoadGraph, attr: str) -> GeometricBound:
+    """
+    Return the geometric bound of a graph for a cost attribute, built once per graph.
+    """
+    return graph.derived(f"geometric:{attr}", lambda g: GeometricBound(g, attr))
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+from utils.load import ROUTE_WORKERS, ROUTE_QUEUE_DEPTH, ROUTE_SLOW_TASK
+
+
+T = TypeVar("T")
+
+
+class PoolSaturated(RuntimeError):
+    """
+    Raised when a task is submitted while every worker is busy and the queue is full.
+    """
+
+
+class RoutePool:
+    """
+    Bounded thread pool for CPU-bound route computations, so searches never run on
+    the event loop. The graph arrays are shared read-only between workers. Searches
+    are pure-Python heap loops holding the GIL, so the pool provides concurrency and
+    backpressure, not CPU parallelism. At most `workers` tasks run and `queue_depth`
+    more wait; further submissions are rejected instead of piling up. Queue wait and
+    run time of every task are recorded and exposed through stats().
+    """
+    def __init__(self, workers: int = ROUTE_WORKERS, queue_depth: int = ROUTE_QUEUE_DEPTH) -> None:
+        """
+        :param workers: Number of worker threads.
+        :param queue_depth: Tasks allowed to wait for a free worker.
+        """
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="route")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._counters = {"completed": 0, "failed": 0, "rejected": 0, "cancelled": 0, "slow": 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    async def run(self, name: str, fn: Callable[..., T], *args) -> T:
+        """
+        Run fn(*args) on a worker and await its result. Cancelling the awaiting task
+        drops the job if it is still queued; a running job finishes on its worker.
+
+        :param name: Label used in logs.
+        :raise PoolSaturated: When the queue is full.
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                self._counters["rejected"] += 1
+                raise PoolSaturated(f"route pool saturated ({self._pending} tasks pending)")
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._timed, name, time.perf_counter(), fn, args)
+        except Exception:
+            self._release(None)
+            raise
+        # the slot is freed when the job completes or is cancelled before starting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Optional[Future]) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future is not None and future.cancelled():
+                self._counters["cancelled"] += 1
+
+    def _timed(self, name: str, enqueued: float, fn: Callable[..., T], args: tuple) -> T:
+        start = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        failed = False
+        try:
+            return fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            end = time.perf_counter()
+            wait, elapsed = start - enqueued, end - start
+            with self._lock:
+                self._running -= 1
+                self._counters["failed" if failed else "completed"] += 1
+                self._wait_total += wait
+                self._run_total += elapsed
+                self._run_max = max(self._run_max, elapsed)
+                if elapsed >= ROUTE_SLOW_TASK:
+                    self._counters["slow"] += 1
+            if elapsed >= ROUTE_SLOW_TASK:
+                logging.warning(f"Slow route task {name}: waited {wait * 1e3:.0f} ms, ran {elapsed * 1e3:.0f} ms")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Snapshot of the pool configuration, load and task timings.
+        """
+        with self._lock:
+            done = self._counters["completed"] + self._counters["failed"]
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                **self._counters,
+                "avg_wait_ms": round(self._wait_total / done * 1e3, 3) if done else 0.0,
+                "avg_run_ms": round(self._run_total / done * 1e3, 3) if done else 0.0,
+                "max_run_ms": round(self._run_max * 1e3, 3),
+            }
+
+
+route_pool = RoutePool()
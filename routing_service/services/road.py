@@ -1,66 +1,200 @@
 import logging
-import geopandas as gpd
-from typing import Tuple, Optional
-from networkx.readwrite import json_graph
-from utils.distance import euclidean_distance
+import threading
+import numpy as np
+from typing import Tuple, Optional, Sequence, NamedTuple, List
+from utils.distance import equirectangular
+from utils.load import SNAP_MAX_DISTANCE
+from routing_service.services.graph import RoadGraph
+from routing_service.services.spatial import NodeGrid, SegmentTree
+
+
+class EdgeSnap(NamedTuple):
+    """
+    A point projected onto the road segment between two nodes.
+    """
+    tail: int  # node index at fraction 0
+    head: int  # node index at fraction 1
+    fraction: float  # position along tail→head in [0, 1]
+    point: Tuple[float, float]  # projected (lon, lat)
+    distance: float  # meters between the query point and its projection
 
 
 class RoadNetwork:
     """
     Manages a directed road network:
-      - Loads traffic data via RoadDataProcessor.
-      - Optionally applies a GNN to predict or adjust edge weights.
-      - Builds a NetworkX DiGraph with road segments and travel attributes.
+      - Receives the node-link graph cached from traffic_service.
+      - Builds an array-backed RoadGraph (CSR) with road segments and travel attributes.
+      - Snaps arbitrary (lon, lat) points onto graph nodes through a grid index,
+        or projects them onto road segments through an STRtree.
     """
-    def __init__(self, graph_data) -> None:
+    def __init__(self, graph_data, max_snap_distance: Optional[float] = SNAP_MAX_DISTANCE) -> None:
         """
         Initialize the RoadNetwork instance.
+
+        :param graph_data: Node-link graph from traffic_service, or an already built RoadGraph.
+        :param max_snap_distance: Default snap radius in meters (None = unlimited).
         """
-        self.gdf: Optional[gpd.GeoDataFrame] = None
-        self.graph = json_graph.node_link_graph(graph_data, edges="links")
-        logging.info("RoadNetwork instance created. Processor initialized.")
+        if not isinstance(graph_data, RoadGraph):
+            graph_data = RoadGraph.from_node_link(graph_data)
+        self.graph: RoadGraph = graph_data
+        self.max_snap_distance = max_snap_distance
+        self.node_grid: Optional[NodeGrid] = NodeGrid(self.graph.xy) if self.graph.number_of_nodes else None
+        self._segment_tree: Optional[SegmentTree] = None
+        self._lock = threading.Lock()
+        self._template: Optional["RoadNetwork"] = None
+        logging.info("RoadNetwork instance created. Graph arrays and node index built.")
 
-    def _find_nearest_node(self, point: Tuple[float, float]) -> int:
+    def with_graph(self, graph: RoadGraph) -> "RoadNetwork":
+        """
+        Network over another graph of the same topology (e.g. another traffic slice
+        from RoadGraph.with_weights()), sharing this network's spatial indexes.
         """
-        Find the nearest graph node to a given point using Euclidean distance.
+        network = RoadNetwork.__new__(RoadNetwork)
+        network.graph = graph
+        network.max_snap_distance = self.max_snap_distance
+        network.node_grid = self.node_grid
+        network._segment_tree = None
+        network._lock = threading.Lock()
+        network._template = self
+        return network
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by this network: graph arrays (with the derived
+        undirected view) plus the spatial indexes built so far.
+        """
+        total = self.graph.nbytes
+        if self.node_grid is not None:
+            total += self.node_grid.nodes.nbytes + self.node_grid.xy.nbytes + self.node_grid.starts.nbytes
+        if self._segment_tree is not None:
+            # shapely segments: two coordinates plus geometry/tree overhead
+            total += len(self._segment_tree.lines) * 160
+        return total
+
+    def _resolve_radius(self, max_distance: Optional[float]) -> Optional[float]:
+        return self.max_snap_distance if max_distance is None else max_distance
+
+    def _find_nearest_node(self, point: Tuple[float, float], max_distance: Optional[float] = None) -> int:
+        """
+        Find the nearest graph node to a given point using the grid index.
 
         :param point: Tuple (lon, lat) to search from.
-        :return: The node ID closest to the point.
+        :param max_distance: Snap radius in meters.
+        :return: The node index closest to the point.
         """
-        if self.graph is None or not self.graph.nodes:
+        if self.node_grid is None:
             raise RuntimeError("Graph is empty. Cannot find nearest node.")
 
-        nearest_node = None
-        min_dist = float('inf')
-        for node, data in self.graph.nodes(data=True):
-            node_point = tuple(data.get('pos'))
-            if node_point is None:
-                continue
-            d = euclidean_distance(node_point, point)
-            if d < min_dist:
-                min_dist = d
-                nearest_node = node
-        if nearest_node is None:
-            raise RuntimeError(
-                f"No graph node has a valid 'pos' attribute; "
-                f"cannot snap point {point!r} to graph."
-            )
-        return nearest_node
-
-    def match_node_id(self, point: Tuple[float, float]) -> int:
+        node, _ = self.node_grid.nearest(equirectangular(point[0], point[1]), max_distance)
+        if node < 0:
+            raise ValueError(f"Point {point!r} is farther than {max_distance} m from the road network.")
+        return node
+
+    def match_node_index(self, point: Tuple[float, float], max_distance: Optional[float] = None) -> int:
         """
-        Ensure a point corresponds to a graph node. If not, snap to the nearest.
+        Snap a point to the array index of the nearest graph node
+        (an exact position match has distance 0 and wins).
 
         :param point: Tuple (lon, lat)
-        :return: Valid node ID in the graph.
+        :param max_distance: Snap radius in meters; defaults to the network setting.
+        :return: Node index into the RoadGraph arrays.
         """
         if self.graph is None:
             raise RuntimeError("Graph not initialized.")
+        return self._find_nearest_node(point, self._resolve_radius(max_distance))
+
+    def match_node_id(self, point: Tuple[float, float], max_distance: Optional[float] = None) -> int:
+        """
+        Ensure a point corresponds to a graph node. If not, snap to the nearest.
+
+        :param point: Tuple (lon, lat)
+        :param max_distance: Snap radius in meters; defaults to the network setting.
+        :return: Valid node ID in the graph.
+        """
+        return int(self.graph.node_ids[self.match_node_index(point, max_distance)])
+
+    def match_node_indices(
+            self,
+            points: Sequence[Tuple[float, float]],
+            max_distance: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Snap many points in one call.
 
-        # If already exactly at a node position, return that node
-        for node, data in self.graph.nodes(data=True):
-            if data.get("pos") == point:
-                return node
+        :param points: Sequence of (lon, lat).
+        :param max_distance: Snap radius in meters; defaults to the network setting.
+        :return: Node indices, -1 where no node lies within the radius.
+        """
+        if self.node_grid is None:
+            raise RuntimeError("Graph is empty. Cannot find nearest node.")
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        indices, _ = self.node_grid.nearest_many(
+            equirectangular(points[:, 0], points[:, 1]), self._resolve_radius(max_distance))
+        return indices
 
-        # Otherwise, find and return the nearest node
-        return self._find_nearest_node(point)
+    def match_node_ids(
+            self,
+            points: Sequence[Tuple[float, float]],
+            max_distance: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Batch version of match_node_id(); -1 where a point could not be snapped.
+        """
+        indices = self.match_node_indices(points, max_distance)
+        return np.where(indices >= 0, self.graph.node_ids[indices], -1)
+
+    @property
+    def segment_tree(self) -> SegmentTree:
+        """
+        STRtree over the road segments, built on first use.
+        """
+        if self._segment_tree is None:
+            if self._template is not None:
+                self._segment_tree = self._template.segment_tree
+                return self._segment_tree
+            with self._lock:
+                if self._segment_tree is None:
+                    self._segment_tree = SegmentTree(self.graph.xy, self.graph.sources, self.graph.targets)
+        return self._segment_tree
+
+    def match_edges(
+            self,
+            points: Sequence[Tuple[float, float]],
+            max_distance: Optional[float] = None
+    ) -> List[Optional[EdgeSnap]]:
+        """
+        Project many points onto their nearest road segment.
+
+        :param points: Sequence of (lon, lat).
+        :param max_distance: Snap radius in meters; defaults to the network setting.
+        :return: One EdgeSnap per point, None where no segment lies within the radius.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        tree = self.segment_tree
+        segments, fractions, distances = tree.project_many(
+            equirectangular(points[:, 0], points[:, 1]), self._resolve_radius(max_distance))
+        coords = self.graph.coords
+        result = []
+        for segment, fraction, distance in zip(segments.tolist(), fractions.tolist(), distances.tolist()):
+            if segment < 0:
+                result.append(None)
+                continue
+            tail, head = int(tree.tails[segment]), int(tree.heads[segment])
+            lon, lat = coords[tail] + fraction * (coords[head] - coords[tail])
+            result.append(EdgeSnap(tail, head, fraction, (float(lon), float(lat)), distance))
+        return result
+
+    def match_edge(self, point: Tuple[float, float], max_distance: Optional[float] = None) -> EdgeSnap:
+        """
+        Project a point onto its nearest road segment.
+
+        :param point: Tuple (lon, lat)
+        :param max_distance: Snap radius in meters; defaults to the network setting.
+        :return: EdgeSnap describing the split position.
+        """
+        snap = self.match_edges([point], max_distance)[0]
+        if snap is None:
+            raise ValueError(
+                f"Point {point!r} is farther than {self._resolve_radius(max_distance)} m from the road network.")
+        return snap
@@ -1,13 +1,23 @@
+import math
 import time
+import asyncio
 import logging
-import networkx as nx
+import numpy as np
 from enum import Enum
-from datetime import datetime
-from utils.distance import euclidean_distance
-from typing import Tuple, Optional, List
-from routing_service.services.road import RoadNetwork
-from routing_service.models.api_route import SearchRouteRequest
+from typing import Tuple, Optional, List, Dict, NamedTuple, Generator
+from routing_service.services import search, ch, cch, alt, heuristic, timedep
+from routing_service.services.graph import RoadGraph
+from routing_service.services.road import RoadNetwork, EdgeSnap
+from routing_service.services.spatial import reach_polygon, corridor_mask
+from routing_service.services.pool import route_pool
+from utils.distance import equirectangular
+from utils.load import ALTERNATIVE_MAX_STRETCH, ALTERNATIVE_MAX_OVERLAP, BATCH_CONCURRENCY
+from utils.load import CORRIDOR_STRETCH, CORRIDOR_MARGIN, CORRIDOR_ATTEMPTS
+from routing_service.models.api_route import (
+    SearchRouteRequest, RouteBatchRequest, RouteMatrixRequest, IsochroneRequest, ProfileRouteRequest
+)
 from routing_service.cache.traffic import traffic_graph_cache
+from routing_service.cache.route import route_cache
 
 
 class TransportMode(Enum):
@@ -23,25 +33,69 @@ class TransportMode(Enum):
         return self.mode_name
 
 
+# upper bound on the departures sampled by one profile query
+PROFILE_MAX_DEPARTURES = 96
+
+# upper bound on the alternatives returned next to a route
+MAX_ALTERNATIVES = 3
+
+# response key of every transport mode
+MODES = {
+    'walking': TransportMode.FOOT,
+    'driving': TransportMode.CAR,
+    'cycling': TransportMode.BIKE,
+}
+
+
+class Endpoints(NamedTuple):
+    """
+    Snapped endpoints of a route request.
+    """
+    sources: Dict[int, float]  # {node: entry cost}
+    targets: Dict[int, float]  # {node: exit cost}
+    src_access: Dict[int, Tuple[int, float]]  # {node: (edge, portion)} leaving the origin
+    dst_access: Dict[int, Tuple[int, float]]  # {node: (edge, portion)} reaching the destination
+    source_pos: Tuple[float, float]
+    target_pos: Tuple[float, float]
+    src_snap: Optional[EdgeSnap]
+    dst_snap: Optional[EdgeSnap]
+
+
 class RoutePlanner:
+    # Webster parameters
+    INTERSECTION_THRESHOLD = 3  # degree ≥ 3 is signalized
+    CYCLE_TIME = 90.0  # seconds
+    GREEN_RATIO = 0.4  # fraction of cycle that is green
+
     def __init__(
             self,
             network: RoadNetwork,
             transport_mode: TransportMode = TransportMode.FOOT,
             algorithm: str = 'A*',
-            use_gnn: bool = False
+            use_gnn: bool = False,
+            snap_mode: str = 'node',
+            corridor: Optional[str] = None
     ) -> None:
         """
-        :param network: Initialized RoadNetwork (with DiGraph and 'pos' on each node).
+        :param network: Initialized RoadNetwork (with RoadGraph arrays and node coords).
         :param transport_mode: One of TransportMode.
-        :param algorithm: 'A*' or 'Dijkstra'.
+        :param algorithm: 'A*', 'Dijkstra', their bidirectional variants 'BiA*' / 'BiDijkstra',
+                          'ALT' / 'BiALT' (A* with landmark lower bounds),
+                          'CH' (contraction hierarchy; customizable CH for CAR),
+                          or 'TD' (time-dependent CAR routing across hourly slices, A* otherwise).
         :param use_gnn: If True and mode == CAR, use edge['weight'] instead of ['time'].
+        :param snap_mode: 'node' snaps endpoints to the nearest node, 'edge' projects them
+                          onto the nearest road segment and charges the partial edges.
+        :param corridor: None searches the whole network; 'ellipse' or 'bbox' prunes the
+                         search to a corridor around the endpoints, widened until a route is found.
         """
         self.network = network
-        self.graph: nx.DiGraph = network.graph
+        self.graph: RoadGraph = network.graph
         self.transport_mode = transport_mode
         self.algorithm = algorithm
         self.use_gnn = use_gnn
+        self.snap_mode = snap_mode
+        self.corridor = corridor
         logging.info(
             f"Initialized RoutePlanner with transport_mode: {self.transport_mode.mode_name}, algorithm: {self.algorithm}")
 
@@ -55,32 +109,223 @@ class RoutePlanner:
             return "weight" if self.use_gnn else "time"
         return "length"
 
+    def _search_graph(self) -> RoadGraph:
+        """
+        CAR follows the directed graph; FOOT/BIKE may use every road both ways.
+        """
+        if self.transport_mode == TransportMode.CAR:
+            return self.graph
+        return self.graph.undirected
+
+    def _access(
+            self,
+            G: RoadGraph,
+            point: Tuple[float, float],
+            leaving: bool
+    ) -> Tuple[Dict[int, Tuple[int, float]], Tuple[float, float], Optional[EdgeSnap]]:
+        """
+        Snap an endpoint and describe how the search enters (leaving=True) or exits the graph.
+
+        :return: ({node: (edge, portion of that edge travelled)}, anchor (lon, lat), EdgeSnap or None).
+                 In node mode the single entry is (node, (-1, 0.0)).
+        """
+        if self.snap_mode != 'edge':
+            node = self.network.match_node_index(point)
+            return {node: (-1, 0.0)}, tuple(G.coords[node].tolist()), None
+
+        snap = self.network.match_edge(point)
+        access = {}
+        for tail, head, position in (
+                (snap.tail, snap.head, snap.fraction),
+                (snap.head, snap.tail, 1 - snap.fraction)
+        ):
+            e = G.find_edge(tail, head)
+            if e < 0:
+                continue
+            if leaving:
+                access[head] = (e, 1 - position)
+            else:
+                access[tail] = (e, position)
+        return access, snap.point, snap
+
+    @staticmethod
+    def _same_segment(
+            G: RoadGraph,
+            src: Optional[EdgeSnap],
+            dst: Optional[EdgeSnap],
+            cost_attr: str
+    ) -> Optional[Tuple[int, float]]:
+        """
+        When both endpoints project onto the same segment, return the cheapest
+        direct (edge, portion) between them that respects the travel direction.
+        """
+        if src is None or dst is None or {src.tail, src.head} != {dst.tail, dst.head}:
+            return None
+        best = None
+        for tail, head in ((src.tail, src.head), (src.head, src.tail)):
+            e = G.find_edge(tail, head)
+            p_src = src.fraction if tail == src.tail else 1 - src.fraction
+            p_dst = dst.fraction if tail == dst.tail else 1 - dst.fraction
+            if e < 0 or p_src > p_dst:
+                continue
+            if best is None or (p_dst - p_src) * G.columns[cost_attr][e] < best[1] * G.columns[cost_attr][best[0]]:
+                best = (e, p_dst - p_src)
+        return best
+
     def _run_path_algorithm(
         self,
-        G: nx.Graph,
-        source: int,
-        target: int,
-        cost_attr: str
-    ) -> List[int]:
-        """
-        Execute the chosen pathfinding algorithm on graph G
-        and return a list of node IDs.
-        """
-        if self.algorithm.lower() == "dijkstra":
-            return nx.dijkstra_path(G, source, target, weight=cost_attr)
-
-        # A* with Euclidean heuristic on node positions
-        def heuristic(x: int, y: int) -> float:
-            pu = tuple(G.nodes[x]["pos"])
-            pv = tuple(G.nodes[y]["pos"])
-            return euclidean_distance(pu, pv)
-
-        return nx.astar_path(
-            G, source, target,
-            heuristic=heuristic,
-            weight=cost_attr
+        G: RoadGraph,
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        cost_attr: str,
+        source_pos: Tuple[float, float],
+        target_pos: Tuple[float, float],
+        excluded: Optional[List[bool]] = None
+    ) -> Tuple[List[int], List[int], float]:
+        """
+        Execute the chosen pathfinding algorithm on graph G between the entry
+        and exit costs of the snapped endpoints and return
+        (node indices, edge indices, cost); empty lists when unreachable.
+        Nodes flagged in `excluded` are pruned (ignored by hierarchy queries).
+        """
+        algorithm = self.algorithm.lower()
+        adjacency = G.adjacency(cost_attr)
+        if algorithm == "ch":
+            if cost_attr == "length":
+                hierarchy = ch.get_hierarchy(G, cost_attr)
+            else:
+                # traffic-dependent costs: shared CCH ordering customized with this slice
+                hierarchy = cch.get_metric(G, cost_attr)
+            if hierarchy is not None:
+                nodes, cost = hierarchy.query(sources, targets)
+                return nodes, [G.find_edge(u, v) for u, v in zip(nodes[:-1], nodes[1:])], cost
+            # hierarchy still being prepared: exact bidirectional fallback
+            algorithm = "bidijkstra"
+        if algorithm in ("alt", "bialt"):
+            tables = alt.get_tables(G, cost_attr)
+            if tables is not None:
+                if algorithm == "alt":
+                    return search.shortest_path_between(
+                        adjacency, sources, targets, heuristic=tables.heuristic(sources, targets), excluded=excluded)
+                return search.bidirectional_path_between(
+                    adjacency, G.reverse_adjacency(cost_attr), sources, targets,
+                    potential=tables.potential(sources, targets), excluded=excluded)
+            # landmark tables still being prepared: geometric A*
+            algorithm = "a*" if algorithm == "alt" else "bia*"
+        if algorithm == "dijkstra":
+            return search.shortest_path_between(adjacency, sources, targets, excluded=excluded)
+        if algorithm == "bidijkstra":
+            return search.bidirectional_path_between(
+                adjacency, G.reverse_adjacency(cost_attr), sources, targets, excluded=excluded)
+
+        # A* with a straight-line bound scaled by the fastest edge of this attribute
+        geometric = heuristic.bound(G, cost_attr)
+        if algorithm == "bia*":
+            return search.bidirectional_path_between(
+                adjacency, G.reverse_adjacency(cost_attr), sources, targets,
+                potential=geometric.potential(source_pos, target_pos), excluded=excluded)
+
+        return search.shortest_path_between(
+            adjacency, sources, targets, heuristic=geometric.towards(target_pos), excluded=excluded)
+
+    def _corridor_path(
+            self,
+            G: RoadGraph,
+            ends: Endpoints,
+            cost_attr: str
+    ) -> Tuple[List[int], List[int], float]:
+        """
+        Run the path algorithm inside a corridor sized from the straight-line distance
+        between the endpoints, doubling its width while no route is found and falling
+        back to the whole network after CORRIDOR_ATTEMPTS corridors.
+        """
+        source_xy, target_xy = equirectangular(*ends.source_pos), equirectangular(*ends.target_pos)
+        stretch, margin = CORRIDOR_STRETCH, CORRIDOR_MARGIN
+        for _ in range(CORRIDOR_ATTEMPTS):
+            inside = corridor_mask(G.xy, source_xy, target_xy, stretch, margin, self.corridor)
+            found = self._run_path_algorithm(
+                G, ends.sources, ends.targets, cost_attr, ends.source_pos, ends.target_pos, excluded=(~inside).tolist())
+            if found[0] or inside.all():
+                return found
+            stretch, margin = stretch * 2, margin * 2
+        logging.info(f"No route inside the {self.corridor} corridor; searching the whole network.")
+        return self._run_path_algorithm(
+            G, ends.sources, ends.targets, cost_attr, ends.source_pos, ends.target_pos)
+
+    def _endpoints(
+            self,
+            G: RoadGraph,
+            cost_attr: str,
+            source_point: Tuple[float, float],
+            target_point: Tuple[float, float]
+    ) -> Endpoints:
+        """
+        Snap both endpoints and price their entry/exit with the cost attribute.
+        Raises ValueError when a point is out of snapping range.
+        """
+        src_access, source_pos, src_snap = self._access(G, source_point, leaving=True)
+        dst_access, target_pos, dst_snap = self._access(G, target_point, leaving=False)
+        cost = G.columns[cost_attr]
+        return Endpoints(
+            {node: portion * cost[e] if e >= 0 else 0.0 for node, (e, portion) in src_access.items()},
+            {node: portion * cost[e] if e >= 0 else 0.0 for node, (e, portion) in dst_access.items()},
+            src_access, dst_access, source_pos, target_pos, src_snap, dst_snap
         )
 
+    def _pieces(
+            self,
+            G: RoadGraph,
+            ends: Endpoints,
+            path: List[int],
+            edges: List[int],
+            path_cost: float,
+            cost_attr: str
+    ) -> Optional[Tuple[List[int], List[Tuple[int, float]]]]:
+        """
+        The (edge, share travelled) pieces of a route, including the partial edges
+        at both ends; a direct hop wins when both endpoints lie on the same segment.
+        None when no route exists.
+        """
+        direct = self._same_segment(G, ends.src_snap, ends.dst_snap, cost_attr)
+        if direct is not None and direct[1] * G.columns[cost_attr][direct[0]] <= path_cost:
+            return [], [direct]
+        if path:
+            return path, [(e, 1.0) for e in edges] + [ends.src_access[path[0]], ends.dst_access[path[-1]]]
+        return None
+
+    def _summarize(
+            self,
+            G: RoadGraph,
+            ends: Endpoints,
+            path: List[int],
+            pieces: List[Tuple[int, float]],
+            exec_time: float,
+            drive_seconds: Optional[float] = None
+    ) -> Tuple[List[Tuple[float, float]], float, int, float]:
+        """
+        Turn route pieces into (coordinates, meters, minutes, computation seconds).
+
+        :param drive_seconds: CAR driving time when known from the search itself
+                              (time-dependent routing); otherwise summed from 'time'.
+        """
+        piece_edges = np.array([e for e, _ in pieces if e >= 0], dtype=np.int64)
+        piece_share = np.array([share for e, share in pieces if e >= 0], dtype=np.float64)
+        routes_distance = float((G.columns["length"][piece_edges] * piece_share).sum())
+        if self.transport_mode == TransportMode.CAR:
+            convert_rate = 1 / 60  # m/s -> m/min
+            if drive_seconds is None:
+                drive_seconds = float((G.columns["time"][piece_edges] * piece_share).sum())
+            routes_time = drive_seconds * convert_rate
+            routes_time += self._calculate_delay(G, path)
+        else:
+            speed = self.transport_mode.default_speed or 1.0
+            routes_time = routes_distance / speed
+
+        coord_path = G.coords[path].tolist()
+        if ends.src_snap is not None:
+            coord_path = [list(ends.source_pos)] + coord_path + [list(ends.target_pos)]
+        return coord_path, routes_distance, round(routes_time), exec_time
+
     def compute(
             self,
             source_point: Tuple[float, float],
@@ -95,92 +340,335 @@ class RoutePlanner:
             raise RuntimeError("Road graph is not initialized.")
 
         cost_attr = self._select_cost_attribute()
-        source_id = self.network.match_node_id(source_point)
-        target_id = self.network.match_node_id(target_point)
+        G = self._search_graph()
 
-        if self.transport_mode == TransportMode.CAR:
-            G = self.graph
-        else:
-            G = self.graph.to_undirected()
+        try:
+            ends = self._endpoints(G, cost_attr, source_point, target_point)
+        except ValueError as e:
+            logging.warning(str(e))
+            return [], 0.0, 0, None
 
         start_time_compute = time.perf_counter()
 
-        # Compute the route using the selected algorithm.
-        if self.algorithm.lower() == 'dijkstra':
-            try:
-                path = nx.dijkstra_path(G, source_id, target_id, weight=cost_attr)
-            except nx.NetworkXNoPath:
-                logging.error("No route found using Dijkstra.")
-                return [], 0.0, 0, None
+        # Compute the route using the selected algorithm; unreachability
+        # is detected by the search itself (the frontier runs empty).
+        if self.corridor and self.algorithm.lower() != "ch":
+            path, edges, path_cost = self._corridor_path(G, ends, cost_attr)
         else:
-            # Use A* algorithm by default.
-            def heuristic(x: int, y: int) -> float:
-                pu = tuple(G.nodes[x]["pos"])
-                pv = tuple(G.nodes[y]["pos"])
-                return euclidean_distance(pu, pv)
+            path, edges, path_cost = self._run_path_algorithm(
+                G, ends.sources, ends.targets, cost_attr, ends.source_pos, ends.target_pos)
+        route = self._pieces(G, ends, path, edges, path_cost, cost_attr)
+        if route is None:
+            logging.warning(f"No path exists between source: {source_point} and target: {target_point}.")
+            return [], 0.0, 0, None
+
+        exec_time = time.perf_counter() - start_time_compute
+        logging.info(f"Route computation time: {exec_time:.6f} seconds using {self.algorithm.capitalize()}")
+        return self._summarize(G, ends, *route, exec_time)
+
+    def compute_alternatives(
+            self,
+            source_point: Tuple[float, float],
+            target_point: Tuple[float, float],
+            count: int
+    ) -> List[Tuple[Optional[List[Tuple[float, float]]], float, int, Optional[float]]]:
+        """
+        Optimal route plus up to `count` alternatives, all read off the forward and
+        backward trees of one bidirectional Dijkstra (plateau method), so the cost
+        stays close to a single query. Alternatives respect ALTERNATIVE_MAX_STRETCH
+        and ALTERNATIVE_MAX_OVERLAP.
 
-            if not nx.has_path(G, source_id, target_id):
+        :return: compute()-shaped results, optimal route first.
+        """
+        if self.graph is None:
+            raise RuntimeError("Road graph is not initialized.")
+
+        cost_attr = self._select_cost_attribute()
+        G = self._search_graph()
+
+        try:
+            ends = self._endpoints(G, cost_attr, source_point, target_point)
+        except ValueError as e:
+            logging.warning(str(e))
+            return [([], 0.0, 0, None)]
+
+        start_time_compute = time.perf_counter()
+        found = search.alternative_paths(
+            G.adjacency(cost_attr), G.reverse_adjacency(cost_attr), ends.sources, ends.targets,
+            count + 1, ALTERNATIVE_MAX_STRETCH, ALTERNATIVE_MAX_OVERLAP)
+        routes = []
+        for path, edges, path_cost in found or [([], [], math.inf)]:
+            route = self._pieces(G, ends, path, edges, path_cost, cost_attr)
+            if route is None:
                 logging.warning(f"No path exists between source: {source_point} and target: {target_point}.")
-                return [], 0.0, 0, None
+                return [([], 0.0, 0, None)]
+            routes.append(route)
+            if not route[0]:
+                # both endpoints on one segment: the direct hop beats every alternative
+                break
 
-            try:
-                path = nx.astar_path(G, source_id, target_id, heuristic=heuristic, weight=cost_attr)
-            except nx.NetworkXNoPath:
-                logging.error(f"No route found using A*, source: {source_point} and target: {target_point}.")
-                return [], 0.0, 0, None
+        exec_time = time.perf_counter() - start_time_compute
+        logging.info(f"Alternative routes computation time: {exec_time:.6f} seconds, {len(routes) - 1} alternatives")
+        return [self._summarize(G, ends, *route, exec_time) for route in routes]
+
+    async def compute_time_dependent(
+            self,
+            source_point: Tuple[float, float],
+            target_point: Tuple[float, float],
+            depart: int
+    ) -> Tuple[Optional[List[Tuple[float, float]]], float, int, Optional[float]]:
+        """
+        CAR route departing at a timestamp, every edge costed with the traffic of
+        the moment the vehicle enters it. Hourly slices are fetched from the traffic
+        cache as the search reaches them; the search itself runs on the route pool.
+        Same result shape as compute().
+        """
+        G = self.graph
+        try:
+            ends = self._endpoints(G, "time", source_point, target_point)
+        except ValueError as e:
+            logging.warning(str(e))
+            return [], 0.0, 0, None
+
+        start_time_compute = time.perf_counter()
+        profile = timedep.get_profile(G, traffic_graph_cache.local_ttl)
+        profile.prune()
+        steps = search.time_dependent_path_between(
+            G.adjacency("time"), ends.sources, ends.targets, depart, profile.at)
+        path, edges, seconds = await _resume_on_pool("search:td", steps, profile)
+        route = self._pieces(G, ends, path, edges, seconds, "time")
+        if route is None:
+            logging.warning(f"No path exists between source: {source_point} and target: {target_point}.")
+            return [], 0.0, 0, None
 
         exec_time = time.perf_counter() - start_time_compute
-        logging.info(f"Route computation time: {exec_time:.6f} seconds using {self.algorithm.capitalize()}")
+        logging.info(f"Time-dependent route computation time: {exec_time:.6f} seconds")
+        return self._summarize(G, ends, *route, exec_time, drive_seconds=seconds if route[0] else None)
 
-        routes_distance = 0.0
-        routes_time = 0.0
-        for u, v in zip(path[:-1], path[1:]):
-            edge = G.get_edge_data(u, v, {}) or {}
-            seg_len = edge.get("length", 0.0)
-            if self.transport_mode == TransportMode.CAR:
-                convert_rate = 1 / 60  # m/s -> m/min
-                seg_time = edge.get("time", 0.0)*convert_rate
-            else:
-                speed = self.transport_mode.default_speed or 1.0
-                seg_time = seg_len / speed
-            routes_distance += seg_len
-            routes_time += seg_time
+    async def compute_arriving(
+            self,
+            source_point: Tuple[float, float],
+            target_point: Tuple[float, float],
+            arrive: int
+    ) -> Tuple[Optional[List[Tuple[float, float]]], float, int, Optional[float], Optional[int]]:
+        """
+        CAR route arriving by a timestamp: one reverse time-dependent search from the
+        destination over incoming edges, using the slices of the hours before `arrive`.
+        Same result as compute() plus the latest departure timestamp (None when unreachable).
+        """
+        G = self.graph
+        try:
+            ends = self._endpoints(G, "time", source_point, target_point)
+        except ValueError as e:
+            logging.warning(str(e))
+            return [], 0.0, 0, None, None
 
-        if self.transport_mode == TransportMode.CAR:
-            routes_time += self._calculate_delay(G, path)
+        start_time_compute = time.perf_counter()
+        profile = timedep.get_profile(G, traffic_graph_cache.local_ttl)
+        profile.prune()
+        steps = search.time_dependent_path_arriving(
+            G.reverse_adjacency("time"), ends.sources, ends.targets, arrive, profile.at, timedep.HOUR)
+        path, edges, seconds = await _resume_on_pool("search:td-arrive", steps, profile)
+        route = self._pieces(G, ends, path, edges, seconds, "time")
+        if route is None:
+            logging.warning(f"No path exists between source: {source_point} and target: {target_point}.")
+            return [], 0.0, 0, None, None
 
-        coord_path = [G.nodes[n]["pos"] for n in path]
-        return coord_path, routes_distance, round(routes_time), exec_time
+        exec_time = time.perf_counter() - start_time_compute
+        logging.info(f"Arrive-by route computation time: {exec_time:.6f} seconds")
+        coord_path, distance, minutes, _ = self._summarize(
+            G, ends, *route, exec_time, drive_seconds=seconds if route[0] else None)
+        if not route[0]:
+            # both endpoints on one segment: the direct hop, timed like _summarize() does
+            seconds = sum(G.columns["time"][e] * share for e, share in route[1])
+        # signal delays are added on top of the driving time, so leave that much earlier too
+        depart = arrive - int(math.ceil(seconds + self._calculate_delay(G, route[0]) * 60))
+        return coord_path, distance, minutes, exec_time, depart
+
+    async def compute_profile(
+            self,
+            source_point: Tuple[float, float],
+            target_point: Tuple[float, float],
+            departures: List[int]
+    ) -> List[Tuple[Optional[List[Tuple[float, float]]], float, Optional[int], Optional[float]]]:
+        """
+        CAR travel time as a function of departure time: one vector-label search
+        covers every departure, using the hourly slices the trips actually reach.
+
+        :return: One compute()-shaped result per departure; minutes is None where
+                 the target cannot be reached.
+        """
+        G = self.graph
+        try:
+            ends = self._endpoints(G, "time", source_point, target_point)
+        except ValueError as e:
+            logging.warning(str(e))
+            return [([], 0.0, None, None)] * len(departures)
+
+        start_time_compute = time.perf_counter()
+        profile = timedep.get_profile(G, traffic_graph_cache.local_ttl)
+        profile.prune()
+        steps = search.time_dependent_profile(
+            G.adjacency("time"), ends.sources, ends.targets, departures, profile.at)
+        seconds, paths = await _resume_on_pool("search:td-profile", steps, profile)
+        exec_time = time.perf_counter() - start_time_compute
+        logging.info(f"Profile computation time: {exec_time:.6f} seconds for {len(departures)} departures")
+
+        results = []
+        for total, (path, edges) in zip(seconds, paths):
+            route = self._pieces(G, ends, path, edges, total, "time")
+            if route is None:
+                results.append(([], 0.0, None, exec_time))
+                continue
+            results.append(self._summarize(G, ends, *route, exec_time, drive_seconds=total if route[0] else None))
+        return results
+
+    @classmethod
+    def _signal_delay(cls) -> float:
+        """
+        Webster uniform delay per signalized intersection, in seconds:
+            d_base = ½ · C · (1 – g/C)²
+        """
+        return 0.5 * cls.CYCLE_TIME * (1 - cls.GREEN_RATIO) ** 2
+
+    def matrix(
+            self,
+            source_points: List[Tuple[float, float]],
+            target_points: List[Tuple[float, float]]
+    ) -> Tuple[List[List[Optional[float]]], List[List[Optional[int]]]]:
+        """
+        Distance and time matrix between two point lists: endpoints are snapped to
+        nodes and one shortest-path tree is grown per distinct source, stopping once
+        every target is settled. Times follow compute() (signal delay included for CAR).
+
+        :param source_points: Sequence of (lon, lat).
+        :param target_points: Sequence of (lon, lat).
+        :return: (distances in meters, times in minutes), indexed [source][target];
+                 None where a point cannot be snapped or the target is unreachable.
+        """
+        cost_attr = self._select_cost_attribute()
+        G = self._search_graph()
+        sources = self.network.match_node_indices(source_points).tolist()
+        targets = self.network.match_node_indices(target_points).tolist()
+        wanted = sorted({t for t in targets if t >= 0})
+        adjacency = G.adjacency(cost_attr)
+
+        rows: Dict[int, Tuple[List[Optional[float]], List[Optional[int]]]] = {}
+        for s in set(sources):
+            if s < 0 or not wanted:
+                rows[s] = ([None] * len(targets), [None] * len(targets))
+                continue
+            _, pred_node, pred_edge, order = search.shortest_path_tree(adjacency, {s: 0.0}, wanted)
+            length, minutes = self._tree_totals(G, pred_node, pred_edge, order)
+            rows[s] = (
+                [round(length[t], 1) if t in length else None for t in targets],
+                [round(minutes[t]) if t in minutes else None for t in targets],
+            )
+        return [rows[s][0] for s in sources], [rows[s][1] for s in sources]
+
+    def _tree_totals(
+            self,
+            G: RoadGraph,
+            pred_node: List[int],
+            pred_edge: List[int],
+            order: List[int]
+    ) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """
+        Route length (meters) and travel time (minutes) from the root to every settled
+        node of a shortest-path tree, accumulated in settle order.
+        """
+        length_of = G.adjacency("length")[2]
+        length = {}
+        for v in order:
+            u = pred_node[v]
+            length[v] = 0.0 if u < 0 else length[u] + length_of[pred_edge[v]]
+        if self.transport_mode != TransportMode.CAR:
+            speed = self.transport_mode.default_speed or 1.0
+            return length, {v: d / speed for v, d in length.items()}
+
+        time_of = G.adjacency("time")[2]
+        signalized = (G.degree >= self.INTERSECTION_THRESHOLD).tolist()
+        d_base = self._signal_delay()
+        seconds = {}
+        for v in order:
+            u = pred_node[v]
+            seconds[v] = 0.0 if u < 0 else seconds[u] + time_of[pred_edge[v]] + (d_base if signalized[v] else 0.0)
+        return length, {v: t / 60 for v, t in seconds.items()}
+
+    def _travel_adjacency(self, G: RoadGraph) -> Tuple[List[int], List[int], List[float]]:
+        """
+        Adjacency whose costs are travel times as reported by compute(): meters for
+        FOOT/BIKE (divide by the speed), seconds for CAR with the signal delay of the
+        entered node folded into every edge. Built once per graph.
+        """
+        if self.transport_mode != TransportMode.CAR:
+            return G.adjacency("length")
+
+        def build(graph: RoadGraph) -> Tuple[List[int], List[int], List[float]]:
+            signalized = graph.degree[graph.targets] >= self.INTERSECTION_THRESHOLD
+            cost = graph.columns["time"] + np.where(signalized, self._signal_delay(), 0.0)
+            return graph.offsets.tolist(), graph.targets.tolist(), cost.tolist()
+        return G.derived("travel:time", build)
+
+    def isochrone(
+            self,
+            point: Tuple[float, float],
+            minutes: float
+    ) -> Tuple[RoadGraph, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Everything reachable from a point within a travel-time budget: a single
+        Dijkstra on the travel-time costs that stops once the frontier exceeds it.
+
+        :param point: Origin (lon, lat), snapped according to snap_mode.
+        :param minutes: Travel-time budget.
+        :return: (search graph, reached node indices, their minutes, edge indices leaving
+                 a reached node, reachable fraction of each of those edges);
+                 empty arrays when the origin cannot be snapped.
+        """
+        G = self._search_graph()
+        adjacency = self._travel_adjacency(G)
+        # cost units per minute
+        rate = 60.0 if self.transport_mode == TransportMode.CAR else (self.transport_mode.default_speed or 1.0)
+        budget = minutes * rate
+        empty = np.zeros(0, dtype=np.int64)
+        try:
+            access, _, _ = self._access(G, point, leaving=True)
+        except ValueError as e:
+            logging.warning(str(e))
+            return G, empty, np.zeros(0), empty, np.zeros(0)
+
+        cost = np.asarray(adjacency[2])
+        sources = {node: portion * cost[e] if e >= 0 else 0.0 for node, (e, portion) in access.items()}
+        dist, _, _, order = search.shortest_path_tree(adjacency, sources, limit=budget)
+        reached = np.asarray(order, dtype=np.int64)
+        reached_cost = np.asarray(dist)[reached] if len(reached) else np.zeros(0)
+
+        settled = np.full(G.number_of_nodes, np.inf)
+        settled[reached] = reached_cost
+        edges = np.flatnonzero(np.isfinite(settled[G.sources]))
+        spare = budget - settled[G.sources[edges]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(cost[edges] > 0, np.clip(spare / cost[edges], 0.0, 1.0), 1.0)
+        return G, reached, reached_cost / rate, edges, fraction
 
     @staticmethod
-    def _calculate_delay(G: nx.DiGraph, path: List[int]) -> float:
+    def _calculate_delay(G: RoadGraph, path: List[int]) -> float:
         """
         Compute total signal delay along the path using Webster's uniform delay:
             d_base = ½ · C · (1 – g/C)²
         Total delay = number_of_signals · d_base
         """
 
-        # 1) Compute degree only for nodes on the path
-        node_degree = {
-            node: len(set(G.predecessors(node)) | set(G.successors(node)))
-            for node in path
-        }
+        # 1) Degree (distinct predecessors ∪ successors) of the nodes on the path
+        node_degree = G.degree[path[1:]]  # skip the origin node
 
-        # 2) Webster parameters
-        INTERSECTION_THRESHOLD = 3  # degree ≥ 3 is signalized
-        CYCLE_TIME = 90.0  # seconds
-        GREEN_RATIO = 0.4  # fraction of cycle that is green
+        # 2) Base delay per signal (Webster uniform delay, unsaturated)
+        d_base = RoutePlanner._signal_delay()
 
-        # 3) Base delay per signal (Webster uniform delay, unsaturated)
-        d_base = 0.5 * CYCLE_TIME * (1 - GREEN_RATIO) ** 2
+        # 3) Count how many signals the path crosses
+        signal_count = int((node_degree >= RoutePlanner.INTERSECTION_THRESHOLD).sum())
 
-        # 4) Count how many signals the path crosses
-        signal_count = sum(
-            1 for v in path[1:]  # skip the origin node
-            if node_degree.get(v, 0) >= INTERSECTION_THRESHOLD
-        )
-
-        # 5) Total delay is simply count × d_base
+        # 4) Total delay is simply count × d_base
         total_delay = signal_count * d_base
 
         logging.info(
@@ -190,37 +678,240 @@ class RoutePlanner:
         return total_delay / 60
 
 
-async def history(req: SearchRouteRequest):
-    algorithm = 'A*'
-    if req.start_at > 0:
-        ts = req.start_at
-    elif req.end_at > 0:
-        ts = req.end_at
-    else:
-        ts = None
-    data = await traffic_graph_cache.get_traffic_data(ts)
-    result = {}
-    network = RoadNetwork(data)
-    walking_planner = RoutePlanner(network, transport_mode=TransportMode.FOOT, algorithm=algorithm)
-    walking_path, walking_distance, walking_times, _ = walking_planner.compute(req.src_loc, req.dst_loc)
-    result['walking'] = {
-        'routes': walking_path,
-        'distances': walking_distance,
-        'times': walking_times
+def _advance(steps: Generator):
+    """
+    Run a resumable search until it finishes or needs data: (done, result or need).
+    """
+    try:
+        return False, next(steps)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+async def _resume_on_pool(name: str, steps: Generator, profile: timedep.TimeProfile):
+    """
+    Drive a time-dependent search on the route pool, loading the traffic slices
+    it asks for on the event loop in between.
+    """
+    async def fetch(ts: int):
+        network = await traffic_graph_cache.get_road_network(ts)
+        return network.graph if network is not None else None
+
+    while True:
+        done, value = await route_pool.run(name, _advance, steps)
+        if done:
+            return value
+        await profile.load(value, fetch)
+
+
+async def matrix(req: RouteMatrixRequest):
+    network = await traffic_graph_cache.get_road_network(req.start_at or None)
+    if network is None:
+        raise RuntimeError("traffic graph unavailable")
+    planner = RoutePlanner(network, transport_mode=MODES[req.mode])
+    distances, times = await route_pool.run(f"matrix:{req.mode}", planner.matrix, req.src_locs, req.dst_locs)
+    return {
+        'mode': req.mode,
+        'distances': distances,
+        'times': times
     }
-    driving_planner = RoutePlanner(network, transport_mode=TransportMode.CAR, algorithm=algorithm)
-    driving_path, driving_distance, driving_times, _ = driving_planner.compute(req.src_loc, req.dst_loc)
-    result['driving'] = {
-        'routes': driving_path,
-        'distances': driving_distance,
-        'times': driving_times
+
+
+async def isochrone(req: IsochroneRequest):
+    network = await traffic_graph_cache.get_road_network(req.start_at or None)
+    if network is None:
+        raise RuntimeError("traffic graph unavailable")
+    planner = RoutePlanner(network, transport_mode=MODES[req.mode], snap_mode=req.snap)
+    return await route_pool.run(f"isochrone:{req.mode}", _isochrone_result, planner, req)
+
+
+def _isochrone_result(planner: RoutePlanner, req: IsochroneRequest) -> dict:
+    G, nodes, minutes, edges, fraction = planner.isochrone(req.src_loc, req.minutes)
+    result = {
+        'mode': req.mode,
+        'minutes': req.minutes
     }
-    cycling_planner = RoutePlanner(network, transport_mode=TransportMode.BIKE, algorithm=algorithm)
-    cycling_path, cycling_distance, cycling_times, _ = cycling_planner.compute(req.src_loc, req.dst_loc)
-    result['cycling'] = {
-        'routes': cycling_path,
-        'distances': cycling_distance,
-        'times': cycling_times
+    if req.output == 'nodes':
+        result['nodes'] = [
+            [lon, lat, round(m, 2)] for (lon, lat), m in zip(G.coords[nodes].tolist(), minutes.tolist())
+        ]
+        return result
+
+    # clip every edge at the point where the budget runs out
+    tails, heads = G.coords[G.sources[edges]], G.coords[G.targets[edges]]
+    ends = tails + fraction[:, None] * (heads - tails)
+    if req.output == 'edges':
+        full = fraction >= 1.0
+        # both directions of a fully reachable road are reported once
+        n = G.number_of_nodes
+        pair = np.minimum(G.sources[edges], G.targets[edges]) * n + np.maximum(G.sources[edges], G.targets[edges])
+        _, first = np.unique(pair[full], return_index=True)
+        keep = np.concatenate([np.flatnonzero(full)[first], np.flatnonzero(~full & (fraction > 0))])
+        result['edges'] = np.stack([tails[keep], ends[keep]], axis=1).tolist()
+        return result
+
+    points = np.concatenate([G.coords[nodes], ends[fraction > 0]])
+    result['polygon'] = reach_polygon(points)
+    return result
+
+
+async def departure_profile(req: ProfileRouteRequest):
+    network = await traffic_graph_cache.get_road_network(req.start_at)
+    if network is None:
+        raise RuntimeError("traffic graph unavailable")
+    step = max(req.step, 1) * 60
+    departures = list(range(req.start_at, req.end_at + 1, step))[:PROFILE_MAX_DEPARTURES]
+    planner = RoutePlanner(network, transport_mode=TransportMode.CAR, snap_mode=req.snap)
+    outcomes = await planner.compute_profile(req.src_loc, req.dst_loc, departures)
+
+    reachable = [i for i, outcome in enumerate(outcomes) if outcome[2] is not None]
+    result = {
+        'departures': departures,
+        'times': [outcome[2] for outcome in outcomes],
+        'best': None
     }
+    if reachable:
+        # shortest trip wins; among equal trips the earliest departure
+        i = min(reachable, key=lambda k: (outcomes[k][2], departures[k]))
+        path, distance, times, _ = outcomes[i]
+        result['best'] = {
+            'start_at': departures[i],
+            'distances': distance,
+            'times': times
+        } if req.summary else {
+            'start_at': departures[i],
+            'routes': path,
+            'distances': distance,
+            'times': times
+        }
     return result
 
+
+def _slice_timestamp(req: SearchRouteRequest) -> Optional[int]:
+    """
+    Timestamp selecting the traffic slice of a search: departure, else arrival, else now (None).
+    """
+    if req.start_at > 0:
+        return req.start_at
+    if req.end_at > 0:
+        return req.end_at
+    return None
+
+
+async def history(req: SearchRouteRequest):
+    ts = _slice_timestamp(req)
+    network = await traffic_graph_cache.get_road_network(ts)
+    if network is None:
+        raise RuntimeError("traffic graph unavailable")
+    return await _search(req, network, traffic_graph_cache.network_key(ts))
+
+
+async def batch(req: RouteBatchRequest):
+    """
+    Run many searches in one call. Searches are grouped by traffic slice so every
+    slice network is loaded once; groups run one after another, so a batch spanning
+    many hours loads one slice at a time, and within a group at most BATCH_CONCURRENCY
+    searches run at a time, leaving room on the route pool for interactive requests.
+
+    :return: {'results': one history() result per search, in request order,
+              None where the search failed}.
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, search_req in enumerate(req.searches):
+        groups.setdefault(traffic_graph_cache.network_key(_slice_timestamp(search_req)), []).append(i)
+    results: List[Optional[dict]] = [None] * len(req.searches)
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(i: int, network: RoadNetwork, slice_key: str) -> None:
+        async with limit:
+            try:
+                results[i] = await _search(req.searches[i], network, slice_key)
+            except Exception as e:
+                logging.warning(f"Batch search {i} failed: {e}")
+
+    async def run_group(slice_key: str, indices: List[int]) -> None:
+        network = await traffic_graph_cache.get_road_network(_slice_timestamp(req.searches[indices[0]]))
+        if network is None:
+            logging.warning(f"Traffic graph {slice_key} unavailable for {len(indices)} batch searches")
+            return
+        await asyncio.gather(*(run(i, network, slice_key) for i in indices))
+
+    start_time_compute = time.perf_counter()
+    for slice_key, indices in groups.items():
+        await run_group(slice_key, indices)
+    logging.info(
+        f"Batch of {len(req.searches)} searches over {len(groups)} traffic slices "
+        f"computed in {time.perf_counter() - start_time_compute:.3f} seconds")
+    return {'results': results}
+
+
+async def _search(req: SearchRouteRequest, network: RoadNetwork, slice_key: str):
+    algorithm = req.algorithm
+    ts = _slice_timestamp(req)
+    modes = [(name, mode) for name, mode in MODES.items() if name in req.modes]
+    # node-snapped routes only depend on the node pair: share them through the route cache
+    node_pair = None
+    if req.snap != 'edge':
+        try:
+            node_pair = (network.match_node_index(req.src_loc), network.match_node_index(req.dst_loc))
+        except ValueError:
+            pass
+
+    async def route(name: str, mode: TransportMode):
+        planner = RoutePlanner(
+            network, transport_mode=mode, algorithm=algorithm, snap_mode=req.snap, corridor=req.corridor)
+        key = (*node_pair, name) if node_pair is not None else None
+        if key is not None and req.corridor:
+            key = (*key, req.corridor)
+        if mode == TransportMode.CAR and algorithm.lower() == 'td' and req.start_at <= 0 < req.end_at:
+            # arrive-by: latest departure from one reverse search
+            key = (*key, 'arrive', req.end_at // 60) if key is not None else None
+
+            def compute():
+                return planner.compute_arriving(req.src_loc, req.dst_loc, req.end_at)
+        elif mode == TransportMode.CAR and algorithm.lower() == 'td':
+            depart = ts or int(time.time())
+            key = (*key, depart // 60) if key is not None else None
+
+            def compute():
+                return planner.compute_time_dependent(req.src_loc, req.dst_loc, depart)
+        elif mode == TransportMode.CAR and req.alternatives > 0:
+            count = min(req.alternatives, MAX_ALTERNATIVES)
+            key = (*key, 'alternatives', count) if key is not None else None
+
+            def compute():
+                return route_pool.run(
+                    f"search:{name}:alternatives", planner.compute_alternatives, req.src_loc, req.dst_loc, count)
+        else:
+            def compute():
+                return route_pool.run(f"search:{name}", planner.compute, req.src_loc, req.dst_loc)
+        if key is None:
+            return await compute()
+        return await route_cache.get_or_compute(slice_key, key, compute)
+
+    # the modes are independent: compute them concurrently on the route pool
+    outcomes = await asyncio.gather(*(route(name, mode) for name, mode in modes))
+
+    def entry(outcome) -> dict:
+        path, distance, times = outcome[:3]
+        return {
+            'distances': distance,
+            'times': times
+        } if req.summary else {
+            'routes': path,
+            'distances': distance,
+            'times': times
+        }
+
+    result = {}
+    for (name, _), outcome in zip(modes, outcomes):
+        if isinstance(outcome, list):
+            # optimal route first, then its alternatives
+            result[name] = entry(outcome[0])
+            result[name]['alternatives'] = [entry(alternative) for alternative in outcome[1:]]
+            continue
+        result[name] = entry(outcome)
+        if len(outcome) > 4:
+            # arrive-by searches also report the latest departure
+            result[name]['start_at'] = outcome[4]
+    return result
@@ -0,0 +1,734 @@
+import heapq
+from typing import Callable, Dict, Generator, List, Optional, Sequence, Tuple
+
+
+INF = float("inf")
+
+
+def shortest_path(
+        adjacency: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        source: int,
+        target: int,
+        heuristic: Optional[Callable[[int], float]] = None
+) -> Tuple[List[int], List[int], float]:
+    """
+    Point-to-point search on a CSR adjacency (offsets, targets, cost).
+    Plain Dijkstra when heuristic is None, A* otherwise.
+
+    :param adjacency: Flat CSR mirrors from RoadGraph.adjacency().
+    :param source: Source node index.
+    :param target: Target node index.
+    :param heuristic: Optional lower bound h(node) of the remaining cost to target.
+    :return: (node indices, edge indices, cost); ([], [], inf) when target is unreachable.
+    """
+    return shortest_path_between(adjacency, {source: 0.0}, {target: 0.0}, heuristic)
+
+
+def shortest_path_between(
+        adjacency: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        heuristic: Optional[Callable[[int], float]] = None,
+        excluded: Optional[List[bool]] = None
+) -> Tuple[List[int], List[int], float]:
+    """
+    Search between virtual endpoints: every source node starts with an initial cost
+    and every target node adds an exit cost, e.g. the partial edges around a point
+    projected onto a road segment. The graph itself is never modified.
+
+    :param adjacency: Flat CSR mirrors from RoadGraph.adjacency().
+    :param sources: {node index: initial cost}.
+    :param targets: {node index: exit cost}.
+    :param heuristic: Optional consistent lower bound h(node) of the remaining cost.
+    :param excluded: Optional per-node flags of nodes the search must not enter
+                     (e.g. outside a corridor); seeds are always allowed.
+    :return: (node indices, edge indices, cost including entry/exit costs);
+             ([], [], inf) when no target is reachable.
+    """
+    offsets, heads, cost = adjacency
+    n = len(offsets) - 1
+    dist = [INF] * n
+    pred_node = [-1] * n
+    pred_edge = [-1] * n
+    closed = _closed(n, excluded, sources, targets)
+
+    heap = []
+    for node, d in sources.items():
+        if d < dist[node]:
+            dist[node] = d
+            heap.append((d + heuristic(node) if heuristic else d, d, node))
+    heapq.heapify(heap)
+
+    best, best_exit = INF, -1
+    while heap:
+        key, d, u = heapq.heappop(heap)
+        if key >= best:
+            break
+        if closed[u]:
+            continue
+        closed[u] = True
+        if u in targets and d + targets[u] < best:
+            best, best_exit = d + targets[u], u
+        for e in range(offsets[u], offsets[u + 1]):
+            v = heads[e]
+            if closed[v]:
+                continue
+            nd = d + cost[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred_node[v] = u
+                pred_edge[v] = e
+                heapq.heappush(heap, (nd + heuristic(v) if heuristic else nd, nd, v))
+
+    if best_exit < 0:
+        return [], [], INF
+    return (*_unwind(pred_node, pred_edge, best_exit), best)
+
+
+def shortest_distances(
+        adjacency: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        sources: Dict[int, float],
+        limit: float = INF
+) -> List[float]:
+    """
+    One-to-all Dijkstra: distance from the nearest source to every node.
+
+    :param adjacency: Flat CSR mirrors (offsets, heads, cost); pass the first three
+                      items of RoadGraph.reverse_adjacency() for distances *to* the sources.
+    :param sources: {node index: initial cost}.
+    :param limit: Nodes farther than this are left at inf.
+    :return: Distance per node index, inf where unreachable (or beyond limit).
+    """
+    offsets, heads, cost = adjacency[:3]
+    dist = [INF] * (len(offsets) - 1)
+    heap = []
+    for node, d in sources.items():
+        if d < dist[node]:
+            dist[node] = d
+            heap.append((d, node))
+    heapq.heapify(heap)
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(offsets[u], offsets[u + 1]):
+            v = heads[e]
+            nd = d + cost[e]
+            if nd < dist[v] and nd <= limit:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def shortest_path_tree(
+        adjacency: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        sources: Dict[int, float],
+        targets: Optional[Sequence[int]] = None,
+        limit: float = INF
+) -> Tuple[List[float], List[int], List[int], List[int]]:
+    """
+    One-to-many Dijkstra growing a shortest-path tree from the sources. Stops as
+    soon as every target is settled, or once the frontier exceeds the cost limit.
+
+    :param adjacency: Flat CSR mirrors from RoadGraph.adjacency().
+    :param sources: {node index: initial cost}.
+    :param targets: Optional node indices to settle; the whole graph when None.
+    :param limit: Cost budget; nodes beyond it stay unsettled.
+    :return: (distance per node, predecessor node, predecessor edge (-1 for roots
+             and unreached nodes), settled nodes in order of increasing distance).
+             Distances are only final for settled nodes.
+    """
+    offsets, heads, cost = adjacency
+    n = len(offsets) - 1
+    dist = [INF] * n
+    pred_node = [-1] * n
+    pred_edge = [-1] * n
+    closed = [False] * n
+    pending = set(targets) if targets is not None else None
+    order = []
+
+    heap = []
+    for node, d in sources.items():
+        if d < dist[node]:
+            dist[node] = d
+            heap.append((d, node))
+    heapq.heapify(heap)
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > limit:
+            break
+        if closed[u]:
+            continue
+        closed[u] = True
+        order.append(u)
+        if pending is not None:
+            pending.discard(u)
+            if not pending:
+                break
+        for e in range(offsets[u], offsets[u + 1]):
+            v = heads[e]
+            nd = d + cost[e]
+            if nd < dist[v] and not closed[v]:
+                dist[v] = nd
+                pred_node[v] = u
+                pred_edge[v] = e
+                heapq.heappush(heap, (nd, v))
+    return dist, pred_node, pred_edge, order
+
+
+def time_dependent_path_between(
+        adjacency: Tuple[Sequence[int], Sequence[int]],
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        depart: float,
+        weights_at: Callable[[float], Optional[Tuple[Sequence[float], Sequence[float], float]]]
+) -> Generator[float, None, Tuple[List[int], List[int], float]]:
+    """
+    Time-dependent Dijkstra: an edge entered at time t costs (1 - a) * lo[e] + a * hi[e]
+    with (lo, hi, a) = weights_at(t), i.e. travel times interpolated between two
+    traffic slices. Label-setting stays exact as long as travel times are FIFO
+    (entering later never means leaving earlier), which holds for hourly profiles.
+
+    Written as a generator so weights can be fetched lazily: whenever weights_at(t)
+    returns None the search yields t and continues once resumed, after the caller
+    has loaded the weights covering t.
+
+    :param adjacency: (offsets, heads) of the CSR graph; edge ids index the weights.
+    :param sources: {node index: initial cost in seconds}.
+    :param targets: {node index: exit cost in seconds}.
+    :param depart: Departure timestamp (seconds).
+    :param weights_at: Edge weights valid at a timestamp, or None when not loaded.
+    :return: (node indices, edge indices, travel time in seconds) as the generator
+             result; ([], [], inf) when no target is reachable.
+    """
+    offsets, heads = adjacency[:2]
+    n = len(offsets) - 1
+    dist = [INF] * n
+    pred_node = [-1] * n
+    pred_edge = [-1] * n
+    closed = [False] * n
+
+    heap = []
+    for node, d in sources.items():
+        if d < dist[node]:
+            dist[node] = d
+            heap.append((d, node))
+    heapq.heapify(heap)
+
+    best, best_exit = INF, -1
+    while heap:
+        d, u = heap[0]
+        if d >= best:
+            break
+        if closed[u]:
+            heapq.heappop(heap)
+            continue
+        weights = weights_at(depart + d)
+        if weights is None:
+            yield depart + d
+            continue
+        heapq.heappop(heap)
+        closed[u] = True
+        if u in targets and d + targets[u] < best:
+            best, best_exit = d + targets[u], u
+        lo, hi, a = weights
+        for e in range(offsets[u], offsets[u + 1]):
+            v = heads[e]
+            if closed[v]:
+                continue
+            nd = d + lo[e] + a * (hi[e] - lo[e])
+            if nd < dist[v]:
+                dist[v] = nd
+                pred_node[v] = u
+                pred_edge[v] = e
+                heapq.heappush(heap, (nd, v))
+
+    if best_exit < 0:
+        return [], [], INF
+    return (*_unwind(pred_node, pred_edge, best_exit), best)
+
+
+def time_dependent_path_arriving(
+        backward: Tuple[Sequence[int], Sequence[int], Sequence[float], Sequence[int]],
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        arrive: float,
+        weights_at: Callable[[float], Optional[Tuple[Sequence[float], Sequence[float], float]]],
+        lookback: float = 3600.0
+) -> Generator[float, None, Tuple[List[int], List[int], float]]:
+    """
+    Reverse time-dependent Dijkstra for arrive-by queries: grows from the targets over
+    incoming edges, labelling every node with how long before `arrive` one must leave
+    it, so the first settled source gives the latest departure in a single search.
+    The departure time t over an edge reaching its head at tau solves t + f(t) = tau,
+    found by one fixed-point step from t = tau - f(tau).
+    Resumable like time_dependent_path_between(): yields a timestamp whenever the
+    weights around it (down to `lookback` seconds earlier) are not loaded.
+
+    :param backward: Incoming-edge mirrors from RoadGraph.reverse_adjacency().
+    :param sources: {node index: entry cost in seconds}.
+    :param targets: {node index: exit cost in seconds}.
+    :param arrive: Arrival timestamp (seconds).
+    :param weights_at: Edge weights valid at a timestamp, or None when not loaded.
+    :param lookback: Longest single-edge travel time to prepare weights for.
+    :return: (node indices, edge indices, travel time in seconds) in travel direction;
+             the latest departure is arrive - travel time. ([], [], inf) when unreachable.
+    """
+    offsets, tails, _, edge_ids = backward
+    n = len(offsets) - 1
+    dist = [INF] * n
+    succ_node = [-1] * n
+    succ_edge = [-1] * n
+    closed = [False] * n
+
+    heap = []
+    for node, d in targets.items():
+        if d < dist[node]:
+            dist[node] = d
+            heap.append((d, node))
+    heapq.heapify(heap)
+
+    best, best_entry = INF, -1
+    while heap:
+        d, v = heap[0]
+        if d >= best:
+            break
+        if closed[v]:
+            heapq.heappop(heap)
+            continue
+        tau = arrive - d
+        weights = weights_at(tau)
+        if weights is None or weights_at(tau - lookback) is None:
+            yield tau if weights is None else tau - lookback
+            continue
+        heapq.heappop(heap)
+        closed[v] = True
+        if v in sources and d + sources[v] < best:
+            best, best_entry = d + sources[v], v
+        lo, hi, a = weights
+        for i in range(offsets[v], offsets[v + 1]):
+            u = tails[i]
+            if closed[u]:
+                continue
+            e = edge_ids[i]
+            travel = lo[e] + a * (hi[e] - lo[e])
+            earlier = weights_at(tau - travel)
+            if earlier is not None:
+                lo_u, hi_u, a_u = earlier
+                travel = lo_u[e] + a_u * (hi_u[e] - lo_u[e])
+            nd = d + travel
+            if nd < dist[u]:
+                dist[u] = nd
+                succ_node[u] = v
+                succ_edge[u] = e
+                heapq.heappush(heap, (nd, u))
+
+    if best_entry < 0:
+        return [], [], INF
+    nodes, edges = _unwind(succ_node, succ_edge, best_entry)
+    nodes.reverse()
+    edges.reverse()
+    return nodes, edges, best
+
+
+def time_dependent_profile(
+        adjacency: Tuple[Sequence[int], Sequence[int]],
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        departures: Sequence[float],
+        weights_at: Callable[[float], Optional[Tuple[Sequence[float], Sequence[float], float]]]
+) -> Generator[float, None, Tuple[List[float], List[Tuple[List[int], List[int]]]]]:
+    """
+    Travel time for a whole set of departure times in one search: every node carries
+    a vector label (one travel time per departure) and is re-scanned whenever any
+    component improves, in order of its smallest component (label-correcting).
+    Components already slower than their departure's best arrival are not expanded,
+    and the search stops once no queued label can improve any departure.
+    Resumable like time_dependent_path_between().
+
+    :param adjacency: (offsets, heads) of the CSR graph; edge ids index the weights.
+    :param sources: {node index: initial cost in seconds}.
+    :param targets: {node index: exit cost in seconds}.
+    :param departures: Departure timestamps (seconds).
+    :param weights_at: Edge weights valid at a timestamp, or None when not loaded.
+    :return: (travel seconds per departure, (node indices, edge indices) per departure)
+             as the generator result; inf and empty paths where unreachable.
+    """
+    offsets, heads = adjacency[:2]
+    m = len(departures)
+    slots = range(m)
+    label: Dict[int, List[float]] = {}
+    pred_node: Dict[int, List[int]] = {}
+    pred_edge: Dict[int, List[int]] = {}
+    dirty = set()
+
+    heap = []
+    for node, d in sources.items():
+        if d < label.get(node, [INF])[0]:
+            label[node] = [d] * m
+            pred_node[node] = [-1] * m
+            pred_edge[node] = [-1] * m
+            dirty.add(node)
+            heap.append((d, node))
+    heapq.heapify(heap)
+
+    def best_exit() -> Tuple[List[float], List[int]]:
+        best, exits = [INF] * m, [-1] * m
+        for node, extra in targets.items():
+            values = label.get(node)
+            if values is None:
+                continue
+            for j in slots:
+                if values[j] + extra < best[j]:
+                    best[j], exits[j] = values[j] + extra, node
+        return best, exits
+
+    best = [INF] * m
+    while heap:
+        key, u = heap[0]
+        if key >= max(best):
+            break
+        if u not in dirty:
+            heapq.heappop(heap)
+            continue
+        values = label[u]
+        # components that cannot beat their departure's best so far need no work
+        useful = [j for j in slots if values[j] < best[j]]
+        weights = [weights_at(departures[j] + values[j]) for j in useful]
+        if None in weights:
+            j = useful[weights.index(None)]
+            yield departures[j] + values[j]
+            continue
+        heapq.heappop(heap)
+        dirty.discard(u)
+        if u in targets:
+            best = best_exit()[0]
+        active = [(j, values[j], *w) for j, w in zip(useful, weights)]
+        for e in range(offsets[u], offsets[u + 1]):
+            v = heads[e]
+            old = label.get(v)
+            if old is None:
+                old = label[v] = [INF] * m
+                pred_node[v] = [-1] * m
+                pred_edge[v] = [-1] * m
+            v_node, v_edge = pred_node[v], pred_edge[v]
+            improved = False
+            for j, d, lo, hi, a in active:
+                w = lo[e]
+                nd = d + w + a * (hi[e] - w)
+                if nd < old[j]:
+                    old[j] = nd
+                    v_node[j] = u
+                    v_edge[j] = e
+                    improved = True
+            if improved:
+                dirty.add(v)
+                heapq.heappush(heap, (min(old), v))
+
+    best, exits = best_exit()
+    paths = []
+    for j in slots:
+        if exits[j] < 0:
+            paths.append(([], []))
+            continue
+        nodes, edges = [exits[j]], []
+        while pred_node[nodes[-1]][j] >= 0:
+            edges.append(pred_edge[nodes[-1]][j])
+            nodes.append(pred_node[nodes[-1]][j])
+        nodes.reverse()
+        edges.reverse()
+        paths.append((nodes, edges))
+    return best, paths
+
+
+def _closed(n: int, excluded: Optional[List[bool]], *endpoints: Dict[int, float]) -> List[bool]:
+    """
+    Initial settled flags: excluded nodes start settled, so pruning costs nothing
+    per relaxation. Source and target nodes are never excluded.
+    """
+    if excluded is None:
+        return [False] * n
+    closed = list(excluded)
+    for seeds in endpoints:
+        for node in seeds:
+            closed[node] = False
+    return closed
+
+
+def _unwind(pred_node: List[int], pred_edge: List[int], target: int) -> Tuple[List[int], List[int]]:
+    """
+    Walk the predecessor arrays back from target to a search root
+    and return (node indices, edge indices).
+    """
+    nodes, edges = [target], []
+    node = target
+    while pred_node[node] >= 0:
+        edges.append(pred_edge[node])
+        node = pred_node[node]
+        nodes.append(node)
+    nodes.reverse()
+    edges.reverse()
+    return nodes, edges
+
+
+def _bidirectional_trees(
+        forward: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        backward: Tuple[Sequence[int], Sequence[int], Sequence[float], Sequence[int]],
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        potential: Optional[Callable[[int], float]] = None,
+        stretch: float = 0.0,
+        excluded: Optional[List[bool]] = None
+):
+    """
+    Core of the bidirectional searches. With stretch = 0 it stops as soon as the
+    shortest path is known; with stretch > 0 (no potential) both searches then keep
+    growing until every key exceeds (1 + stretch) * best / 2, so any route within
+    that stretch is covered by the settled parts of the two trees around its middle.
+
+    :return: (dist, pred_node, pred_edge, closed, best, meet), the first four as
+             (forward, backward) pairs of per-node lists.
+    """
+    f_offsets, f_heads, f_cost = forward[:3]
+    b_offsets, b_tails, b_cost, b_edges = backward
+    n = len(f_offsets) - 1
+    dist = ([INF] * n, [INF] * n)
+    pred_node = ([-1] * n, [-1] * n)
+    pred_edge = ([-1] * n, [-1] * n)
+    closed = (_closed(n, excluded, sources, targets), _closed(n, excluded, sources, targets))
+    heaps = ([], [])
+    sign = (1.0, -1.0)
+
+    for side, seeds in ((0, sources), (1, targets)):
+        for node, d in seeds.items():
+            if d < dist[side][node]:
+                dist[side][node] = d
+                heaps[side].append((d + (sign[side] * potential(node) if potential else 0.0), d, node))
+        heapq.heapify(heaps[side])
+
+    best, meet = INF, -1
+    for node in sources:
+        if node in targets and dist[0][node] + dist[1][node] < best:
+            best, meet = dist[0][node] + dist[1][node], node
+
+    radius = -INF
+    while heaps[0] or heaps[1]:
+        top = (heaps[0][0][0] if heaps[0] else INF, heaps[1][0][0] if heaps[1] else INF)
+        if radius < 0:
+            if top[0] == INF or top[1] == INF or top[0] + top[1] >= best:
+                if stretch <= 0 or best == INF:
+                    break
+                radius = (1 + stretch) * best / 2
+        if radius >= 0 and min(top) > radius:
+            break
+        side = 0 if top[0] <= top[1] else 1
+        _, d, u = heapq.heappop(heaps[side])
+        if closed[side][u]:
+            continue
+        closed[side][u] = True
+        if side == 0:
+            offsets, nbrs, cost, edge_ids = f_offsets, f_heads, f_cost, None
+        else:
+            offsets, nbrs, cost, edge_ids = b_offsets, b_tails, b_cost, b_edges
+        own, other = dist[side], dist[1 - side]
+        for i in range(offsets[u], offsets[u + 1]):
+            v = nbrs[i]
+            if closed[side][v]:
+                continue
+            nd = d + cost[i]
+            if nd < own[v]:
+                own[v] = nd
+                pred_node[side][v] = u
+                pred_edge[side][v] = edge_ids[i] if edge_ids is not None else i
+                heapq.heappush(heaps[side], (nd + (sign[side] * potential(v) if potential else 0.0), nd, v))
+                if nd + other[v] < best:
+                    best, meet = nd + other[v], v
+    return dist, pred_node, pred_edge, closed, best, meet
+
+
+def _join(pred_node, pred_edge, via: int) -> Tuple[List[int], List[int]]:
+    """
+    Source → via → target path through the forward and backward trees.
+    """
+    head_nodes, head_edges = _unwind(pred_node[0], pred_edge[0], via)
+    tail_nodes, tail_edges = _unwind(pred_node[1], pred_edge[1], via)
+    tail_nodes.reverse()
+    tail_edges.reverse()
+    return head_nodes + tail_nodes[1:], head_edges + tail_edges
+
+
+def bidirectional_path_between(
+        forward: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        backward: Tuple[Sequence[int], Sequence[int], Sequence[float], Sequence[int]],
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        potential: Optional[Callable[[int], float]] = None,
+        excluded: Optional[List[bool]] = None
+) -> Tuple[List[int], List[int], float]:
+    """
+    Bidirectional Dijkstra, or bidirectional A* when a potential is given.
+    Both searches run on reduced costs (forward uses +p, backward -p), so the
+    classic stopping rule top_forward + top_backward >= best stays exact for any
+    non-negative cost attribute. Unreachability is detected when either frontier
+    runs empty; no separate reachability pass is needed.
+
+    :param forward: Flat CSR mirrors from RoadGraph.adjacency().
+    :param backward: Flat incoming-edge mirrors from RoadGraph.reverse_adjacency().
+    :param sources: {node index: initial cost}.
+    :param targets: {node index: exit cost}.
+    :param potential: Optional feasible potential p(node), e.g. (h_target - h_source) / 2
+                      built from two consistent heuristics.
+    :param excluded: Optional per-node flags of nodes the search must not enter.
+    :return: (node indices, edge indices, cost); ([], [], inf) when no target is reachable.
+    """
+    _, pred_node, pred_edge, _, best, meet = _bidirectional_trees(
+        forward, backward, sources, targets, potential, excluded=excluded)
+    if meet < 0:
+        return [], [], INF
+    return (*_join(pred_node, pred_edge, meet), best)
+
+
+def alternative_paths(
+        forward: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        backward: Tuple[Sequence[int], Sequence[int], Sequence[float], Sequence[int]],
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        k: int,
+        max_stretch: float,
+        max_overlap: float
+) -> List[Tuple[List[int], List[int], float]]:
+    """
+    Shortest path plus up to k - 1 alternatives, by the plateau method on the trees
+    of a single bidirectional Dijkstra. A plateau is a chain of edges lying on both
+    the forward and the backward shortest-path tree; the route through a plateau is
+    a shortest path from the source to its start, the plateau, and a shortest path
+    from its end to the target. Long plateaus make routes that are locally optimal
+    (no obvious shortcut), so candidates are tried longest plateau first.
+
+    :param forward: Flat CSR mirrors from RoadGraph.adjacency().
+    :param backward: Flat incoming-edge mirrors from RoadGraph.reverse_adjacency().
+    :param sources: {node index: initial cost}.
+    :param targets: {node index: exit cost}.
+    :param k: Maximum number of routes returned, the shortest one included.
+    :param max_stretch: An alternative costs at most (1 + max_stretch) times the shortest path.
+    :param max_overlap: An alternative shares at most this fraction of the shortest path's
+                        cost with any route already chosen.
+    :return: [(node indices, edge indices, cost)], shortest first; [] when unreachable.
+    """
+    dist, pred_node, pred_edge, closed, best, meet = _bidirectional_trees(
+        forward, backward, sources, targets, stretch=max_stretch)
+    if meet < 0:
+        return []
+    cost = forward[2]
+    shortest = _join(pred_node, pred_edge, meet)
+    routes = [(*shortest, best)]
+    if k <= 1:
+        return routes
+
+    # plateau edges: the forward tree reaches v through e and the backward tree leaves u through e
+    f_closed, b_closed = closed
+    f_pred_edge, b_pred_edge = pred_edge
+    f_pred_node = pred_node[0]
+    plateau_next = {}
+    for v in range(len(f_closed)):
+        if not f_closed[v] or not b_closed[v]:
+            continue
+        u, e = f_pred_node[v], f_pred_edge[v]
+        if u >= 0 and b_closed[u] and b_pred_edge[u] == e:
+            plateau_next[u] = v
+
+    limit = (1 + max_stretch) * best
+    f_dist, b_dist = dist
+    candidates = []
+    for start in set(plateau_next).difference(plateau_next.values()):
+        end = start
+        while end in plateau_next:
+            end = plateau_next[end]
+        total = f_dist[end] + b_dist[end]
+        if total <= limit:
+            candidates.append((f_dist[end] - f_dist[start], total, start))
+    candidates.sort(key=lambda c: -c[0])
+
+    chosen = [{e: cost[e] for e in shortest[1]}]
+    allowed = max_overlap * best
+    for _, total, start in candidates:
+        nodes, edges = _join(pred_node, pred_edge, start)
+        if len(set(nodes)) < len(nodes):
+            continue
+        if any(sum(shared.get(e, 0.0) for e in edges) > allowed for shared in chosen):
+            continue
+        routes.append((nodes, edges, total))
+        if len(routes) >= k:
+            break
+        chosen.append({e: cost[e] for e in edges})
+    return routes
+
+
+def upward_search(
+        forward: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        backward: Tuple[Sequence[int], Sequence[int], Sequence[float]],
+        sources: Dict[int, float],
+        targets: Dict[int, float]
+) -> Tuple[List[int], float]:
+    """
+    Hierarchy query: a forward search from the sources and a backward search from
+    the targets, each relaxing only upward arcs, meeting at the highest-ranked node
+    of the shortest path. Each side stops once its frontier cannot improve the best.
+
+    :param forward: Upward CSR (offsets, heads, cost) with cost in travel direction.
+    :param backward: Upward CSR (offsets, heads, cost) with cost of the reversed arcs.
+    :param sources: {node index: initial cost}.
+    :param targets: {node index: exit cost}.
+    :return: (packed node sequence of hierarchy arcs, cost); ([], inf) when unreachable.
+    """
+    dist: Tuple[Dict[int, float], Dict[int, float]] = ({}, {})
+    pred: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+    heaps = ([], [])
+    for side, seeds in ((0, sources), (1, targets)):
+        for node, d in seeds.items():
+            if d < dist[side].get(node, INF):
+                dist[side][node] = d
+                heaps[side].append((d, node))
+        heapq.heapify(heaps[side])
+
+    best, meet = INF, -1
+    side = 0
+    while heaps[0] or heaps[1]:
+        if not heaps[side] or (heaps[1 - side] and heaps[1 - side][0][0] < heaps[side][0][0]):
+            side = 1 - side
+        d, u = heapq.heappop(heaps[side])
+        if d >= best:
+            heaps[side].clear()
+            continue
+        if d > dist[side][u]:
+            continue
+        other = dist[1 - side].get(u)
+        if other is not None and d + other < best:
+            best, meet = d + other, u
+        offsets, heads, cost = forward if side == 0 else backward
+        own = dist[side]
+        for i in range(offsets[u], offsets[u + 1]):
+            v = heads[i]
+            nd = d + cost[i]
+            if nd < own.get(v, INF):
+                own[v] = nd
+                pred[side][v] = u
+                heapq.heappush(heaps[side], (nd, v))
+
+    if meet < 0:
+        return [], INF
+    up = predecessor_chain(pred[0], meet)
+    up.reverse()
+    return up + predecessor_chain(pred[1], meet)[1:], best
+
+
+def predecessor_chain(pred: Dict[int, int], node: int) -> List[int]:
+    """
+    Follow a {node: predecessor} map from node back to a search root.
+    """
+    chain = [node]
+    while node in pred:
+        node = pred[node]
+        chain.append(node)
+    return chain
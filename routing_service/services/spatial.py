@@ -0,0 +1,203 @@
+import math
+import shapely
+import numpy as np
+from typing import List, Optional, Tuple
+from utils.distance import METERS_PER_DEGREE
+
+
+class NodeGrid:
+    """
+    Uniform-grid spatial index over node positions in projected meters.
+    Nodes are bucketed by cell and stored cell-sorted, so every grid row
+    segment maps to one contiguous slice; a nearest-node query scans rings
+    of cells outwards and stops as soon as no closer node can exist.
+    """
+    def __init__(self, xy: np.ndarray, nodes_per_cell: float = 2.0) -> None:
+        """
+        :param xy: Node positions in meters, shape (N, 2); NaN rows are skipped.
+        :param nodes_per_cell: Target average occupancy used to size the cells.
+        """
+        valid = np.flatnonzero(~np.isnan(xy).any(axis=1))
+        if len(valid) == 0:
+            raise RuntimeError("Graph is empty. Cannot build spatial index.")
+        points = xy[valid]
+        self.origin = points.min(axis=0)
+        extent = np.maximum(points.max(axis=0) - self.origin, 1.0)
+        self.cell = max(math.sqrt(extent[0] * extent[1] * nodes_per_cell / len(valid)), 1.0)
+        self.nx, self.ny = (np.floor(extent / self.cell).astype(np.int64) + 1).tolist()
+
+        ij = self._cell_of(points)
+        cell_ids = ij[:, 0] * self.ny + ij[:, 1]
+        order = np.argsort(cell_ids, kind="stable")
+        self.nodes = valid[order]
+        self.xy = points[order]
+        self.starts = np.searchsorted(cell_ids[order], np.arange(self.nx * self.ny + 1))
+
+    def _cell_of(self, xy: np.ndarray) -> np.ndarray:
+        return np.floor((xy - self.origin) / self.cell).astype(np.int64)
+
+    def nearest(self, point: np.ndarray, max_distance: Optional[float] = None) -> Tuple[int, float]:
+        """
+        Find the nearest indexed node to a projected point.
+
+        :param point: (x, y) in meters.
+        :param max_distance: Optional snap radius in meters.
+        :return: (node index, distance); (-1, inf) when nothing lies within max_distance.
+        """
+        ci, cj = self._cell_of(point).tolist()
+        # Chebyshev ring range that can contain cells of the grid at all
+        r = max(0, -ci, ci - (self.nx - 1), -cj, cj - (self.ny - 1))
+        r_max = max(ci, self.nx - 1 - ci, cj, self.ny - 1 - cj)
+        best, best_d2 = -1, math.inf
+        while r <= r_max:
+            # Nodes in ring r are at least (r - 1) cells away
+            bound = max(r - 1, 0) * self.cell
+            if bound * bound > best_d2 or (max_distance is not None and bound > max_distance):
+                break
+            for lo, hi in self._ring_slices(ci, cj, r):
+                if lo == hi:
+                    continue
+                d2 = ((self.xy[lo:hi] - point) ** 2).sum(axis=1)
+                k = int(np.argmin(d2))
+                if d2[k] < best_d2:
+                    best, best_d2 = lo + k, float(d2[k])
+            r += 1
+
+        if best < 0:
+            return -1, math.inf
+        distance = math.sqrt(best_d2)
+        if max_distance is not None and distance > max_distance:
+            return -1, math.inf
+        return int(self.nodes[best]), distance
+
+    def nearest_many(self, points: np.ndarray, max_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batch version of nearest().
+
+        :param points: Projected points, shape (M, 2).
+        :param max_distance: Optional snap radius in meters.
+        :return: (node indices, distances); index -1 / distance inf where no node is within range.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        indices = np.full(len(points), -1, dtype=np.int64)
+        distances = np.full(len(points), math.inf)
+        for k, point in enumerate(points):
+            indices[k], distances[k] = self.nearest(point, max_distance)
+        return indices, distances
+
+    def _ring_slices(self, ci: int, cj: int, r: int):
+        """
+        Yield [lo, hi) slices of the cell-sorted arrays covering ring r around cell (ci, cj).
+        """
+        j0, j1 = max(cj - r, 0), min(cj + r, self.ny - 1)
+        if j0 > j1:
+            return
+        for i in range(max(ci - r, 0), min(ci + r, self.nx - 1) + 1):
+            base = i * self.ny
+            if r == 0 or abs(i - ci) == r:
+                yield self.starts[base + j0], self.starts[base + j1 + 1]
+                continue
+            for j in (cj - r, cj + r):
+                if 0 <= j < self.ny:
+                    yield self.starts[base + j], self.starts[base + j + 1]
+
+
+class SegmentTree:
+    """
+    STRtree over the road segments of a graph (one straight segment per node pair,
+    both travel directions share it), used to project points onto the nearest road.
+    """
+    def __init__(self, xy: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> None:
+        """
+        :param xy: Node positions in meters, shape (N, 2).
+        :param sources: Tail node index of every edge.
+        :param targets: Head node index of every edge.
+        """
+        n = len(xy)
+        lo = np.minimum(sources, targets).astype(np.int64)
+        hi = np.maximum(sources, targets).astype(np.int64)
+        pairs = np.unique(lo[lo != hi] * n + hi[lo != hi])
+        self.tails, self.heads = pairs // n, pairs % n
+        segments = np.stack([xy[self.tails], xy[self.heads]], axis=1)
+        keep = ~np.isnan(segments).reshape(len(segments), -1).any(axis=1)
+        self.tails, self.heads = self.tails[keep], self.heads[keep]
+        self.lines = shapely.linestrings(segments[keep])
+        self.tree = shapely.STRtree(self.lines)
+
+    def project_many(
+            self,
+            points: np.ndarray,
+            max_distance: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Project points onto their nearest segment.
+
+        :param points: Projected points, shape (M, 2).
+        :param max_distance: Optional snap radius in meters.
+        :return: (segment indices, fractions along tail→head, distances);
+                 segment -1 / distance inf where no segment is within range.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        geoms = shapely.points(points)
+        segments = np.full(len(points), -1, dtype=np.int64)
+        fractions = np.zeros(len(points))
+        distances = np.full(len(points), math.inf)
+        if len(self.lines) == 0 or len(points) == 0:
+            return segments, fractions, distances
+
+        (query, hits), dist = self.tree.query_nearest(
+            geoms, max_distance=max_distance, return_distance=True, all_matches=False)
+        segments[query] = hits
+        distances[query] = dist
+        fractions[query] = shapely.line_locate_point(self.lines[hits], geoms[query], normalized=True)
+        return segments, fractions, distances
+
+
+def reach_polygon(points: np.ndarray, ratio: float = 0.2, tolerance: float = 25.0) -> List[List[List[float]]]:
+    """
+    Outline of a reachable point cloud as a simplified concave hull.
+
+    :param points: (lon, lat) points, shape (M, 2).
+    :param ratio: Concave hull ratio (0 = tightest, 1 = convex hull).
+    :param tolerance: Simplification tolerance in meters.
+    :return: Polygon rings as lists of [lon, lat] (exterior first); empty when fewer than 3 points.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    points = points[~np.isnan(points).any(axis=1)]
+    if len(np.unique(points, axis=0)) < 3:
+        return []
+    hull = shapely.concave_hull(shapely.multipoints(points), ratio=ratio)
+    hull = shapely.simplify(hull, tolerance / METERS_PER_DEGREE, preserve_topology=True)
+    if not isinstance(hull, shapely.Polygon):
+        return []
+    return [np.asarray(ring.coords).tolist() for ring in (hull.exterior, *hull.interiors)]
+
+
+def corridor_mask(
+        xy: np.ndarray,
+        source: np.ndarray,
+        target: np.ndarray,
+        stretch: float,
+        margin: float,
+        shape: str = "ellipse"
+) -> np.ndarray:
+    """
+    Nodes inside a search corridor around the straight line between two points.
+
+    :param xy: Node positions in meters, shape (N, 2); NaN rows fall outside.
+    :param source: Source position in meters.
+    :param target: Target position in meters.
+    :param stretch: Corridor width relative to the straight-line distance D.
+    :param margin: Extra width in meters, so short trips keep room to manoeuvre.
+    :param shape: 'ellipse' with foci at the endpoints, keeping nodes whose distances
+                  to both sum to at most (1 + stretch) * D + 2 * margin; or 'bbox', the
+                  bounding box of the endpoints grown by stretch * D / 2 + margin.
+    :return: Boolean mask, shape (N,).
+    """
+    straight = float(np.hypot(*(target - source)))
+    if shape == "bbox":
+        grow = stretch * straight / 2 + margin
+        low, high = np.minimum(source, target) - grow, np.maximum(source, target) + grow
+        return ((xy >= low) & (xy <= high)).all(axis=1)
+    reach = (1 + stretch) * straight + 2 * margin
+    return np.hypot(*(xy - source).T) + np.hypot(*(xy - target).T) <= reach
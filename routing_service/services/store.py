@@ -0,0 +1,91 @@
+import os
+import logging
+import threading
+from typing import Callable, Dict, Generic, Optional, TypeVar
+from utils.load import ROUTING_CACHE_DIR
+from routing_service.services.graph import RoadGraph
+
+
+T = TypeVar("T")
+
+
+class ArtefactStore(Generic[T]):
+    """
+    Process-wide registry of preprocessing artefacts derived from the road topology
+    (contraction hierarchies, orderings). Artefacts are keyed by RoadGraph.topology_key,
+    persisted as .npz under ROUTING_CACHE_DIR and built in a background thread, so
+    they are only recomputed when the topology changes.
+    """
+    def __init__(
+            self,
+            name: str,
+            build: Callable[[RoadGraph, Optional[str]], T],
+            load: Callable[[str], T]
+    ) -> None:
+        """
+        :param name: File prefix of the persisted artefacts.
+        :param build: Builds the artefact from a graph and cost attribute; the result
+                      must provide save(path).
+        :param load: Loads a persisted artefact from a path.
+        """
+        self.name = name
+        self._build = build
+        self._load = load
+        self._lock = threading.Lock()
+        self._items: Dict[str, T] = {}
+        self._building = set()
+
+    def _key(self, graph: RoadGraph, attr: Optional[str]) -> str:
+        return graph.topology_key if attr is None else f"{graph.topology_key}_{attr}"
+
+    def path(self, key: str) -> str:
+        return os.path.join(ROUTING_CACHE_DIR, f"{self.name}_{key}.npz")
+
+    def _build_and_store(self, graph: RoadGraph, attr: Optional[str], key: str) -> None:
+        try:
+            item = self._build(graph, attr)
+            # usable as soon as it is built; a failed save only costs a rebuild after a restart
+            self._items[key] = item
+            try:
+                item.save(self.path(key))
+            except Exception as e:
+                logging.error(f"{self.name} artefact {key} kept in memory only, save failed: {e}")
+        except Exception as e:
+            logging.error(f"{self.name} build failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(key)
+
+    def get(self, graph: RoadGraph, attr: Optional[str] = None, wait: bool = False) -> Optional[T]:
+        """
+        Return the artefact for a graph's topology (and cost attribute).
+        Loads it from disk when persisted; otherwise starts a background build
+        (or builds inline when wait=True) and returns None meanwhile, so callers
+        can fall back to a regular search.
+        """
+        key = self._key(graph, attr)
+        item = self._items.get(key)
+        if item is not None:
+            return item
+
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                return item
+            path = self.path(key)
+            if os.path.exists(path):
+                try:
+                    item = self._load(path)
+                    self._items[key] = item
+                    return item
+                except Exception as e:
+                    logging.error(f"Failed to load {self.name} artefact {path}: {e}")
+            if key in self._building:
+                return None
+            self._building.add(key)
+
+        if wait:
+            self._build_and_store(graph, attr, key)
+            return self._items.get(key)
+        threading.Thread(target=self._build_and_store, args=(graph, attr, key), daemon=True).start()
+        return None
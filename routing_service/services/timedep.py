@@ -0,0 +1,124 @@
+import math
+import time
+import logging
+import threading
+import numpy as np
+from array import array
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from routing_service.services.graph import RoadGraph
+
+
+HOUR = 3600.0
+
+
+class TimeProfile:
+    """
+    Per-edge travel times of one road topology across hourly traffic slices.
+    Every hour is stored as one compact float32 vector in canonical edge order,
+    and an edge's travel time at time t is linearly interpolated between the
+    vectors of the two hours whose centres surround t, which keeps the profile
+    continuous (and FIFO for realistic speed changes).
+    Hours are fetched lazily, the first time a search reaches them, and expire
+    with the traffic cache so refreshed slices are picked up: prune() drops
+    expired hours before a search, while lookups during a search stay check-free.
+    """
+    def __init__(self, graph: RoadGraph, attr: str = "time", ttl: float = 5 * 60) -> None:
+        """
+        :param graph: Any slice graph of the topology; its weights stand in for
+                      hours whose slice has a different topology.
+        :param attr: Edge attribute holding seconds.
+        :param ttl: Seconds an hour's weights are kept before being fetched again.
+        """
+        self.topology_key = graph.topology_key
+        self.attr = attr
+        self.ttl = ttl
+        self._fallback = self._compact(graph.columns[attr])
+        self._hours: Dict[int, array] = {}
+        self._expires: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _compact(weights: np.ndarray) -> array:
+        # array('f') keeps 4 bytes per edge and indexes to plain floats as fast as a list
+        compact = array("f")
+        compact.frombytes(np.ascontiguousarray(weights, dtype=np.float32).tobytes())
+        return compact
+
+    @staticmethod
+    def hours_around(t: float) -> Tuple[int, int, float]:
+        """
+        (hour before, hour after, position between their centres in [0, 1)) for a timestamp.
+        """
+        position = t / HOUR - 0.5
+        k = math.floor(position)
+        return k, k + 1, position - k
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(w) * w.itemsize for w in list(self._hours.values())) + len(self._fallback) * 4
+
+    def at(self, t: float) -> Optional[Tuple[array, array, float]]:
+        """
+        (weights of the hour before, of the hour after, interpolation factor) at a
+        timestamp; None when either hour is not loaded. Hot path of the searches.
+        """
+        position = t / HOUR - 0.5
+        k = math.floor(position)
+        lo = self._hours.get(k)
+        hi = self._hours.get(k + 1)
+        if lo is None or hi is None:
+            return None
+        return lo, hi, position - k
+
+    def prune(self) -> None:
+        """
+        Forget expired hours so the next search fetches them again.
+        """
+        with self._lock:
+            now = time.time()
+            for k in [k for k, expire in self._expires.items() if expire <= now]:
+                self._hours.pop(k, None)
+                del self._expires[k]
+
+    def put(self, hour: int, graph: Optional[RoadGraph]) -> None:
+        """
+        Store the weights of an hour from its slice graph.
+        """
+        if graph is None or graph.topology_key != self.topology_key:
+            if graph is not None:
+                logging.warning(f"Traffic slice of hour {hour} has a different topology; using default weights.")
+            weights = self._fallback
+        else:
+            weights = self._compact(graph.columns[self.attr])
+        with self._lock:
+            self._hours[hour] = weights
+            self._expires[hour] = time.time() + self.ttl
+
+    async def load(self, t: float, fetch: Callable[[int], Awaitable[Optional[RoadGraph]]]) -> None:
+        """
+        Make sure both hours around a timestamp are loaded.
+
+        :param t: Timestamp the search has reached.
+        :param fetch: Coroutine returning the slice graph serving a timestamp.
+        """
+        for hour in self.hours_around(t)[:2]:
+            if hour not in self._hours:
+                self.put(hour, await fetch(int(hour * HOUR + HOUR / 2)))
+
+
+_profiles: Dict[str, TimeProfile] = {}
+_lock = threading.Lock()
+
+
+def get_profile(graph: RoadGraph, ttl: float = 5 * 60) -> TimeProfile:
+    """
+    Return the shared travel-time profile of a graph's topology.
+    """
+    profile = _profiles.get(graph.topology_key)
+    if profile is None:
+        with _lock:
+            profile = _profiles.get(graph.topology_key)
+            if profile is None:
+                profile = TimeProfile(graph, ttl=ttl)
+                _profiles[graph.topology_key] = profile
+    return profile
@@ -0,0 +1,16 @@
+import functools
+import fakeredis
+import pytest
+import redis
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Route every RedisClient created during the test to one in-memory server,
+    sync commands and asyncio pub/sub alike.
+    """
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis, "Redis", functools.partial(fakeredis.FakeRedis, server=server))
+    monkeypatch.setattr(redis.asyncio, "Redis", functools.partial(fakeredis.FakeAsyncRedis, server=server))
+    return server
@@ -0,0 +1,54 @@
+import math
+import heapq
+import random
+from collections import defaultdict
+from typing import Dict
+from utils.distance import equirectangular
+
+
+def grid_graph(size: int = 8, unknown_share: float = 0.3, seed: int = 7) -> dict:
+    """
+    Node-link grid around Turin with two-way roads; a share of the roads has no
+    speed reading, reported by traffic_service as speed 0 and time 0.
+    """
+    rnd = random.Random(seed)
+    nodes = [{"id": i, "pos": (7.65 + (i % size) * 0.002, 45.05 + (i // size) * 0.002)} for i in range(size * size)]
+    links = []
+    for i in range(size * size):
+        for j in (i + 1, i + size):
+            if (j == i + 1 and j % size == 0) or j >= size * size:
+                continue
+            for u, v in ((i, j), (j, i)):
+                (x1, y1), (x2, y2) = (equirectangular(*nodes[k]["pos"]).tolist() for k in (u, v))
+                length = math.hypot(x2 - x1, y2 - y1) * 1.2
+                speed = 0 if rnd.random() < unknown_share else rnd.choice((20, 40, 60))
+                time = length / (speed / 3.6) if speed else 0
+                links.append({"source": u, "target": v, "road_id": len(links), "length": length,
+                              "speed": speed, "time": time})
+    return {"nodes": nodes, "links": links}
+
+
+def dijkstra(graph, attr: str, source: int, reverse: bool = False, inside=None) -> Dict[int, float]:
+    """
+    Textbook Dijkstra over the edge list of a RoadGraph, independent of its CSR
+    mirrors and of the search module; the reference every parity test checks against.
+
+    :param reverse: Follow edges backwards, i.e. costs *to* the source.
+    :param inside: Optional per-node mask; nodes outside it are never entered.
+    :return: {node index: cost} of every node reachable from the source.
+    """
+    tails, heads = (graph.targets, graph.sources) if reverse else (graph.sources, graph.targets)
+    out = defaultdict(list)
+    for u, v, c in zip(tails.tolist(), heads.tolist(), graph.columns[attr].tolist()):
+        out[u].append((v, c))
+    dist = {}
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in dist:
+            continue
+        dist[u] = d
+        for v, c in out[u]:
+            if v not in dist and (inside is None or inside[v]):
+                heapq.heappush(heap, (d + c, v))
+    return dist
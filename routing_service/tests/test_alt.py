@@ -0,0 +1,42 @@
+import math
+import random
+from routing_service.services import alt, search, graph as graph_module
+from routing_service.services.graph import RoadGraph
+from routing_service.services.road import RoadNetwork
+from routing_service.services.routing import RoutePlanner, TransportMode
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+# 9dcbfcb [user-008] ALT landmark heuristic for A*
+def test_landmark_search_matches_dijkstra():
+    graph = RoadGraph.from_node_link(grid_graph())
+    tables = alt.LandmarkTables.build(graph, "time", count=6)
+    forward, backward = graph.adjacency("time"), graph.reverse_adjacency("time")
+    rnd = random.Random(8)
+    for _ in range(40):
+        s, t = rnd.randrange(graph.number_of_nodes), rnd.randrange(graph.number_of_nodes)
+        expected = dijkstra(graph, "time", s).get(t, math.inf)
+        sources, targets = {s: 0.0}, {t: 0.0}
+        _, _, cost = search.shortest_path_between(
+            forward, sources, targets, heuristic=tables.heuristic(sources, targets))
+        assert math.isclose(cost, expected, rel_tol=1e-9)
+        _, _, cost = search.bidirectional_path_between(
+            forward, backward, sources, targets, potential=tables.potential(sources, targets))
+        assert math.isclose(cost, expected, rel_tol=1e-9)
+
+
+def test_slice_tables_are_queued_by_the_first_alt_query():
+    network = RoadNetwork(grid_graph(), max_snap_distance=None)
+    graph = network.graph
+    dijkstra_planner = RoutePlanner(network, transport_mode=TransportMode.CAR, algorithm="Dijkstra")
+    alt_planner = RoutePlanner(network, transport_mode=TransportMode.CAR, algorithm="ALT")
+    src, dst = tuple(graph.coords[3]), tuple(graph.coords[60])
+    expected = dijkstra_planner.compute(src, dst)
+
+    # tables not built yet: geometric A* answers meanwhile
+    assert alt.get_tables(graph, "time") is None
+    assert alt_planner.compute(src, dst)[:3] == expected[:3]
+    # the single background worker runs builds in order
+    graph_module._background.submit(lambda: None).result()
+    assert alt.get_tables(graph, "time") is not None
+    assert alt_planner.compute(src, dst)[:3] == expected[:3]
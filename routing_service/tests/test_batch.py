@@ -0,0 +1,51 @@
+import math
+import random
+import asyncio
+from routing_service.cache.route import RouteResultCache
+from routing_service.models.api_route import RouteBatchRequest
+from routing_service.services import routing, store
+from routing_service.services.road import RoadNetwork
+from routing_service.services.routing import TransportMode
+from routing_service.tests.data import grid_graph, dijkstra
+
+HOUR = 3600
+
+
+# da07a6e [user-019] Batch route search endpoint for plan re-evaluation
+def test_batch_matches_dijkstra(monkeypatch, tmp_path):
+    network = RoadNetwork(grid_graph(), max_snap_distance=None)
+    graph = network.graph
+    loading, loads = [], []
+
+    async def get_road_network(ts=None):
+        # slices are loaded one at a time
+        assert not loading
+        loading.append(ts)
+        await asyncio.sleep(0)
+        loads.append(loading.pop())
+        return network
+
+    monkeypatch.setattr(routing.traffic_graph_cache, "get_road_network", get_road_network)
+    monkeypatch.setattr(routing, "route_cache", RouteResultCache())
+    monkeypatch.setattr(store, "ROUTING_CACHE_DIR", str(tmp_path))
+
+    rnd = random.Random(19)
+    algorithms = ["A*", "Dijkstra", "BiA*", "BiDijkstra", "ALT", "BiALT", "CH"]
+    pairs = [rnd.sample(range(graph.number_of_nodes), 2) for _ in range(12)]
+    searches = [{
+        "start_at": 1_700_000_000 + (i % 4) * HOUR,
+        "src_loc": graph.coords[s].tolist(),
+        "dst_loc": graph.coords[t].tolist(),
+        "algorithm": algorithms[i % len(algorithms)],
+        "modes": ["walking", "cycling"],
+        "summary": True,
+    } for i, (s, t) in enumerate(pairs)]
+    results = asyncio.run(routing.batch(RouteBatchRequest(searches=searches)))["results"]
+    assert len(loads) == 4
+
+    for (s, t), result in zip(pairs, results):
+        expected = dijkstra(graph.undirected, "length", s)[t]
+        assert math.isclose(result["walking"]["distances"], expected, rel_tol=1e-9)
+        assert math.isclose(result["cycling"]["distances"], expected, rel_tol=1e-9)
+        assert result["cycling"]["times"] == round(expected / TransportMode.BIKE.default_speed)
+        assert "driving" not in result
@@ -0,0 +1,29 @@
+import base64
+import numpy as np
+import pytest
+from utils.codec import Codec
+from routing_service.services.graph import RoadGraph
+from routing_service.tests.data import grid_graph
+
+
+@pytest.mark.parametrize("fmt,compression", [("json", "none"), ("msgpack", "none"), ("msgpack", "zstd")])
+def test_slice_payloads_round_trip(fmt, compression):
+    codec = Codec(fmt, compression, min_size=0)
+    graph = RoadGraph.from_node_link(grid_graph())
+    topology = codec.decode(codec.encode(graph.topology_payload()))
+    weights = codec.decode(codec.encode(graph.weights_payload()))
+
+    assert isinstance(weights["columns"]["time"], np.ndarray)
+    rebuilt = RoadGraph.from_topology_payload(topology).with_weights(weights)
+    assert rebuilt.topology_key == graph.topology_key
+    np.testing.assert_allclose(rebuilt.columns["time"], graph.columns["time"], rtol=1e-6)
+
+
+def test_base64_payloads_still_load():
+    graph = RoadGraph.from_node_link(grid_graph())
+    legacy = {
+        "topology": graph.topology_key,
+        "columns": {"time": base64.b64encode(graph.columns["time"].astype("<f4").tobytes()).decode("ascii")},
+    }
+    rebuilt = graph.with_weights(Codec("json", "none").decode(Codec("json", "none").encode(legacy)))
+    np.testing.assert_allclose(rebuilt.columns["time"], graph.columns["time"], rtol=1e-6)
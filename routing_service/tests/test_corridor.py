@@ -0,0 +1,57 @@
+import math
+import random
+import numpy as np
+import pytest
+from routing_service.services import routing
+from routing_service.services.road import RoadNetwork
+from routing_service.services.routing import RoutePlanner, TransportMode
+from routing_service.services.spatial import corridor_mask
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+# ecb4e07 [user-020] Corridor-pruned route search
+@pytest.mark.parametrize("shape", ["ellipse", "bbox"])
+def test_corridor_route_matches_dijkstra_inside_the_corridor(monkeypatch, shape):
+    # a tight corridor, so it actually prunes the small test grid
+    monkeypatch.setattr(routing, "CORRIDOR_MARGIN", 60.0)
+    network = RoadNetwork(grid_graph(size=12), max_snap_distance=None)
+    graph = network.graph.undirected
+    xy = graph.xy
+    planner = RoutePlanner(network, transport_mode=TransportMode.FOOT, algorithm="Dijkstra", corridor=shape)
+    rnd = random.Random(20)
+    stretch = routing.CORRIDOR_STRETCH
+    pruned, compared = 0, 0
+    for _ in range(20):
+        s, t = rnd.sample(range(graph.number_of_nodes), 2)
+        inside = corridor_mask(xy, xy[s], xy[t], stretch, 60.0, shape)
+        # the mask is exactly the corridor geometry
+        straight = math.dist(xy[s], xy[t])
+        if shape == "ellipse":
+            expected_mask = np.hypot(*(xy - xy[s]).T) + np.hypot(*(xy - xy[t]).T) <= (1 + stretch) * straight + 120.0
+        else:
+            grow = stretch * straight / 2 + 60.0
+            expected_mask = ((xy >= np.minimum(xy[s], xy[t]) - grow) & (xy <= np.maximum(xy[s], xy[t]) + grow)).all(1)
+        np.testing.assert_array_equal(inside, expected_mask)
+        pruned += not inside.all()
+
+        expected = dijkstra(graph, "length", s, inside=inside).get(t)
+        if expected is None:
+            continue  # the planner widens the corridor; covered by the fallback below
+        _, meters, _, _ = planner.compute(tuple(network.graph.coords[s]), tuple(network.graph.coords[t]))
+        assert math.isclose(meters, expected, rel_tol=1e-9)
+        assert meters >= dijkstra(graph, "length", s)[t] * (1 - 1e-9)
+        compared += 1
+    assert pruned and compared
+
+
+def test_corridor_without_route_falls_back_to_the_whole_network(monkeypatch):
+    monkeypatch.setattr(routing, "CORRIDOR_MARGIN", 0.0)
+    monkeypatch.setattr(routing, "CORRIDOR_STRETCH", 0.0)
+    monkeypatch.setattr(routing, "CORRIDOR_ATTEMPTS", 1)
+    network = RoadNetwork(grid_graph(), max_snap_distance=None)
+    graph = network.graph.undirected
+    planner = RoutePlanner(network, transport_mode=TransportMode.FOOT, algorithm="Dijkstra", corridor="ellipse")
+    # diagonal corners: no grid road lies on the straight line between them
+    s, t = 0, graph.number_of_nodes - 1
+    _, meters, _, _ = planner.compute(tuple(network.graph.coords[s]), tuple(network.graph.coords[t]))
+    assert math.isclose(meters, dijkstra(graph, "length", s)[t], rel_tol=1e-9)
@@ -0,0 +1,42 @@
+import math
+import random
+import numpy as np
+from utils.distance import equirectangular
+from routing_service.services import search
+from routing_service.services.graph import RoadGraph
+from routing_service.services.road import RoadNetwork
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+# b1cd3a5 [user-001] Array-backed CSR road graph
+def test_csr_costs_match_node_link():
+    data = grid_graph()
+    graph = RoadGraph.from_node_link(data)
+    assert graph.number_of_nodes == len(data["nodes"])
+    assert graph.number_of_edges == len(data["links"])
+    # the CSR keeps every link once, with its own attributes
+    links = {(link["source"], link["target"]): link["length"] for link in data["links"]}
+    ids = graph.node_ids.tolist()
+    for u, v, length in zip(graph.sources.tolist(), graph.targets.tolist(), graph.columns["length"].tolist()):
+        assert links[ids[u], ids[v]] == length
+
+    adjacency = graph.adjacency("length")
+    for s in random.Random(1).sample(range(graph.number_of_nodes), 8):
+        expected = dijkstra(graph, "length", s)
+        dist = search.shortest_distances(adjacency, {s: 0.0})
+        assert {v: d for v, d in enumerate(dist) if math.isfinite(d)} == expected
+
+
+# d45fe90 [user-002] Grid spatial index for snapping points to road nodes
+def test_grid_snap_matches_brute_force():
+    network = RoadNetwork(grid_graph(), max_snap_distance=None)
+    xy = network.graph.xy
+    rnd = random.Random(2)
+    points = [(7.645 + rnd.random() * 0.025, 45.045 + rnd.random() * 0.025) for _ in range(200)]
+    nearest = network.match_node_indices(points).tolist()
+    for point, node in zip(points, nearest):
+        expected = np.hypot(*(xy - equirectangular(*point)).T).argmin()
+        assert node == expected
+        assert network.match_node_index(point) == expected
+    # outside the snap radius nothing is matched
+    assert network.match_node_indices([(7.5, 45.0)], max_distance=100.0).tolist() == [-1]
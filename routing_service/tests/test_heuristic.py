@@ -0,0 +1,43 @@
+import math
+import random
+import numpy as np
+import pytest
+from routing_service.services import search, heuristic, graph as graph_module
+from routing_service.services.graph import RoadGraph
+from routing_service.tests.data import grid_graph
+
+
+def test_unknown_speed_is_kept_by_default():
+    data = grid_graph()
+    graph = RoadGraph.from_node_link(data)
+    zeros = sum(link["time"] == 0 for link in data["links"])
+    assert zeros and (graph.columns["time"] == 0).sum() == zeros
+
+
+def test_unknown_speed_is_priced_when_set(monkeypatch):
+    monkeypatch.setattr(graph_module, "UNKNOWN_ROAD_SPEED", 30.0)
+    graph = RoadGraph.from_node_link(grid_graph())
+    unknown = graph.columns["speed"] == 30.0
+    assert unknown.any()
+    assert (graph.columns["time"] > 0).all()
+    np.testing.assert_allclose(graph.columns["time"][unknown], graph.columns["length"][unknown] / (30.0 / 3.6))
+    # without GNN weights, 'weight' follows the priced travel time
+    np.testing.assert_array_equal(graph.columns["weight"], graph.columns["time"])
+
+
+@pytest.mark.parametrize("unknown_speed", [None, 30.0])
+def test_geometric_bound_with_zero_time_edges(monkeypatch, unknown_speed):
+    monkeypatch.setattr(graph_module, "UNKNOWN_ROAD_SPEED", unknown_speed)
+    graph = RoadGraph.from_node_link(grid_graph())
+    bound = heuristic.GeometricBound(graph, "time")
+    # free edges disable the bound; priced ones keep it
+    assert math.isfinite(bound.max_speed) == bool(unknown_speed)
+
+    adjacency = graph.adjacency("time")
+    rnd = random.Random(1)
+    for _ in range(50):
+        s, t = rnd.randrange(graph.number_of_nodes), rnd.randrange(graph.number_of_nodes)
+        _, _, expected = search.shortest_path_between(adjacency, {s: 0.0}, {t: 0.0})
+        _, _, cost = search.shortest_path_between(
+            adjacency, {s: 0.0}, {t: 0.0}, heuristic=bound.towards(tuple(graph.coords[t])))
+        assert math.isclose(cost, expected, rel_tol=1e-9)
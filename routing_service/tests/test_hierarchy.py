@@ -0,0 +1,42 @@
+import math
+import random
+from routing_service.services import ch, cch, store
+from routing_service.services.graph import RoadGraph
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+def check_queries(hierarchy, graph: RoadGraph, attr: str, seed: int) -> None:
+    """
+    Point-to-point queries of a hierarchy: exact costs, and unpacked paths made of
+    original edges that add up to them.
+    """
+    rnd = random.Random(seed)
+    for s in rnd.sample(range(graph.number_of_nodes), 6):
+        expected = dijkstra(graph, attr, s)
+        for t in rnd.sample(range(graph.number_of_nodes), 8):
+            nodes, cost = hierarchy.query({s: 0.0}, {t: 0.0})
+            assert math.isclose(cost, expected.get(t, math.inf), rel_tol=1e-9)
+            edges = [graph.find_edge(u, v) for u, v in zip(nodes[:-1], nodes[1:])]
+            assert nodes[0] == s and nodes[-1] == t and min(edges, default=0) >= 0
+            assert math.isclose(sum(graph.columns[attr][e] for e in edges), cost, rel_tol=1e-9, abs_tol=1e-9)
+
+
+# 44290f0 [user-006] Contraction hierarchy for walking and cycling queries
+def test_contraction_hierarchy_matches_dijkstra():
+    graph = RoadGraph.from_node_link(grid_graph()).undirected
+    check_queries(ch.ContractionHierarchy.build(graph, "length"), graph, "length", 6)
+
+
+# 5db60dc [user-007] Customizable contraction hierarchy for per-slice car metrics
+def test_customizable_hierarchy_matches_dijkstra(monkeypatch, tmp_path):
+    # an unwritable cache directory must not cost the built structure
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    monkeypatch.setattr(store, "ROUTING_CACHE_DIR", str(blocked))
+    graph = RoadGraph.from_node_link(grid_graph())
+    structure = cch.get_structure(graph, wait=True)
+    assert structure is not None
+    assert cch.get_structure(graph) is structure
+
+    for attr in ("time", "length"):
+        check_queries(structure.customize(graph, attr), graph, attr, 7)
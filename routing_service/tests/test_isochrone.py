@@ -0,0 +1,22 @@
+import numpy as np
+from routing_service.services.road import RoadNetwork
+from routing_service.services.routing import RoutePlanner, TransportMode
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+# 9ddf0ae [user-011] Add /route/isochrone reachability endpoint
+def test_isochrone_matches_dijkstra():
+    network = RoadNetwork(grid_graph(), max_snap_distance=None)
+    planner = RoutePlanner(network, transport_mode=TransportMode.FOOT)
+    origin = 27
+    for minutes in (2.0, 6.5, 15.0):
+        G, nodes, reached, edges, fraction = planner.isochrone(tuple(network.graph.coords[origin]), minutes)
+        budget = minutes * TransportMode.FOOT.default_speed
+        expected = {v: d for v, d in dijkstra(G, "length", origin).items() if d <= budget}
+        assert sorted(nodes.tolist()) == sorted(expected)
+        np.testing.assert_allclose(reached, [expected[v] / TransportMode.FOOT.default_speed for v in nodes.tolist()])
+
+        # every edge leaving a reached node, cut where the budget runs out
+        assert sorted(edges.tolist()) == sorted(e for e in range(G.number_of_edges) if int(G.sources[e]) in expected)
+        spare = budget - np.array([expected[int(u)] for u in G.sources[edges]])
+        np.testing.assert_allclose(fraction, np.clip(spare / G.columns["length"][edges], 0.0, 1.0))
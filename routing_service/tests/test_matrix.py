@@ -0,0 +1,30 @@
+import random
+from routing_service.services.road import RoadNetwork
+from routing_service.services.routing import RoutePlanner, TransportMode
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+# 032d43c [user-010] Add /route/matrix many-to-many distance/time endpoint
+def test_matrix_matches_dijkstra():
+    network = RoadNetwork(grid_graph(), max_snap_distance=None)
+    graph = network.graph
+    rnd = random.Random(10)
+    sources, targets = rnd.sample(range(graph.number_of_nodes), 5), rnd.sample(range(graph.number_of_nodes), 7)
+    src_points = [tuple(graph.coords[s].tolist()) for s in sources]
+    dst_points = [tuple(graph.coords[t].tolist()) for t in targets]
+
+    # walking: shortest lengths over the undirected graph
+    speed = TransportMode.FOOT.default_speed
+    distances, times = RoutePlanner(network, transport_mode=TransportMode.FOOT).matrix(src_points, dst_points)
+    for s, row, time_row in zip(sources, distances, times):
+        expected = dijkstra(graph.undirected, "length", s)
+        assert row == [round(expected[t], 1) for t in targets]
+        assert time_row == [round(expected[t] / speed) for t in targets]
+
+    # driving: the same figures as one point-to-point Dijkstra per pair
+    planner = RoutePlanner(network, transport_mode=TransportMode.CAR, algorithm="Dijkstra")
+    distances, times = planner.matrix(src_points, dst_points)
+    for a, row, time_row in zip(src_points, distances, times):
+        for b, distance, minutes in zip(dst_points, row, time_row):
+            _, meters, expected_minutes, _ = planner.compute(a, b)
+            assert (distance, minutes) == (round(meters, 1), expected_minutes)
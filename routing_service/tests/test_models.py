@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from routing_service.main import app
+from routing_service.models.api_route import SearchRouteRequest, RouteBatchRequest, ProfileRouteRequest
+
+client = TestClient(app)
+POINTS = {"src_loc": [7.6, 45.0], "dst_loc": [7.7, 45.1]}
+
+
+def test_unknown_algorithm_is_rejected():
+    assert client.get("/route/search", params={**POINTS, "algorithm": "Bellman-Ford"}).status_code == 422
+    search = {**POINTS, "algorithm": None}
+    assert client.post("/route/search/batch", json={"searches": [search]}).status_code == 422
+    with pytest.raises(ValidationError):
+        SearchRouteRequest(src_loc=(7.6, 45.0), dst_loc=(7.7, 45.1), algorithm="a-star")
+    assert RouteBatchRequest(searches=[POINTS]).searches[0].algorithm == "A*"
+
+
+def test_reversed_profile_window_is_rejected():
+    params = {**POINTS, "start_at": 36000 + 3600, "end_at": 36000}
+    response = client.get("/route/profile", params=params)
+    assert response.status_code == 422
+    assert "end_at must not be earlier than start_at" in response.text
+    with pytest.raises(ValidationError):
+        ProfileRouteRequest(start_at=36000 + 3600, end_at=36000, src_loc=(7.6, 45.0), dst_loc=(7.7, 45.1))
+
+
+def test_unknown_batch_mode_is_rejected():
+    search = {**POINTS, "modes": ["walking", "flying"]}
+    assert client.post("/route/search/batch", json={"searches": [search]}).status_code == 422
+    assert client.post("/route/search/batch", json={"searches": [{**POINTS, "modes": None}]}).status_code == 422
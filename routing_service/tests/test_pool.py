@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from routing_service.main import app
+from routing_service.services import routing
+from routing_service.services.pool import PoolSaturated, RoutePool
+
+
+def test_cancel_while_queued_releases_slot():
+    async def scenario():
+        pool = RoutePool(workers=1, queue_depth=1)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        running = asyncio.ensure_future(pool.run("block", block))
+        while not started.is_set():
+            await asyncio.sleep(0.001)
+        # queued behind the blocked worker, then abandoned (e.g. a client timeout)
+        for _ in range(3):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.run("queued", lambda: "late"), timeout=0.01)
+        stats = pool.stats()
+        assert (stats["running"], stats["queued"], stats["cancelled"]) == (1, 0, 3)
+
+        release.set()
+        assert await running == "done"
+        assert await pool.run("after", lambda: 42) == 42
+        stats = pool.stats()
+        assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 2)
+
+    asyncio.run(scenario())
+
+
+def test_saturated_pool_rejects():
+    async def scenario():
+        pool = RoutePool(workers=1, queue_depth=0)
+        release = threading.Event()
+        running = asyncio.ensure_future(pool.run("block", release.wait, 5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(PoolSaturated):
+            await pool.run("rejected", lambda: None)
+        release.set()
+        assert await running is True
+        assert pool.stats()["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_saturated_pool_answers_503(monkeypatch):
+    async def history(req):
+        raise PoolSaturated("route pool saturated (64 tasks pending)")
+
+    monkeypatch.setattr(routing, "history", history)
+    response = TestClient(app).get("/route/search", params={"src_loc": [7.6, 45.0], "dst_loc": [7.7, 45.1]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,46 @@
+import asyncio
+from routing_service.models.api_route import ProfileRouteRequest
+from routing_service.services import routing
+
+
+class ProfilePlanner:
+    """
+    Stands in for RoutePlanner: travel time in minutes per departure, None when unreachable.
+    """
+    minutes = []
+
+    def __init__(self, network, transport_mode, snap_mode) -> None:
+        pass
+
+    async def compute_profile(self, source_point, target_point, departures):
+        return [([], 0.0, None, None) if m is None else ([source_point, target_point], 1000.0 * m, m, 0.0)
+                for m in self.minutes[:len(departures)]]
+
+
+def run_profile(monkeypatch, minutes, summary=True):
+    async def get_road_network(ts):
+        return object()
+
+    monkeypatch.setattr(routing.traffic_graph_cache, "get_road_network", get_road_network)
+    monkeypatch.setattr(ProfilePlanner, "minutes", minutes)
+    monkeypatch.setattr(routing, "RoutePlanner", ProfilePlanner)
+    req = ProfileRouteRequest(start_at=36000, end_at=36000 + 60 * 60, src_loc=(7.6, 45.0), dst_loc=(7.7, 45.1),
+                              step=15, summary=summary)
+    return asyncio.run(routing.departure_profile(req))
+
+
+def test_later_faster_departure_is_best(monkeypatch):
+    # rush hour clears: leaving later arrives later, but the trip is shorter
+    result = run_profile(monkeypatch, [40, 32, 25, 20, 21])
+    assert result["times"] == [40, 32, 25, 20, 21]
+    assert result["best"] == {"start_at": 36000 + 3 * 15 * 60, "distances": 20000.0, "times": 20}
+
+
+def test_equal_trips_prefer_earliest_departure(monkeypatch):
+    result = run_profile(monkeypatch, [None, 30, 30, 35, None], summary=False)
+    assert result["best"]["start_at"] == 36000 + 15 * 60
+    assert result["best"]["routes"] == [(7.6, 45.0), (7.7, 45.1)]
+
+
+def test_unreachable_window(monkeypatch):
+    assert run_profile(monkeypatch, [None] * 5)["best"] is None
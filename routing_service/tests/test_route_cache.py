@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from routing_service.cache.route import RouteResultCache
+
+
+def test_cancelled_initiator_does_not_fail_waiters():
+    async def scenario():
+        cache = RouteResultCache()
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return [(7.6, 45.0)], 1000.0, 2, 0.01
+
+        first = asyncio.ensure_future(cache.get_or_compute("slice", (1, 2, "driving"), compute))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(cache.get_or_compute("slice", (1, 2, "driving"), compute))
+        await asyncio.sleep(0)
+        # the client that started the computation disconnects
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert (await second)[1] == 1000.0
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # computed once and cached for the next request
+        assert (await cache.get_or_compute("slice", (1, 2, "driving"), compute))[1] == 1000.0
+        assert calls == [1]
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        cache = RouteResultCache()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError("traffic graph unavailable")
+
+        results = await asyncio.gather(
+            *(cache.get_or_compute("slice", "route", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.stats()["entries"] == 0 and cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
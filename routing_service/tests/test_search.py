@@ -0,0 +1,50 @@
+import math
+import random
+from routing_service.services import search, heuristic
+from routing_service.services.graph import RoadGraph
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+def sample_pairs(graph: RoadGraph, count: int, seed: int):
+    rnd = random.Random(seed)
+    return [(rnd.randrange(graph.number_of_nodes), rnd.randrange(graph.number_of_nodes)) for _ in range(count)]
+
+
+def path_cost(graph: RoadGraph, attr: str, nodes, edges) -> float:
+    assert [int(graph.sources[e]) for e in edges] == nodes[:-1]
+    assert [int(graph.targets[e]) for e in edges] == nodes[1:]
+    return sum(graph.columns[attr][e] for e in edges)
+
+
+# afe1464 [user-005] Bidirectional Dijkstra / A* search engine
+def test_bidirectional_matches_dijkstra():
+    graph = RoadGraph.from_node_link(grid_graph())
+    for attr in ("length", "time"):
+        forward, backward = graph.adjacency(attr), graph.reverse_adjacency(attr)
+        bound = heuristic.bound(graph, attr)
+        for s, t in sample_pairs(graph, 40, 5):
+            expected = dijkstra(graph, attr, s).get(t, math.inf)
+            source, target = tuple(graph.coords[s]), tuple(graph.coords[t])
+            for potential in (None, bound.potential(source, target)):
+                nodes, edges, cost = search.bidirectional_path_between(
+                    forward, backward, {s: 0.0}, {t: 0.0}, potential=potential)
+                assert math.isclose(cost, expected, rel_tol=1e-9)
+                assert math.isclose(path_cost(graph, attr, nodes, edges), expected, rel_tol=1e-9)
+
+
+# cb7af54 [user-018] Alternative driving routes from one bidirectional search
+def test_alternatives_start_with_the_dijkstra_route():
+    graph = RoadGraph.from_node_link(grid_graph())
+    forward, backward = graph.adjacency("length"), graph.reverse_adjacency("length")
+    found_alternatives = 0
+    for s, t in sample_pairs(graph, 30, 18):
+        expected = dijkstra(graph, "length", s).get(t, math.inf)
+        routes = search.alternative_paths(forward, backward, {s: 0.0}, {t: 0.0}, 3, 0.25, 0.6)
+        assert math.isclose(routes[0][2], expected, rel_tol=1e-9)
+        for nodes, edges, cost in routes:
+            assert nodes[0] == s and nodes[-1] == t
+            assert math.isclose(path_cost(graph, "length", nodes, edges), cost, rel_tol=1e-9)
+            assert cost <= 1.25 * expected * (1 + 1e-9)
+        assert len({tuple(edges) for _, edges, _ in routes}) == len(routes)
+        found_alternatives += len(routes) - 1
+    assert found_alternatives > 0
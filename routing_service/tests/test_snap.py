@@ -0,0 +1,30 @@
+import math
+import random
+from routing_service.services.road import RoadNetwork
+from routing_service.services.routing import RoutePlanner, TransportMode
+from routing_service.tests.data import grid_graph, dijkstra
+
+
+# c1e639f [user-003] Edge-projection snapping with partial edge costs
+def test_edge_snapped_route_matches_dijkstra():
+    network = RoadNetwork(grid_graph(), max_snap_distance=None)
+    graph = network.graph
+    planner = RoutePlanner(network, transport_mode=TransportMode.FOOT, algorithm="Dijkstra", snap_mode="edge")
+    rnd = random.Random(3)
+    for _ in range(30):
+        src, dst = ((7.6505 + rnd.random() * 0.013, 45.0505 + rnd.random() * 0.013) for _ in range(2))
+        a, b = network.match_edge(src), network.match_edge(dst)
+        # roads are two-way with equal lengths, so either end of a segment can be used
+        la = graph.columns["length"][graph.find_edge(a.tail, a.head)]
+        lb = graph.columns["length"][graph.find_edge(b.tail, b.head)]
+        expected = math.inf
+        for u, entry in ((a.tail, a.fraction * la), (a.head, (1 - a.fraction) * la)):
+            dist = dijkstra(graph.undirected, "length", u)
+            for v, exit_cost in ((b.tail, b.fraction * lb), (b.head, (1 - b.fraction) * lb)):
+                expected = min(expected, entry + dist[v] + exit_cost)
+        if {a.tail, a.head} == {b.tail, b.head}:
+            expected = min(expected, abs(a.fraction - (b.fraction if a.tail == b.tail else 1 - b.fraction)) * la)
+
+        coords, meters, _, _ = planner.compute(src, dst)
+        assert math.isclose(meters, expected, rel_tol=1e-9, abs_tol=1e-9)
+        assert coords[0] == list(a.point) and coords[-1] == list(b.point)
@@ -0,0 +1,82 @@
+import math
+import random
+import asyncio
+import numpy as np
+import pytest
+from routing_service.services import routing, timedep
+from routing_service.services.road import RoadNetwork
+from routing_service.services.routing import RoutePlanner, TransportMode
+from routing_service.tests.data import grid_graph, dijkstra
+
+DEPART = 1_700_000_000
+
+
+@pytest.fixture
+def constant_traffic(monkeypatch):
+    """
+    Every hourly slice serves the same network, so time-dependent costs must match
+    plain Dijkstra on 'time'. Travel times are rounded to float32 like the profile stores them.
+    """
+    data = grid_graph()
+    for link in data["links"]:
+        link["time"] = float(np.float32(link["time"]))
+    network = RoadNetwork(data, max_snap_distance=None)
+
+    async def get_road_network(ts=None):
+        return network
+
+    monkeypatch.setattr(routing.traffic_graph_cache, "get_road_network", get_road_network)
+    monkeypatch.setattr(timedep, "_profiles", {})
+    return network
+
+
+def node_pairs(network: RoadNetwork, count: int, seed: int):
+    rnd = random.Random(seed)
+    graph = network.graph
+    for _ in range(count):
+        s, t = rnd.sample(range(graph.number_of_nodes), 2)
+        yield s, t, tuple(graph.coords[s].tolist()), tuple(graph.coords[t].tolist())
+
+
+# b4b7daa [user-015] Time-dependent car routing across hourly traffic slices
+def test_time_dependent_route_matches_dijkstra(constant_traffic):
+    network = constant_traffic
+    graph = network.graph
+    planner = RoutePlanner(network, transport_mode=TransportMode.CAR, algorithm="TD")
+    nodes = {tuple(xy): i for i, xy in enumerate(graph.coords.tolist())}
+    for s, t, src, dst in node_pairs(network, 15, 15):
+        expected = dijkstra(graph, "time", s).get(t, math.inf)
+        coords, _, minutes, _ = asyncio.run(planner.compute_time_dependent(src, dst, DEPART))
+        path = [nodes[tuple(xy)] for xy in coords]
+        driven = sum(graph.columns["time"][graph.find_edge(u, v)] for u, v in zip(path[:-1], path[1:]))
+        assert math.isclose(driven, expected, rel_tol=1e-6, abs_tol=1e-6)
+        assert minutes == round((expected + RoutePlanner._calculate_delay(graph, path) * 60) / 60)
+
+
+# c136754 [user-016] Arrive-by routing via reverse time-dependent search
+def test_arrive_by_matches_dijkstra(constant_traffic):
+    network = constant_traffic
+    graph = network.graph
+    planner = RoutePlanner(network, transport_mode=TransportMode.CAR)
+    nodes = {tuple(xy): i for i, xy in enumerate(graph.coords.tolist())}
+    for s, t, src, dst in node_pairs(network, 15, 16):
+        expected = dijkstra(graph, "time", t, reverse=True).get(s, math.inf)
+        coords, _, _, _, depart = asyncio.run(planner.compute_arriving(src, dst, DEPART))
+        path = [nodes[tuple(xy)] for xy in coords]
+        delay = RoutePlanner._calculate_delay(graph, path) * 60
+        # leaves early enough for the drive and its signals, by less than a second more
+        assert expected + delay - 1e-6 <= DEPART - depart < expected + delay + 1
+
+
+def test_arrive_by_on_one_segment(constant_traffic):
+    network = constant_traffic
+    graph = network.graph
+    planner = RoutePlanner(network, transport_mode=TransportMode.CAR, snap_mode="edge")
+    e = int(np.flatnonzero(graph.columns["time"] > 20)[0])
+    tail, head = graph.coords[graph.sources[e]], graph.coords[graph.targets[e]]
+    src, dst = (tuple((tail + f * (head - tail)).tolist()) for f in (0.2, 0.7))
+
+    coords, _, _, _, depart = asyncio.run(planner.compute_arriving(src, dst, DEPART))
+    assert len(coords) == 2
+    # half the segment has to be driven, not nothing
+    assert DEPART - depart == math.ceil(0.5 * graph.columns["time"][e])
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import numpy as np
+from routing_service.cache.traffic import TrafficGraphCache
+from routing_service.job import traffic as job
+from routing_service.services import alt, ch, cch
+from routing_service.services.graph import RoadGraph
+from routing_service.tests.data import grid_graph
+
+
+def test_topology_is_written_once(fake_redis):
+    cache = TrafficGraphCache()
+    writes = []
+    set_value = cache.redis_cache.set
+    cache.redis_cache.set = lambda key, *args, **kwargs: writes.append(key) or set_value(key, *args, **kwargs)
+
+    first = cache._split(grid_graph(seed=1))
+    key = cache._topology_key(first["topology"])
+    assert writes == [key]
+    cache.redis_cache.cache.expire(key, 60)
+
+    # next slice of the same roads: weights differ, the stored topology is only kept alive
+    second = cache._split(grid_graph(seed=2))
+    assert second["topology"] == first["topology"]
+    assert writes == [key]
+    assert cache.redis_cache.cache.ttl(key) > 60
+
+    # a worker without the parsed topology rebuilds the slice from Redis
+    cache._topologies.clear()
+    times = cache._assemble(second).graph.columns["time"]
+    np.testing.assert_allclose(times, RoadGraph.from_node_link(grid_graph(seed=2)).columns["time"], rtol=1e-6)
+
+
+def test_slice_is_split_off_the_event_loop(fake_redis, monkeypatch):
+    cache = TrafficGraphCache()
+    threads = []
+    split = cache._split
+    monkeypatch.setattr(cache, "_split", lambda data: threads.append(threading.current_thread()) or split(data))
+
+    async def load_traffic_data(ts=None):
+        return grid_graph()
+    monkeypatch.setattr(cache, "load_traffic_data", load_traffic_data)
+
+    async def scenario():
+        data = await cache.get_traffic_data(1760000000)
+        assert threads and threads[0] is not threading.current_thread()
+        return data
+
+    assert asyncio.run(scenario())["topology"]
+
+
+def test_rewrite_evicts_network_in_other_worker(fake_redis, monkeypatch):
+    # topology artefacts are not needed here: skip their background builds
+    for module, name in ((ch, "get_hierarchy"), (cch, "get_structure"), (alt, "get_tables")):
+        monkeypatch.setattr(module, name, lambda *args, **kwargs: None)
+    ts = 1760000000
+    writer, reader = TrafficGraphCache(), TrafficGraphCache()
+    slices = {"writer": grid_graph(seed=1), "reader": grid_graph(seed=1)}
+
+    def loader(name):
+        async def load_traffic_data(ts=None):
+            return slices[name]
+        return load_traffic_data
+    monkeypatch.setattr(writer, "load_traffic_data", loader("writer"))
+    monkeypatch.setattr(reader, "load_traffic_data", loader("reader"))
+
+    async def scenario():
+        reader.start_listening()
+        first = await reader.get_road_network(ts)
+        assert await reader.get_road_network(ts) is first
+        # let the listener subscribe before the rewrite is published
+        await asyncio.sleep(0.05)
+
+        slices["writer"] = grid_graph(seed=2)
+        assert await writer.refresh_traffic_data(ts)
+        for _ in range(100):
+            if reader.network_cache.get(reader.network_key(ts)) is None:
+                break
+            await asyncio.sleep(0.01)
+        second = await reader.get_road_network(ts)
+        reader._listener.cancel()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second is not first
+    expected = RoadGraph.from_node_link(grid_graph(seed=2)).columns["time"]
+    np.testing.assert_allclose(second.graph.columns["time"], expected, rtol=1e-6)
+
+
+def test_cancelled_first_caller_does_not_fail_the_others(fake_redis, monkeypatch):
+    cache = TrafficGraphCache()
+    ts = 1760000000
+
+    async def scenario():
+        release = asyncio.Event()
+        loads = []
+
+        async def load_traffic_data(ts=None):
+            loads.append(ts)
+            await release.wait()
+            return grid_graph()
+        monkeypatch.setattr(cache, "load_traffic_data", load_traffic_data)
+
+        first = asyncio.ensure_future(cache.get_traffic_data(ts))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(cache.get_traffic_data(ts))
+        await asyncio.sleep(0)
+        # the request that started the load goes away
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        data = await second
+        assert first.cancelled()
+        assert loads == [ts] and not cache._inflight
+        return data
+
+    assert asyncio.run(scenario())["topology"]
+
+
+def test_lock_is_only_released_by_its_holder(fake_redis):
+    cache = TrafficGraphCache()
+    key = cache.network_key(1760000000)
+    lock_key = f"{cache.KEY_LOCK_PREFIX}{key}"
+    slow = cache._acquire_lock(key)
+    assert slow is not None and cache._acquire_lock(key) is None
+
+    # the slow holder's lock expires and another worker takes it
+    cache.redis_cache.delete(lock_key)
+    other = cache._acquire_lock(key)
+    assert other is not None and other != slow
+    cache._release_lock(key, slow)
+    assert cache.redis_cache.get(lock_key) == other
+    cache._release_lock(key, other)
+    assert cache.redis_cache.get(lock_key) is None
+
+
+def test_unchanged_refresh_keeps_networks(fake_redis, monkeypatch):
+    for module, name in ((ch, "get_hierarchy"), (cch, "get_structure"), (alt, "get_tables")):
+        monkeypatch.setattr(module, name, lambda *args, **kwargs: None)
+    cache = TrafficGraphCache()
+    published = []
+    monkeypatch.setattr(cache, "_publish_invalidation", published.append)
+    source = {"data": grid_graph(seed=1)}
+
+    async def load_traffic_data(ts=None):
+        return source["data"]
+    monkeypatch.setattr(cache, "load_traffic_data", load_traffic_data)
+
+    async def scenario():
+        for ts in (1760000000, None):
+            key = cache.network_key(ts)
+            source["data"] = grid_graph(seed=1)
+            network = await cache.get_road_network(ts)
+            # traffic_service reports the same speeds again
+            assert await cache.refresh_traffic_data(ts)
+            assert cache.network_cache.get(key) is network
+            # and then new ones
+            source["data"] = grid_graph(seed=2)
+            assert await cache.refresh_traffic_data(ts)
+            assert cache.network_cache.get(key) is None
+            assert (await cache.get_road_network(ts)) is not network
+
+    asyncio.run(scenario())
+    assert published == [cache.network_key(1760000000)]
+
+
+def test_future_traffic_is_refreshed_by_one_worker(fake_redis, monkeypatch):
+    cache = TrafficGraphCache()
+    refreshed = []
+
+    async def refresh_traffic_data(ts=None):
+        refreshed.append(ts)
+
+    async def sleep(seconds):
+        pass
+    monkeypatch.setattr(job, "traffic_graph_cache", cache)
+    monkeypatch.setattr(cache, "refresh_traffic_data", refresh_traffic_data)
+    monkeypatch.setattr(job.asyncio, "sleep", sleep)
+
+    # another worker is running the job
+    token = cache.acquire_job_lock("load_future_traffic", 60)
+    asyncio.run(job.load_future_traffic())
+    assert refreshed == []
+
+    cache.release_job_lock("load_future_traffic", token)
+    asyncio.run(job.load_future_traffic())
+    assert len(refreshed) == 7 * 24
+    # released when done, so the next run can take it
+    assert cache.acquire_job_lock("load_future_traffic", 60) is not None
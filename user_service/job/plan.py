@@ -3,28 +3,42 @@ from user_service.cache import plan as plan_cache
 from utils.load import ROUTING_SERVICE_URL, DATA_SERVICE_URL
 
 
+# searches per /route/search/batch call, and the seconds one call may take
+BATCH_SIZE = 500
+BATCH_TIMEOUT = 120.0
+
+
 async def check_future_plans():
     async with httpx.AsyncClient() as client:
         resp = await client.get(f'{DATA_SERVICE_URL}/plan/list/all')
     plan_list = resp.json()
     affected_plans = []
 
+    searches = []
     for old_plan in plan_list:
-        old_time_duration = old_plan['spend_time']
-        req = {
+        mode = 'walking' if old_plan['route_mode'] == 0 else 'driving'
+        searches.append({
             'start_at': old_plan['start_at'],
             'end_at': old_plan['end_at'],
             'src_loc': old_plan['src_loc'],
             'dst_loc': old_plan['dst_loc'],
-        }
+            'modes': [mode],
+            'summary': True,
+        })
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f'{ROUTING_SERVICE_URL}/route/search', params=req)
-        new_plan = resp.json()
-        if old_plan['route_mode'] == 0:
-            new_time_duration = new_plan['walking']['times']
-        else:
-            new_time_duration = new_plan['driving']['times']
+    # re-evaluate the plans through the batch endpoint, a chunk at a time
+    new_plans = []
+    async with httpx.AsyncClient(timeout=BATCH_TIMEOUT) as client:
+        for i in range(0, len(searches), BATCH_SIZE):
+            resp = await client.post(
+                f'{ROUTING_SERVICE_URL}/route/search/batch', json={'searches': searches[i:i + BATCH_SIZE]})
+            new_plans.extend(resp.json()['results'])
+
+    for old_plan, search, new_plan in zip(plan_list, searches, new_plans):
+        if new_plan is None:
+            continue
+        old_time_duration = old_plan['spend_time']
+        new_time_duration = new_plan[search['modes'][0]]['times']
 
         if abs(new_time_duration-old_time_duration) <= 1:
             continue
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 
 
 class SearchRouteRequest(BaseModel):
@@ -7,6 +7,9 @@ class SearchRouteRequest(BaseModel):
     end_at: Optional[int] = 0  # timestamp
     src_loc: Tuple[float, float]
     dst_loc: Tuple[float, float]
+    modes: Optional[List[str]] = ['walking', 'driving', 'cycling']  # modes to compute
+    summary: Optional[bool] = False  # distances/times only, without the coordinate paths
+    alternatives: Optional[int] = 0  # extra driving routes to return next to the optimal one
 
 
 class SaveRoutePlanRequest(BaseModel):
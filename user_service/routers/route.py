@@ -16,13 +16,19 @@ async def get_search_request(
     start_at: int = 0,
     end_at: int = 0,
     src_loc: List[float] = Query(...),
-    dst_loc: List[float] = Query(...)
+    dst_loc: List[float] = Query(...),
+    modes: List[str] = Query(['walking', 'driving', 'cycling']),
+    summary: bool = False,
+    alternatives: int = 0
 ) -> SearchRouteRequest:
     return SearchRouteRequest(
         start_at=start_at,
         end_at=end_at,
         src_loc=tuple(src_loc),
-        dst_loc=tuple(dst_loc)
+        dst_loc=tuple(dst_loc),
+        modes=modes,
+        summary=summary,
+        alternatives=alternatives
     )
 
 
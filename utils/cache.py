@@ -1,61 +1,184 @@
+import sys
+import time
 import datetime
+import threading
 import redis
+import redis.asyncio
 import json
-from utils.load import REDIS_HOST
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from utils.codec import Codec
+from utils.load import REDIS_HOST, CACHE_FORMAT, CACHE_COMPRESSION, CACHE_COMPRESS_MIN
+from utils.load import LOCAL_CACHE_ENTRIES, LOCAL_CACHE_MB
+
+
+def default_codec() -> Codec:
+    return Codec(CACHE_FORMAT, CACHE_COMPRESSION, CACHE_COMPRESS_MIN)
+
+
+def estimate_size(value) -> int:
+    """
+    Approximate memory of a value in bytes: `nbytes` when the object reports it
+    (NumPy arrays, RoadNetwork, ...), otherwise sys.getsizeof over nested
+    dicts, lists, tuples and sets.
+    """
+    total = 0
+    stack = [value]
+    seen = set()
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        nbytes = getattr(item, "nbytes", None)
+        if isinstance(nbytes, int):
+            total += nbytes
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
 
 
 class LocalCache:
-    def __init__(self):
-        self.cache = {}
+    """
+    In-process LRU cache with per-entry TTL, bounded by entry count and by an
+    estimated byte budget. Values are stored as given, ready to use, and shared by
+    every reader: treat them as read-only. Safe to use from the event loop and from
+    executor threads at the same time.
+    """
+    def __init__(
+            self,
+            max_entries: int = LOCAL_CACHE_ENTRIES,
+            max_bytes: int = int(LOCAL_CACHE_MB * 2**20),
+            sizeof: Callable[[object], int] = estimate_size
+    ):
+        """
+        :param max_entries: Maximum number of entries.
+        :param max_bytes: Budget for the estimated size of all values.
+        :param sizeof: Size estimate of a value, taken when it is stored.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.cache: "OrderedDict[str, Tuple[object, Optional[float], int]]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
 
     def set(self, key, value, ex=None, ts=None):
-        value = json.dumps(value)
         expire_time = None
         if ts:
             expire_time = ts
         if ex:
-            expire_time = int(datetime.datetime.now().timestamp()) + ex
-        self.cache[key] = (value, expire_time)
+            expire_time = time.time() + ex
+        size = self.sizeof(value)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self.cache[key] = (value, expire_time, size)
+            self._nbytes += size
+            if len(self.cache) > self.max_entries or self._nbytes > self.max_bytes:
+                self._evict()
 
     def get(self, key):
-        item = self.cache.get(key)
-        if not item:
-            return None
-        value, expire_time = item
-
-        now = int(datetime.datetime.now().timestamp())
-        if expire_time and now > expire_time:
-            del self.cache[key]
-            return None
-        return json.loads(value)
+        with self._lock:
+            item = self.cache.get(key)
+            if item is None:
+                self._counters["misses"] += 1
+                return None
+            value, expire_time, _ = item
+            if expire_time and time.time() > expire_time:
+                self._remove(key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self.cache.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
 
     def delete(self, key):
-        if key in self.cache:
-            del self.cache[key]
+        with self._lock:
+            self._remove(key)
 
     def list(self, prefix):
-        result = []
-        now = int(datetime.datetime.now().timestamp())
-        for key, (value, expire_ts) in list(self.cache.items()):
-            if key.startswith(prefix) is False:
-                continue
-            if now > expire_ts:
-                del self.cache[key]
-                continue
-            result.append(json.loads(value))
-        return result
+        with self._lock:
+            return [value for key, value in self._live() if key.startswith(prefix)]
+
+    def clear(self):
+        with self._lock:
+            self.cache.clear()
+            self._nbytes = 0
+
+    def values(self):
+        """
+        Snapshot of every unexpired value, least recently used first.
+        """
+        with self._lock:
+            return [value for _, value in self._live()]
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.cache),
+                "max_entries": self.max_entries,
+                "bytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+                **self._counters,
+            }
+
+    def _remove(self, key):
+        item = self.cache.pop(key, None)
+        if item is not None:
+            self._nbytes -= item[2]
+
+    def _live(self):
+        now = time.time()
+        for key, (_, expire_time, _) in list(self.cache.items()):
+            if expire_time and now > expire_time:
+                self._remove(key)
+                self._counters["expirations"] += 1
+        return [(key, value) for key, (value, _, _) in self.cache.items()]
+
+    def _evict(self):
+        # expired entries go first, then the least recently used ones
+        self._live()
+        while self.cache and (len(self.cache) > self.max_entries or self._nbytes > self.max_bytes):
+            _, (_, _, size) = self.cache.popitem(last=False)
+            self._nbytes -= size
+            self._counters["evictions"] += 1
+
+
+# deletes KEYS[1] only while it still holds ARGV[1], in one atomic step
+DELETE_IF_EQUAL = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
 
 
 class RedisClient:
-    def __init__(self):
+    def __init__(self, codec: Codec = None):
+        # raw bytes: values may be binary, the codec decodes them
         self.cache = redis.Redis(
             host=REDIS_HOST,
-            port=6379,
-            decode_responses=True
+            port=6379
         )
+        self.codec = codec or default_codec()
+        self._async_cache = None
+        self._delete_if_equal = self.cache.register_script(DELETE_IF_EQUAL)
 
     def set(self, key, value, ex=None, ts=None, nx=None):
-        value = json.dumps(value)
+        value = self.codec.encode(value)
         now = int(datetime.datetime.now().timestamp())
         if ts and ts > now:
             ex = ts - now
@@ -66,16 +189,44 @@ class RedisClient:
         value = self.cache.get(key)
         if value is None:
             return None
-        return json.loads(value)
+        return self.codec.decode(value)
 
     def delete(self, key):
         self.cache.delete(key)
 
+    def delete_if_equal(self, key, value):
+        """
+        Delete a key only while it still holds `value`, e.g. a lock released by its
+        owner after it may have expired and been taken by someone else.
+        """
+        return bool(self._delete_if_equal(keys=[key], args=[self.codec.encode(value)]))
+
+    def expire(self, key, ex):
+        """
+        Refresh the TTL of a key; False when the key does not exist.
+        """
+        return bool(self.cache.expire(key, ex))
+
     def list(self, prefix):
         result = []
         for key in self.cache.scan_iter(f'{prefix}*'):
             value = self.cache.get(key)
             if value:
-                result.append(json.loads(value))
+                result.append(self.codec.decode(value))
 
         return result
+
+    def publish(self, channel, message):
+        return self.cache.publish(channel, json.dumps(message))
+
+    def pubsub(self):
+        """
+        Asyncio pub/sub handle, so subscribers await messages without blocking the event loop.
+        """
+        if self._async_cache is None:
+            self._async_cache = redis.asyncio.Redis(
+                host=REDIS_HOST,
+                port=6379,
+                decode_responses=True
+            )
+        return self._async_cache.pubsub()
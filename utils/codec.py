@@ -0,0 +1,182 @@
+import json
+import zlib
+import base64
+import struct
+import numpy as np
+from typing import Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# binary values start with MAGIC, which never begins a JSON document, then
+# header version, serialization format and compression ids
+MAGIC = b"\xffUC"
+HEADER_VERSION = 1
+_HEADER = struct.Struct("<3sBBB")
+
+FORMATS = {"json": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 3}
+
+# msgpack extension type carrying a NumPy array: dtype string, shape and raw buffer
+_NDARRAY_EXT = 1
+# JSON stand-in for a NumPy array: {"__ndarray__": [dtype string, shape, base64 buffer]}
+_NDARRAY_KEY = "__ndarray__"
+
+
+def _ndarray_default(value):
+    if isinstance(value, np.ndarray):
+        payload = msgpack.packb(
+            [value.dtype.str, list(value.shape), np.ascontiguousarray(value).tobytes()], use_bin_type=True)
+        return msgpack.ExtType(_NDARRAY_EXT, payload)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _ndarray_ext_hook(code: int, data: bytes):
+    if code == _NDARRAY_EXT:
+        dtype, shape, buffer = msgpack.unpackb(data, raw=False)
+        return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+    return msgpack.ExtType(code, data)
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        buffer = base64.b64encode(np.ascontiguousarray(value).tobytes()).decode("ascii")
+        return {_NDARRAY_KEY: [value.dtype.str, list(value.shape), buffer]}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _json_object_hook(value: dict):
+    if len(value) == 1 and _NDARRAY_KEY in value:
+        dtype, shape, buffer = value[_NDARRAY_KEY]
+        return np.frombuffer(base64.b64decode(buffer), dtype=np.dtype(dtype)).reshape(shape)
+    return value
+
+
+def _json_loads(data):
+    # the hook only runs when the document may hold arrays
+    marker = _NDARRAY_KEY if isinstance(data, str) else _NDARRAY_KEY.encode()
+    return json.loads(data, object_hook=_json_object_hook if marker in data else None)
+
+
+def available_format(name: str = "auto") -> str:
+    """
+    Resolve a serialization format name; 'auto' prefers msgpack when installed.
+    """
+    if name == "auto":
+        return "msgpack" if msgpack is not None else "json"
+    if name == "msgpack" and msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    if name not in FORMATS:
+        raise ValueError(f"Unknown serialization format '{name}'")
+    return name
+
+
+def available_compression(name: str = "auto") -> str:
+    """
+    Resolve a compression name; 'auto' picks zstd when installed and no
+    compression otherwise: zlib (always available) shrinks values but decodes
+    slower than plain reads, so it is only used when asked for.
+    """
+    if name == "auto":
+        return "zstd" if zstandard is not None else "none"
+    if name == "zstd" and zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    if name not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{name}'")
+    return name
+
+
+class Codec:
+    """
+    Value serialization of RedisClient entries (LocalCache keeps live objects).
+    Values serializing to fewer than `min_size` bytes stay plain JSON, readable by
+    any client and by entries written before binary values existed. Larger values
+    are serialized with `fmt`, compressed, and prefixed with a versioned header
+    naming both, so readers decode whatever a differently configured writer
+    produced. NumPy arrays round-trip in both formats: as raw buffers in msgpack,
+    as base64 in JSON.
+    """
+    def __init__(self, fmt: str = "auto", compression: str = "auto", min_size: int = 4096, level: int = 3) -> None:
+        """
+        :param fmt: 'json', 'msgpack' or 'auto'.
+        :param compression: 'none', 'zlib', 'zstd' or 'auto'.
+        :param min_size: Serialized size in bytes below which values are stored as plain JSON.
+        :param level: Compression level (zstd / zlib).
+        """
+        self.fmt = available_format(fmt)
+        self.compression = available_compression(compression)
+        self.min_size = min_size
+        self.level = level
+
+    def _serialize(self, value) -> bytes:
+        if self.fmt == "msgpack":
+            return msgpack.packb(value, default=_ndarray_default, use_bin_type=True)
+        return json.dumps(value, default=_json_default).encode()
+
+    @staticmethod
+    def _deserialize(fmt: int, data: bytes):
+        if fmt == FORMATS["msgpack"]:
+            if msgpack is None:
+                raise RuntimeError("Cached value needs msgpack, which is not installed")
+            return msgpack.unpackb(data, ext_hook=_ndarray_ext_hook, raw=False, strict_map_key=False)
+        if fmt == FORMATS["json"]:
+            return _json_loads(data)
+        raise RuntimeError(f"Unknown cache value format {fmt}")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        if self.compression == "zlib":
+            return zlib.compress(data, self.level)
+        return data
+
+    @staticmethod
+    def _decompress(compression: int, data: bytes) -> bytes:
+        if compression == COMPRESSIONS["zstd"]:
+            if zstandard is None:
+                raise RuntimeError("Cached value needs zstandard, which is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if compression == COMPRESSIONS["zlib"]:
+            return zlib.decompress(data)
+        if compression == COMPRESSIONS["none"]:
+            return data
+        raise RuntimeError(f"Unknown cache value compression {compression}")
+
+    def encode(self, value) -> bytes:
+        """
+        Serialize a value: plain JSON when small, header + compressed payload otherwise.
+        """
+        data = self._serialize(value)
+        if len(data) < self.min_size:
+            # small values stay plain JSON whenever they can
+            try:
+                return data if self.fmt == "json" else json.dumps(value, default=_json_default).encode()
+            except TypeError:
+                pass
+        header = _HEADER.pack(MAGIC, HEADER_VERSION, FORMATS[self.fmt], COMPRESSIONS[self.compression])
+        return header + self._compress(data)
+
+    def decode(self, data: Optional[bytes]):
+        """
+        Inverse of encode(); plain JSON (str or bytes) is accepted as is.
+        """
+        if data is None:
+            return None
+        if isinstance(data, str) or data[:3] != MAGIC:
+            return _json_loads(data)
+        _, version, fmt, compression = _HEADER.unpack_from(data)
+        if version != HEADER_VERSION:
+            raise RuntimeError(f"Unsupported cache value header version {version}")
+        return self._deserialize(fmt, self._decompress(compression, data[_HEADER.size:]))
+
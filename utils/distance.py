@@ -1,9 +1,13 @@
 import math
-from functools import lru_cache
+import numpy as np
 from typing import Tuple
 
 
-@lru_cache(maxsize=None)
+# Reference latitude for the local planar projection of the Turin area.
+TURIN_LAT = 45.07
+METERS_PER_DEGREE = math.pi / 180 * 6371008.8
+
+
 def euclidean_distance(p1: Tuple[float, float], p2: Tuple[float, float]) -> float:
     """
     Calculate the Euclidean distance between two points.
@@ -13,3 +17,18 @@ def euclidean_distance(p1: Tuple[float, float], p2: Tuple[float, float]) -> floa
     :return: Euclidean distance.
     """
     return math.hypot(p1[0] - p2[0], p1[1] - p2[1])
+
+
+def equirectangular(lon, lat, lat0: float = TURIN_LAT) -> np.ndarray:
+    """
+    Project (lon, lat) degrees to local planar meters around lat0.
+    Accurate to well below 0.1% at city scale.
+
+    :param lon: Longitude(s) in degrees.
+    :param lat: Latitude(s) in degrees.
+    :param lat0: Reference latitude of the projection.
+    :return: Array (..., 2) of (x, y) meters.
+    """
+    x = np.asarray(lon, dtype=np.float64) * METERS_PER_DEGREE * math.cos(math.radians(lat0))
+    y = np.asarray(lat, dtype=np.float64) * METERS_PER_DEGREE
+    return np.stack([x, y], axis=-1)
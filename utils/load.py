@@ -15,3 +15,50 @@ TRAFFIC_SERVICE_URL = f'http://{os.getenv("DEV_HOST") if dev_mode else "traffic_
 ROUTING_SERVICE_URL = f'http://{os.getenv("DEV_HOST") if dev_mode else "routing_service"}:{os.getenv("ROUTING_SERVICE_PORT")}'
 DATA_SERVICE_URL = f'http://{os.getenv("DEV_HOST") if dev_mode else "data_service"}:{os.getenv("DATA_SERVICE_PORT")}'
 REDIS_HOST = f'{os.getenv("REDIS_HOST")}' if dev_mode else "redis"
+
+# routing_service: snap radius in meters for matching points to the road graph (0 = unlimited)
+SNAP_MAX_DISTANCE = float(os.getenv("SNAP_MAX_DISTANCE", 0)) or None
+# routing_service: car speed in km/h assumed on roads without a traffic reading (0 = keep their travel time 0)
+UNKNOWN_ROAD_SPEED = float(os.getenv("UNKNOWN_ROAD_SPEED", 0)) or None
+# routing_service: directory for artefacts persisted across restarts (e.g. contraction hierarchies), a volume in docker-compose
+ROUTING_CACHE_DIR = os.getenv("ROUTING_CACHE_DIR", ".cache/routing")
+# routing_service: landmarks precomputed for ALT and how many of them each query uses
+ALT_LANDMARKS = int(os.getenv("ALT_LANDMARKS", 16))
+ALT_ACTIVE_LANDMARKS = int(os.getenv("ALT_ACTIVE_LANDMARKS", 4))
+# routing_service: worker threads for route computations, tasks allowed to queue behind them,
+# and the run time (seconds) above which a task is logged as slow
+ROUTE_WORKERS = int(os.getenv("ROUTE_WORKERS", min(4, os.cpu_count() or 1)))
+ROUTE_QUEUE_DEPTH = int(os.getenv("ROUTE_QUEUE_DEPTH", 64))
+ROUTE_SLOW_TASK = float(os.getenv("ROUTE_SLOW_TASK", 2.0))
+# routing_service: seconds clients are asked to wait (Retry-After) when the route pool is saturated
+ROUTE_RETRY_AFTER = int(os.getenv("ROUTE_RETRY_AFTER", 1))
+# routing_service: size limits of the computed route cache
+ROUTE_CACHE_ENTRIES = int(os.getenv("ROUTE_CACHE_ENTRIES", 10000))
+ROUTE_CACHE_MB = float(os.getenv("ROUTE_CACHE_MB", 64))
+# routing_service: alternative routes cost at most (1 + stretch) times the best route and share
+# at most `overlap` of its cost with any other route returned
+ALTERNATIVE_MAX_STRETCH = float(os.getenv("ALTERNATIVE_MAX_STRETCH", 0.25))
+ALTERNATIVE_MAX_OVERLAP = float(os.getenv("ALTERNATIVE_MAX_OVERLAP", 0.6))
+# routing_service: searches of one /route/search/batch call running at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+# routing_service: first search corridor (width relative to the straight-line distance, plus meters),
+# and how many doubled corridors are tried before searching the whole network
+CORRIDOR_STRETCH = float(os.getenv("CORRIDOR_STRETCH", 0.3))
+CORRIDOR_MARGIN = float(os.getenv("CORRIDOR_MARGIN", 1000))
+CORRIDOR_ATTEMPTS = int(os.getenv("CORRIDOR_ATTEMPTS", 3))
+# cache values: serialization ('auto' = msgpack when installed, else json), compression
+# ('auto' = zstd when installed, else none; 'zlib' on request) and the size in bytes
+# below which values stay plain uncompressed JSON
+CACHE_FORMAT = os.getenv("CACHE_FORMAT", "auto")
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "auto")
+CACHE_COMPRESS_MIN = int(os.getenv("CACHE_COMPRESS_MIN", 4096))
+# in-process caches: default entry and memory limits
+LOCAL_CACHE_ENTRIES = int(os.getenv("LOCAL_CACHE_ENTRIES", 1024))
+LOCAL_CACHE_MB = float(os.getenv("LOCAL_CACHE_MB", 256))
+# routing_service: limits of the cache of assembled slice networks
+NETWORK_CACHE_ENTRIES = int(os.getenv("NETWORK_CACHE_ENTRIES", 24))
+NETWORK_CACHE_MB = float(os.getenv("NETWORK_CACHE_MB", 2048))
+# routing_service: seconds a timestamped slice network stays in memory without an invalidation message
+SLICE_CACHE_TTL = int(os.getenv("SLICE_CACHE_TTL", 15 * 60))
+# routing_service: hours ahead whose slices the traffic job keeps warm
+SLICE_PREFETCH_HOURS = int(os.getenv("SLICE_PREFETCH_HOURS", 3))